@@ -0,0 +1,141 @@
+#!/usr/bin/env python3
+"""
+Offline batch jobs: bulk enrichment of the dictionary and lesson annotations
+through a batch-capable LLM backend instead of the interactive endpoints.
+
+    python batch_jobs.py prepare glosses --language de --out data/batch/glosses-de.jsonl
+    python batch_jobs.py prepare annotate --course-id 3 --out data/batch/course-3.jsonl
+    python batch_jobs.py run data/batch/glosses-de.jsonl
+    python batch_jobs.py load data/batch/glosses-de.jsonl
+
+`run` uses the OpenAI Batch API at openAiBaseUrl by default; `--via gateway`
+sends the requests through the LLM gateway instead (e.g. `--backend ollama`,
+for a job prepared with `--model` set to an Ollama model). Running a gateway
+job again only repeats the requests that failed or did not run.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import sys
+from pathlib import Path
+
+from py.services.batchJobs import (
+    BatchJobBuilder, BatchResultLoader, GatewayBatchRunner, OpenAIBatchRunner,
+    manifest_path, read_jsonl, results_path, write_jsonl
+)
+from py.services.databaseServiceORM import ImparaDB
+from py.services.llmGateway import LLMGateway, OllamaBackend, OpenAIBackend, StubBackend
+
+PROJECT_ROOT = Path(__file__).parent
+
+
+def load_settings():
+    settings_path = PROJECT_ROOT / "settings.json"
+    if settings_path.exists():
+        with open(settings_path, "r") as f:
+            return json.load(f)
+    return {}
+
+
+def open_db():
+    return ImparaDB(os.path.join(PROJECT_ROOT, "data/impara.db"))
+
+
+def prepare(args, settings):
+    builder = BatchJobBuilder(open_db(), model=args.model or settings.get("batchModel", "gpt-4o-mini"))
+    if args.kind == "glosses":
+        lines, manifest = builder.glosses(args.language, args.target_language, args.limit)
+    else:
+        lines, manifest = builder.annotate(args.course_id, settings.get("annotationChunkChars", 1200))
+    job_path = Path(args.out)
+    count = write_jsonl(job_path, lines)
+    with open(manifest_path(job_path), "w", encoding="utf-8") as f:
+        json.dump(manifest, f, ensure_ascii=False)
+    print(f"Wrote {count} requests to {job_path}")
+
+
+def run(args, settings):
+    job_path = Path(args.job)
+    output_path = results_path(job_path)
+    base_url = settings.get("openAiBaseUrl", "https://api.openai.com/v1")
+    api_key = settings.get("OpenAI_API_Key")
+    if args.via == "batch-api":
+        if not api_key:
+            sys.exit("OpenAI_API_Key missing in settings.json")
+        runner = OpenAIBatchRunner(api_key, base_url, poll_interval=args.poll_interval)
+        try:
+            batch = runner.run(job_path, output_path)
+        finally:
+            runner.close()
+        print(f"Batch {batch['id']} {batch['status']}, results in {output_path}")
+        return
+
+    async def run_gateway():
+        from py.services.llmClients import LLMClientManager
+        llm = LLMClientManager(api_key, base_url)
+        gateway = LLMGateway([
+            OpenAIBackend(lambda: llm.http, max_concurrency=settings.get("openAiConcurrency", 8)),
+            OllamaBackend(
+                settings.get("ollamaBaseUrl", "http://localhost:11434"),
+                default_model=settings.get("ollamaModel", "qwen3-vl:8b"),
+                max_concurrency=settings.get("ollamaConcurrency", 1)
+            ),
+            StubBackend()
+        ], default_backend=settings.get("llmDefaultBackend", "openai"), timeout=settings.get("llmTimeout", 120.0))
+        try:
+            return await GatewayBatchRunner(gateway, args.backend).run(job_path, output_path)
+        finally:
+            await gateway.aclose()
+            await llm.aclose()
+
+    summary = asyncio.run(run_gateway())
+    print(f"{summary['total']} requests, {summary['skipped']} done before, {summary['failed']} failed, "
+          f"results in {output_path}")
+
+
+def load(args, settings):
+    job_path = Path(args.job)
+    with open(manifest_path(job_path), "r", encoding="utf-8") as f:
+        manifest = json.load(f)
+    summary = BatchResultLoader(open_db()).load(manifest, read_jsonl(results_path(job_path)))
+    errors = summary.pop("errors")
+    for custom_id, error in list(errors.items())[:20]:
+        print(f"  {custom_id}: {error}")
+    print(json.dumps(summary))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline batch jobs for Impara")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    p = commands.add_parser("prepare", help="Write the batch requests for a backlog")
+    p.add_argument("kind", choices=["glosses", "annotate"])
+    p.add_argument("--out", required=True, help="Job file (.jsonl)")
+    p.add_argument("--model", help="Model (default: batchModel in settings.json)")
+    p.add_argument("--language", help="glosses: language of the dictionary entries")
+    p.add_argument("--target-language", default="en", help="glosses: language of the translations")
+    p.add_argument("--limit", type=int, help="glosses: maximum number of entries")
+    p.add_argument("--course-id", type=int, help="annotate: course whose lessons are annotated")
+
+    r = commands.add_parser("run", help="Run a job and download its results")
+    r.add_argument("job", help="Job file (.jsonl)")
+    r.add_argument("--via", choices=["batch-api", "gateway"], default="batch-api")
+    r.add_argument("--backend", help="gateway: LLM backend (default: llmDefaultBackend)")
+    r.add_argument("--poll-interval", type=float, default=30.0, help="batch-api: seconds between status checks")
+
+    l = commands.add_parser("load", help="Load the results of a job into the database")
+    l.add_argument("job", help="Job file (.jsonl)")
+
+    args = parser.parse_args()
+    if args.command == "prepare":
+        if args.kind == "glosses" and not args.language:
+            parser.error("prepare glosses requires --language")
+        if args.kind == "annotate" and args.course_id is None:
+            parser.error("prepare annotate requires --course-id")
+    {"prepare": prepare, "run": run, "load": load}[args.command](args, load_settings())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,6 @@
+import sys
+
+# pytest installs a top-level "py" compatibility module, which shadows this
+# project's py package once pytest is running
+if not hasattr(sys.modules.get("py"), "__path__"):
+    sys.modules.pop("py", None)
@@ -0,0 +1,10 @@
+from typing import List, Optional
+
+from pydantic import BaseModel
+
+class DictionaryLookupRequest(BaseModel):
+    language: str
+    tokens: Optional[List[str]] = None
+    text: Optional[str] = None
+    user_id: Optional[int] = None
+    target_language: Optional[str] = None
@@ -1,4 +1,4 @@
-from typing import Optional
+from typing import List, Optional
 
 from sqlalchemy import ForeignKey
 from sqlalchemy import Index
@@ -104,6 +104,8 @@ class DictEntry(Base):
     ipa: Mapped[Optional[str]]
     created_at: Mapped[str]
 
+    senses: Mapped[List["DictSense"]] = relationship(viewonly=True, order_by="[DictSense.sense_order, DictSense.id]")
+
     def __repr__(self) -> str:
         return f"DictEntry(id={self.id!r}, language={self.language!r}, lemma={self.lemma!r})"
 
@@ -122,6 +124,9 @@ class DictSense(Base):
     note: Mapped[Optional[str]]
     sense_order: Mapped[Optional[int]]
 
+    translations: Mapped[List["DictTranslation"]] = relationship(viewonly=True, order_by="DictTranslation.id")
+    examples: Mapped[List["DictExample"]] = relationship(viewonly=True, order_by="DictExample.id")
+
     def __repr__(self) -> str:
         return f"DictSense(id={self.id!r}, entry_id={self.entry_id!r}, pos={self.pos!r})"
 
@@ -170,4 +175,217 @@ class UserSenseState(Base):
     next_due_at: Mapped[Optional[str]]
 
     def __repr__(self) -> str:
-        return f"UserSenseState(user_id={self.user_id!r}, sense_id={self.sense_id!r}, srs_level={self.srs_level!r})"
\ No newline at end of file
+        return f"UserSenseState(user_id={self.user_id!r}, sense_id={self.sense_id!r}, srs_level={self.srs_level!r})"
+
+
+class Token(Base):
+    __tablename__ = "token"
+    __table_args__ = (
+        UniqueConstraint("language", "token", "token_type", name="uq_token_language_token_token_type"),
+        Index("idx_token_lang_norm", "language", "normalized"),
+        Index("idx_token_type", "token_type"),
+    )
+
+    id: Mapped[int] = mapped_column(primary_key=True)
+    language: Mapped[str]
+    token: Mapped[str]
+    normalized: Mapped[Optional[str]]
+    token_type: Mapped[str] = mapped_column(default="word")
+    ngrams: Mapped[int] = mapped_column(default=1)
+    created_at: Mapped[str]
+
+    def __repr__(self) -> str:
+        return f"Token(id={self.id!r}, language={self.language!r}, token={self.token!r}, token_type={self.token_type!r})"
+
+
+class LessonTokenCount(Base):
+    __tablename__ = "lesson_token_count"
+    __table_args__ = (
+        Index("idx_ltc_token", "token_id"),
+        Index("idx_ltc_lesson", "lesson_id"),
+    )
+
+    lesson_id: Mapped[int] = mapped_column(ForeignKey("lesson.id", ondelete="CASCADE"), primary_key=True)
+    token_id: Mapped[int] = mapped_column(ForeignKey("token.id", ondelete="CASCADE"), primary_key=True)
+    count_total: Mapped[int] = mapped_column(default=0)
+    count_unique: Mapped[int] = mapped_column(default=0)
+    first_pos: Mapped[Optional[int]]
+    last_pos: Mapped[Optional[int]]
+    computed_at: Mapped[str]
+
+    def __repr__(self) -> str:
+        return f"LessonTokenCount(lesson_id={self.lesson_id!r}, token_id={self.token_id!r}, count_total={self.count_total!r})"
+
+
+class LessonTokenOccurrence(Base):
+    __tablename__ = "lesson_token_occurrence"
+    __table_args__ = (
+        Index("idx_lto_lesson", "lesson_id"),
+        Index("idx_lto_token", "token_id"),
+    )
+
+    id: Mapped[int] = mapped_column(primary_key=True)
+    lesson_id: Mapped[int] = mapped_column(ForeignKey("lesson.id", ondelete="CASCADE"))
+    token_id: Mapped[int] = mapped_column(ForeignKey("token.id", ondelete="CASCADE"))
+    start_pos: Mapped[int]
+    end_pos: Mapped[int]
+    matched: Mapped[str]
+
+    def __repr__(self) -> str:
+        return f"LessonTokenOccurrence(id={self.id!r}, lesson_id={self.lesson_id!r}, token_id={self.token_id!r}, matched={self.matched!r})"
+
+
+class LessonLexStats(Base):
+    __tablename__ = "lesson_lex_stats"
+    __table_args__ = (
+        Index("idx_lls_lang", "language"),
+    )
+
+    lesson_id: Mapped[int] = mapped_column(ForeignKey("lesson.id", ondelete="CASCADE"), primary_key=True)
+    language: Mapped[str]
+    words_total: Mapped[int] = mapped_column(default=0)
+    words_unique: Mapped[int] = mapped_column(default=0)
+    phrases_total: Mapped[int] = mapped_column(default=0)
+    phrases_unique: Mapped[int] = mapped_column(default=0)
+    chars_total: Mapped[int] = mapped_column(default=0)
+    computed_at: Mapped[str]
+
+    def __repr__(self) -> str:
+        return f"LessonLexStats(lesson_id={self.lesson_id!r}, language={self.language!r}, words_total={self.words_total!r}, words_unique={self.words_unique!r})"
+
+
+class TokenFrequency(Base):
+    __tablename__ = "token_frequency"
+    __table_args__ = (
+        Index("idx_tf_lang_freq", "language", "freq"),
+        Index("idx_tf_lang_type_freq", "language", "token_type", "freq"),
+    )
+
+    token_id: Mapped[int] = mapped_column(ForeignKey("token.id", ondelete="CASCADE"), primary_key=True)
+    language: Mapped[str]
+    token_type: Mapped[str]
+    freq: Mapped[int] = mapped_column(default=0)
+
+    def __repr__(self) -> str:
+        return f"TokenFrequency(token_id={self.token_id!r}, language={self.language!r}, freq={self.freq!r})"
+
+
+class CourseTokenFrequency(Base):
+    __tablename__ = "course_token_frequency"
+    __table_args__ = (
+        Index("idx_ctf_course_freq", "course_id", "freq"),
+        Index("idx_ctf_course_type_freq", "course_id", "token_type", "freq"),
+    )
+
+    course_id: Mapped[int] = mapped_column(ForeignKey("course.id", ondelete="CASCADE"), primary_key=True)
+    token_id: Mapped[int] = mapped_column(ForeignKey("token.id", ondelete="CASCADE"), primary_key=True)
+    language: Mapped[str]
+    token_type: Mapped[str]
+    freq: Mapped[int] = mapped_column(default=0)
+
+    def __repr__(self) -> str:
+        return f"CourseTokenFrequency(course_id={self.course_id!r}, token_id={self.token_id!r}, freq={self.freq!r})"
+
+
+class TokenDictMap(Base):
+    __tablename__ = "token_dict_map"
+    __table_args__ = (
+        Index("idx_tdm_entry", "entry_id"),
+        Index("idx_tdm_sense", "sense_id"),
+    )
+
+    token_id: Mapped[int] = mapped_column(ForeignKey("token.id", ondelete="CASCADE"), primary_key=True)
+    sense_id: Mapped[int] = mapped_column(ForeignKey("dict_sense.id", ondelete="CASCADE"), primary_key=True)
+    entry_id: Mapped[Optional[int]] = mapped_column(ForeignKey("dict_entry.id", ondelete="SET NULL"))
+    confidence: Mapped[Optional[float]]
+    note: Mapped[Optional[str]]
+
+    def __repr__(self) -> str:
+        return f"TokenDictMap(token_id={self.token_id!r}, sense_id={self.sense_id!r}, entry_id={self.entry_id!r})"
+
+
+class CacheEntry(Base):
+    __tablename__ = "cache_entry"
+    __table_args__ = (
+        Index("idx_cache_entry_access", "namespace", "last_access_ts"),
+    )
+
+    namespace: Mapped[str] = mapped_column(primary_key=True)
+    key: Mapped[str] = mapped_column(primary_key=True)
+    value: Mapped[str]
+    size_bytes: Mapped[int]
+    created_ts: Mapped[float]
+    last_access_ts: Mapped[float]
+    expires_ts: Mapped[Optional[float]]
+
+    def __repr__(self) -> str:
+        return f"CacheEntry(namespace={self.namespace!r}, key={self.key!r}, size_bytes={self.size_bytes!r})"
+
+
+class AnnotationChunk(Base):
+    __tablename__ = "annotation_chunk"
+
+    chunk_hash: Mapped[str] = mapped_column(primary_key=True)
+    model: Mapped[str]
+    text: Mapped[str]
+    tokens: Mapped[str]  # JSON list of {value, type, difficulty, translationEN}
+    token_count: Mapped[int] = mapped_column(default=0)
+    created_at: Mapped[str]
+
+    def __repr__(self) -> str:
+        return f"AnnotationChunk(chunk_hash={self.chunk_hash!r}, model={self.model!r}, token_count={self.token_count!r})"
+
+
+class LessonAnnotation(Base):
+    __tablename__ = "lesson_annotation"
+
+    lesson_id: Mapped[int] = mapped_column(ForeignKey("lesson.id", ondelete="CASCADE"), primary_key=True)
+    text_hash: Mapped[str]
+    model: Mapped[str]
+    chunk_hashes: Mapped[str]  # JSON list of annotation_chunk hashes in text order
+    token_count: Mapped[int] = mapped_column(default=0)
+    annotated_at: Mapped[str]
+
+    def __repr__(self) -> str:
+        return f"LessonAnnotation(lesson_id={self.lesson_id!r}, text_hash={self.text_hash!r}, model={self.model!r})"
+
+
+class Job(Base):
+    __tablename__ = "job"
+    __table_args__ = (
+        Index("idx_job_claim", "status", "priority", "run_after_ts"),
+        Index("idx_job_dedupe", "dedupe_key", "status"),
+    )
+
+    id: Mapped[int] = mapped_column(primary_key=True)
+    kind: Mapped[str]
+    payload: Mapped[str]  # JSON
+    status: Mapped[str] = mapped_column(default="queued")  # queued | running | succeeded | failed | cancelled
+    priority: Mapped[int] = mapped_column(default=0)  # lower runs first
+    dedupe_key: Mapped[Optional[str]]
+    attempts: Mapped[int] = mapped_column(default=0)
+    max_attempts: Mapped[int] = mapped_column(default=3)
+    progress: Mapped[float] = mapped_column(default=0.0)  # 0..1
+    message: Mapped[Optional[str]]
+    result: Mapped[Optional[str]]  # JSON
+    error: Mapped[Optional[str]]
+    cancel_requested: Mapped[bool] = mapped_column(default=False)
+    locked_by: Mapped[Optional[str]]
+    created_ts: Mapped[float]
+    run_after_ts: Mapped[float]
+    started_ts: Mapped[Optional[float]]
+    heartbeat_ts: Mapped[Optional[float]]
+    finished_ts: Mapped[Optional[float]]
+
+    def __repr__(self) -> str:
+        return f"Job(id={self.id!r}, kind={self.kind!r}, status={self.status!r}, progress={self.progress!r})"
+
+
+class DataVersion(Base):
+    __tablename__ = "data_version"
+
+    table_name: Mapped[str] = mapped_column(primary_key=True)
+    version: Mapped[int] = mapped_column(default=0)  # bumped by every committed write to the table
+
+    def __repr__(self) -> str:
+        return f"DataVersion(table_name={self.table_name!r}, version={self.version!r})"
@@ -0,0 +1,229 @@
+from typing import Any, Dict, List, Optional, Union
+
+from pydantic import BaseModel, ConfigDict, Field
+from typing_extensions import Annotated
+
+# Response schemas of the entities in ImparaDomainsORM. Routes declare them
+# as response_model, so ORM rows are read through their columns only
+# (relationships are never lazy loaded) and serialized by pydantic-core.
+
+
+class ORMSchema(BaseModel):
+    model_config = ConfigDict(from_attributes=True)
+
+
+class UserSchema(ORMSchema):
+    id: int
+    display_name: str
+    email: Optional[str] = None
+    bio: Optional[str] = None
+    avatar_path: Optional[str] = None
+    created_at: str
+    last_active_at: Optional[str] = None
+
+
+class LanguageSchema(ORMSchema):
+    id: int
+    user_id: int
+    source_language: str
+    target_language: str
+    created_at: str
+
+
+class LanguagesSchema(ORMSchema):
+    code: str
+    name: str
+
+
+class CourseSchema(ORMSchema):
+    id: int
+    user_id: int
+    target_language: str
+    title: str
+    description: Optional[str] = None
+    source_link: Optional[str] = None
+    tags: Optional[str] = None
+    created_at: str
+
+
+class LessonSchema(ORMSchema):
+    id: int
+    user_id: int
+    course_id: int
+    parent_lesson_id: Optional[int] = None
+    title: str
+    description: Optional[str] = None
+    text: Optional[str] = None
+    source_link: Optional[str] = None
+    tags: Optional[str] = None
+    created_at: str
+
+
+class DictEntrySchema(ORMSchema):
+    id: int
+    language: str
+    lemma: str
+    normalized: Optional[str] = None
+    ipa: Optional[str] = None
+    created_at: str
+
+
+class DictSenseSchema(ORMSchema):
+    id: int
+    entry_id: int
+    pos: Optional[str] = None
+    gloss: Optional[str] = None
+    note: Optional[str] = None
+    sense_order: Optional[int] = None
+
+
+class DictTranslationSchema(ORMSchema):
+    id: int
+    sense_id: int
+    target_language: str
+    translation: str
+    note: Optional[str] = None
+
+
+class DictExampleSchema(ORMSchema):
+    id: int
+    sense_id: int
+    example: str
+    translation: Optional[str] = None
+    source: Optional[str] = None
+
+
+class UserSenseStateSchema(ORMSchema):
+    user_id: int
+    sense_id: int
+    srs_level: int
+    last_seen_at: Optional[str] = None
+    next_due_at: Optional[str] = None
+
+
+class TokenSchema(ORMSchema):
+    id: int
+    language: str
+    token: str
+    normalized: Optional[str] = None
+    token_type: str
+    ngrams: int
+    created_at: str
+
+
+class LessonTokenCountSchema(ORMSchema):
+    lesson_id: int
+    token_id: int
+    count_total: int
+    count_unique: int
+    first_pos: Optional[int] = None
+    last_pos: Optional[int] = None
+    computed_at: str
+
+
+class LessonTokenOccurrenceSchema(ORMSchema):
+    id: int
+    lesson_id: int
+    token_id: int
+    start_pos: int
+    end_pos: int
+    matched: str
+
+
+class LessonLexStatsSchema(ORMSchema):
+    lesson_id: int
+    language: str
+    words_total: int
+    words_unique: int
+    phrases_total: int
+    phrases_unique: int
+    chars_total: int
+    computed_at: str
+
+
+class TokenFrequencySchema(ORMSchema):
+    token_id: int
+    language: str
+    token_type: str
+    freq: int
+
+
+class CourseTokenFrequencySchema(ORMSchema):
+    course_id: int
+    token_id: int
+    language: str
+    token_type: str
+    freq: int
+
+
+class TokenDictMapSchema(ORMSchema):
+    token_id: int
+    sense_id: int
+    entry_id: Optional[int] = None
+    confidence: Optional[float] = None
+    note: Optional[str] = None
+
+
+class CacheEntrySchema(ORMSchema):
+    namespace: str
+    key: str
+    value: str
+    size_bytes: int
+    created_ts: float
+    last_access_ts: float
+    expires_ts: Optional[float] = None
+
+
+class AnnotationChunkSchema(ORMSchema):
+    chunk_hash: str
+    model: str
+    text: str
+    tokens: str
+    token_count: int
+    created_at: str
+
+
+class LessonAnnotationSchema(ORMSchema):
+    lesson_id: int
+    text_hash: str
+    model: str
+    chunk_hashes: str
+    token_count: int
+    annotated_at: str
+
+
+class DataVersionSchema(ORMSchema):
+    table_name: str
+    version: int
+
+
+class JobSchema(ORMSchema):
+    """
+    A job as returned by JobQueue, with payload and result decoded.
+    """
+    id: int
+    kind: str
+    payload: Dict[str, Any]
+    status: str
+    priority: int
+    dedupe_key: Optional[str] = None
+    attempts: int
+    max_attempts: int
+    progress: float
+    message: Optional[str] = None
+    result: Any = None
+    error: Optional[str] = None
+    cancel_requested: bool
+    created_ts: float
+    run_after_ts: float
+    started_ts: Optional[float] = None
+    finished_ts: Optional[float] = None
+
+
+def page_of(schema):
+    """
+    Response type of list routes with ?fields= projection, for the API
+    docs. Projected rows are plain dicts with only the requested columns;
+    the routes send them without validating them against schema.
+    """
+    return Annotated[Union[List[schema], List[Dict[str, Any]]], Field(union_mode="left_to_right")]
@@ -0,0 +1,12 @@
+from typing import Optional
+
+from pydantic import BaseModel
+
+class LLMChatRequest(BaseModel):
+    system: str
+    prompt: str
+    model: Optional[str] = None
+    backend: Optional[str] = None
+    json_mode: bool = False
+    temperature: Optional[float] = None
+    priority: str = "interactive"
@@ -4,3 +4,4 @@ class OpenAIRequest(BaseModel):
     model: str
     system: str
     prompt: str
+    cache: bool = True
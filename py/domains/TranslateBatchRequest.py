@@ -0,0 +1,12 @@
+from typing import List, Optional
+
+from pydantic import BaseModel, ConfigDict, Field
+
+class TranslateBatchRequest(BaseModel):
+    model_config = ConfigDict(populate_by_name=True)
+
+    texts: List[str]
+    to: str
+    from_lang: Optional[str] = Field(default=None, alias="from")
+    concurrency: Optional[int] = None
+    cache: bool = True
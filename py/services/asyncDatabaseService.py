@@ -0,0 +1,191 @@
+import asyncio
+import json
+from typing import List, Optional
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+
+from py.domains.ImparaDomainsORM import (
+    Course, DictEntry, DictExample, DictSense, DictTranslation, Language, Languages,
+    Lesson, LessonAnnotation, LessonLexStats, LessonTokenOccurrence
+)
+from py.services.databaseQueries import (
+    DICTIONARY_TABLES, annotation_chunks_queries, dictionary_entry_query, dictionary_tree,
+    lesson_annotation_result, lesson_occurrences_query, lesson_tokens_query, lookup_entries_queries,
+    lookup_forms, lookup_result, page_query, row_dict, top_level_lessons_query, user_states_queries
+)
+from py.services.entityCache import EntityCache
+from py.services.lessonTokenizer import LessonTokenizer
+from py.services.sqlitePragmas import apply_sqlite_pragmas
+
+
+class AsyncImparaDB:
+    """
+    Read side of ImparaDB on SQLAlchemy's asyncio extension (aiosqlite), for
+    async routes. Queries await the database instead of holding a
+    threadpool worker.
+
+    The schema, the seed data and all writes stay with the sync ImparaDB on
+    the same file, which scripts keep using. Methods return the same data
+    as their ImparaDB counterparts. Passing ImparaDB's cache shares its
+    rows and dictionary entries, and its invalidation.
+    """
+
+    def __init__(self, db_filename, max_ngram: int = 3, cache: Optional[EntityCache] = None,
+                 sqlite_pragmas: Optional[dict] = None):
+        self.tokenizer = LessonTokenizer(max_ngram=max_ngram)
+        self.cache = cache or EntityCache(None, mode="off")
+        self.engine = create_async_engine(f"sqlite+aiosqlite:///{db_filename}")
+        apply_sqlite_pragmas(self.engine, sqlite_pragmas)
+        self.sessions = async_sessionmaker(self.engine, class_=AsyncSession, expire_on_commit=False)
+
+    async def close(self):
+        await self.engine.dispose()
+
+    async def _all(self, query) -> list:
+        async with self.sessions() as session:
+            return list(await session.scalars(query))
+
+    async def _get(self, model, key):
+        async with self.sessions() as session:
+            return await session.get(model, key)
+
+    async def _get_cached(self, model, key):
+        return await self.cache.load_async(
+            (model.__tablename__, key), lambda: self._get(model, key), (model.__tablename__,)
+        )
+
+    async def _list_page(self, model, filters=(), after_id: Optional[int] = None,
+                         limit: Optional[int] = None, fields: Optional[List[str]] = None):
+        query = page_query(model, filters, after_id, limit, fields)
+        async with self.sessions() as session:
+            if fields:
+                return [dict(row._mapping) for row in await session.execute(query)]
+            return list(await session.scalars(query))
+
+    # ==================== LANGUAGES ====================
+
+    async def list_languages(self) -> List[Languages]:
+        return await self._all(select(Languages))
+
+    async def list_user_languages(self, user_id: int) -> List[Language]:
+        return await self._all(select(Language).where(Language.user_id == user_id))
+
+    # ==================== COURSES ====================
+
+    async def get_course(self, course_id: int) -> Optional[Course]:
+        return await self._get_cached(Course, course_id)
+
+    async def list_courses(self, after_id: Optional[int] = None, limit: Optional[int] = None,
+                           fields: Optional[List[str]] = None) -> List[Course]:
+        return await self._list_page(Course, after_id=after_id, limit=limit, fields=fields)
+
+    async def list_courses_by_user(self, user_id: int) -> List[Course]:
+        return await self._all(select(Course).where(Course.user_id == user_id))
+
+    async def list_courses_by_target_language(self, target_language: str) -> List[Course]:
+        return await self._all(select(Course).where(Course.target_language == target_language))
+
+    # ==================== LESSONS ====================
+
+    async def get_lesson(self, lesson_id: int) -> Optional[Lesson]:
+        return await self._get_cached(Lesson, lesson_id)
+
+    async def list_lessons(self, after_id: Optional[int] = None, limit: Optional[int] = None,
+                           fields: Optional[List[str]] = None) -> List[Lesson]:
+        return await self._list_page(Lesson, after_id=after_id, limit=limit, fields=fields)
+
+    async def list_lessons_by_course(self, course_id: int) -> List[Lesson]:
+        return await self._all(select(Lesson).where(Lesson.course_id == course_id))
+
+    async def list_lessons_by_user(self, user_id: int) -> List[Lesson]:
+        return await self._all(select(Lesson).where(Lesson.user_id == user_id))
+
+    async def list_top_level_lessons(self, course_id: int) -> List[Lesson]:
+        return await self._all(top_level_lessons_query(course_id))
+
+    async def list_lesson_tokens(self, lesson_id: int, token_type: Optional[str] = None) -> List[dict]:
+        async with self.sessions() as session:
+            return [dict(row._mapping) for row in await session.execute(lesson_tokens_query(lesson_id, token_type))]
+
+    async def list_lesson_token_occurrences(self, lesson_id: int) -> List[LessonTokenOccurrence]:
+        return await self._all(lesson_occurrences_query(lesson_id))
+
+    async def get_lesson_lex_stats(self, lesson_id: int) -> Optional[LessonLexStats]:
+        return await self._get(LessonLexStats, lesson_id)
+
+    async def get_annotation_chunks(self, chunk_hashes: List[str]) -> dict:
+        result = {}
+        async with self.sessions() as session:
+            for query in annotation_chunks_queries(chunk_hashes):
+                for chunk_hash, tokens in await session.execute(query):
+                    result[chunk_hash] = json.loads(tokens)
+        return result
+
+    async def get_lesson_annotation(self, lesson_id: int) -> Optional[dict]:
+        annotation = await self._get(LessonAnnotation, lesson_id)
+        if annotation is None:
+            return None
+        chunks = await self.get_annotation_chunks(json.loads(annotation.chunk_hashes))
+        return lesson_annotation_result(annotation, chunks)
+
+    # ==================== DICTIONARY ====================
+
+    async def get_dict_entry(self, entry_id: int) -> Optional[DictEntry]:
+        return await self._get_cached(DictEntry, entry_id)
+
+    async def get_dict_entry_by_lemma(self, language: str, lemma: str) -> Optional[DictEntry]:
+        async def load():
+            async with self.sessions() as session:
+                return await session.scalar(
+                    select(DictEntry).where(DictEntry.language == language, DictEntry.lemma == lemma)
+                )
+        return await self.cache.load_async(("dict_entry_lemma", language, lemma), load, ("dict_entry",), derived=True)
+
+    async def list_dict_entries(self, after_id: Optional[int] = None, limit: Optional[int] = None,
+                                fields: Optional[List[str]] = None) -> List[DictEntry]:
+        return await self._list_page(DictEntry, after_id=after_id, limit=limit, fields=fields)
+
+    async def list_dict_entries_by_language(self, language: str, after_id: Optional[int] = None,
+                                            limit: Optional[int] = None,
+                                            fields: Optional[List[str]] = None) -> List[DictEntry]:
+        return await self._list_page(DictEntry, [DictEntry.language == language], after_id, limit, fields)
+
+    async def list_dict_senses_by_entry(self, entry_id: int) -> List[DictSense]:
+        return await self._all(select(DictSense).where(DictSense.entry_id == entry_id))
+
+    async def list_dict_translations_by_sense(self, sense_id: int) -> List[DictTranslation]:
+        return await self._all(select(DictTranslation).where(DictTranslation.sense_id == sense_id))
+
+    async def list_dict_examples_by_sense(self, sense_id: int) -> List[DictExample]:
+        return await self._all(select(DictExample).where(DictExample.sense_id == sense_id))
+
+    async def get_dictionary_entry(self, language: str, lemma: str,
+                                   target_language: Optional[str] = None) -> Optional[dict]:
+        async def load():
+            async with self.sessions() as session:
+                entry = await session.scalar(dictionary_entry_query(language, lemma, target_language))
+                return dictionary_tree(entry) if entry is not None else None
+        return await self.cache.load_async(
+            ("dictionary", language, lemma, target_language), load, DICTIONARY_TABLES, derived=True
+        )
+
+    async def lookup_dictionary(self, language: str, tokens: Optional[List[str]] = None, text: Optional[str] = None,
+                                user_id: Optional[int] = None, target_language: Optional[str] = None) -> dict:
+        if text:
+            # tokenizing a long text would stall the event loop
+            surfaces, lemma_forms, normalized_forms = await asyncio.to_thread(lookup_forms, self.tokenizer, tokens, text)
+        else:
+            surfaces, lemma_forms, normalized_forms = lookup_forms(self.tokenizer, tokens)
+        entries = {}
+        states = {}
+        async with self.sessions() as session:
+            for query in lookup_entries_queries(language, lemma_forms, normalized_forms, target_language):
+                for entry in await session.scalars(query):
+                    entries[entry.id] = entry
+            if user_id is not None:
+                sense_ids = [sense.id for entry in entries.values() for sense in entry.senses]
+                for query in user_states_queries(user_id, sense_ids):
+                    for state in await session.scalars(query):
+                        states[state.sense_id] = row_dict(state)
+            return lookup_result(self.tokenizer, language, surfaces, entries, states)
@@ -0,0 +1,410 @@
+import asyncio
+import json
+import time
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import httpx
+
+from py.services.lessonAnnotator import (
+    SYSTEM_PROMPT as ANNOTATION_SYSTEM_PROMPT,
+    USER_PROMPT as ANNOTATION_USER_PROMPT,
+    LessonAnnotator, extract_json, text_hash, validate_tokens
+)
+from py.services.llmGateway import LLMGateway, LLMRequest, PRIORITY_BACKGROUND
+
+GLOSS_SYSTEM_PROMPT = "You are a lexicographer and a JSON API. Output MUST be valid JSON only. No markdown, no explanations."
+
+GLOSS_USER_PROMPT = """Return ONLY JSON matching this schema:
+{{"senses":[{{"pos":"noun|verb|adjective|adverb|pronoun|preposition|conjunction|determiner|interjection|numeral|other","gloss":"string","translations":["string"]}}]}}
+
+Rules:
+- List the main senses (at most 3) of the {language} word below, most common first.
+- gloss is a short English definition.
+- translations are 1-3 short {target_language} translations of that sense.
+Word: {lemma}"""
+
+
+# ==================== JOB FILES ====================
+#
+# A job is three files next to each other:
+#   <name>.jsonl           requests in the OpenAI batch input format
+#   <name>.manifest.json   what the requests are for, used when loading
+#   <name>.results.jsonl   responses in the OpenAI batch output format
+
+def manifest_path(job_path: Path) -> Path:
+    return job_path.with_suffix(".manifest.json")
+
+
+def results_path(job_path: Path) -> Path:
+    return job_path.with_suffix(".results.jsonl")
+
+
+def write_jsonl(path: Path, lines: Iterable[dict]) -> int:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    count = 0
+    with open(path, "w", encoding="utf-8") as f:
+        for line in lines:
+            f.write(json.dumps(line, ensure_ascii=False) + "\n")
+            count += 1
+    return count
+
+
+def read_jsonl(path: Path) -> List[dict]:
+    with open(path, "r", encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def chat_request(custom_id: str, model: str, system: str, prompt: str) -> dict:
+    return {
+        "custom_id": custom_id,
+        "method": "POST",
+        "url": "/v1/chat/completions",
+        "body": {
+            "model": model,
+            "messages": [
+                {"role": "system", "content": system},
+                {"role": "user", "content": prompt}
+            ],
+            "temperature": 0,
+            "response_format": {"type": "json_object"}
+        }
+    }
+
+
+def result_content(result: dict) -> str:
+    """
+    Returns the message content of one batch output line, or raises
+    ValueError with the reason the request failed.
+    """
+    if result.get("error"):
+        raise ValueError(json.dumps(result["error"], ensure_ascii=False))
+    response = result.get("response") or {}
+    if response.get("status_code") != 200:
+        raise ValueError(f"status {response.get('status_code')}: {json.dumps(response.get('body'), ensure_ascii=False)}")
+    return response["body"]["choices"][0]["message"]["content"]
+
+
+def served_by(result: dict, model: str) -> bool:
+    """
+    Whether a batch output line was answered by model. Providers may name
+    a snapshot of it, e.g. gpt-4o-mini-2024-07-18 or llama3:latest.
+    """
+    served = ((result.get("response") or {}).get("body") or {}).get("model") or ""
+    return served == model or served.startswith((model + "-", model + ":"))
+
+
+# ==================== PREPARE ====================
+
+class BatchJobBuilder:
+    """
+    Turns a backlog into batch requests plus a manifest.
+    """
+
+    def __init__(self, db, model: str = "gpt-4o-mini"):
+        self.db = db
+        self.model = model
+
+    def glosses(self, language: str, target_language: str = "en",
+                limit: Optional[int] = None) -> Tuple[List[dict], dict]:
+        """
+        One request per dictionary entry of the language that has no senses yet.
+        """
+        lines = []
+        for entry in self.db.list_dict_entries_without_senses(language, limit):
+            prompt = GLOSS_USER_PROMPT.format(language=language, target_language=target_language, lemma=entry.lemma)
+            lines.append(chat_request(f"gloss-{entry.id}", self.model, GLOSS_SYSTEM_PROMPT, prompt))
+        manifest = {
+            "kind": "glosses",
+            "model": self.model,
+            "language": language,
+            "target_language": target_language,
+            "created_at": time.time(),
+        }
+        return lines, manifest
+
+    def annotate(self, course_id: int, max_chars: int = 1200) -> Tuple[List[dict], dict]:
+        """
+        One request per lesson chunk of the course that is not annotated yet.
+        Chunks shared by several lessons are requested once.
+        """
+        annotator = LessonAnnotator(complete=None, max_chars=max_chars)
+        plans = [
+            (lesson.id, annotator.plan(lesson.text or "", self.model))
+            for lesson in self.db.list_lessons_by_course(course_id)
+        ]
+        hashes = list(dict.fromkeys(c.chunk_hash for _, plan in plans for c in plan.chunks))
+        known = self.db.get_annotation_chunks(hashes)
+
+        lines = []
+        chunks = {}
+        for _, plan in plans:
+            for chunk in plan.chunks:
+                if chunk.chunk_hash in known or chunk.chunk_hash in chunks:
+                    continue
+                chunks[chunk.chunk_hash] = chunk.text
+                prompt = ANNOTATION_USER_PROMPT.format(text=chunk.text)
+                lines.append(chat_request(f"chunk-{chunk.chunk_hash}", self.model, ANNOTATION_SYSTEM_PROMPT, prompt))
+        manifest = {
+            "kind": "annotate",
+            "model": self.model,
+            "course_id": course_id,
+            "chunks": chunks,
+            "lessons": {
+                str(lesson_id): {"text_hash": plan.text_hash, "chunk_hashes": [c.chunk_hash for c in plan.chunks]}
+                for lesson_id, plan in plans
+            },
+            "created_at": time.time(),
+        }
+        return lines, manifest
+
+
+# ==================== RUN ====================
+
+class OpenAIBatchRunner:
+    """
+    Runs a job through the OpenAI Batch API: upload the input file, create
+    the batch, poll until it is done and download the output (and error)
+    file. base_url can point at any server implementing these endpoints.
+    """
+
+    TERMINAL = {"completed", "failed", "expired", "cancelled"}
+
+    def __init__(self, api_key: str, base_url: str = "https://api.openai.com/v1",
+                 poll_interval: float = 30.0, completion_window: str = "24h", timeout: float = 120.0):
+        self.http = httpx.Client(
+            base_url=base_url.rstrip("/"),
+            headers={"Authorization": f"Bearer {api_key}"},
+            timeout=timeout,
+        )
+        self.poll_interval = poll_interval
+        self.completion_window = completion_window
+
+    def run(self, job_path: Path, output_path: Path, log=print) -> dict:
+        with open(job_path, "rb") as f:
+            response = self.http.post("/files", data={"purpose": "batch"}, files={"file": (job_path.name, f)})
+        response.raise_for_status()
+        file_id = response.json()["id"]
+
+        response = self.http.post("/batches", json={
+            "input_file_id": file_id,
+            "endpoint": "/v1/chat/completions",
+            "completion_window": self.completion_window,
+        })
+        response.raise_for_status()
+        batch = response.json()
+        log(f"Created batch {batch['id']}")
+
+        while batch["status"] not in self.TERMINAL:
+            time.sleep(self.poll_interval)
+            response = self.http.get(f"/batches/{batch['id']}")
+            response.raise_for_status()
+            batch = response.json()
+            counts = batch.get("request_counts") or {}
+            log(f"Batch {batch['id']}: {batch['status']} "
+                f"({counts.get('completed', 0)}/{counts.get('total', 0)} done, {counts.get('failed', 0)} failed)")
+
+        output_path.parent.mkdir(parents=True, exist_ok=True)
+        with open(output_path, "wb") as out:
+            for key in ("output_file_id", "error_file_id"):
+                if batch.get(key):
+                    response = self.http.get(f"/files/{batch[key]}/content")
+                    response.raise_for_status()
+                    out.write(response.content)
+        return batch
+
+    def close(self):
+        self.http.close()
+
+
+class GatewayBatchRunner:
+    """
+    Runs a job through the LLM gateway at background priority, for backends
+    without a batch API (Ollama, the stub). Writes the batch output format.
+
+    Only as many requests as the backend has slots are in flight; the rest
+    wait here rather than in the gateway's queue. Every result is appended
+    to the output file as it arrives. A job that is run again keeps the
+    successful results and only repeats the requests that failed or never
+    ran.
+
+    Every request asks the backend for the model the job was prepared
+    with; prepare the job with --model for a backend that does not serve
+    batchModel.
+    """
+
+    def __init__(self, gateway: LLMGateway, backend: Optional[str] = None):
+        self.gateway = gateway
+        self.backend = backend
+
+    async def _run_line(self, line: dict) -> dict:
+        body = line["body"]
+        messages = {m["role"]: m["content"] for m in body["messages"]}
+        try:
+            result = await self.gateway.complete(
+                LLMRequest(
+                    system=messages.get("system", ""),
+                    prompt=messages.get("user", ""),
+                    model=body.get("model"),
+                    json_mode=True,
+                    temperature=body.get("temperature"),
+                ),
+                backend=self.backend,
+                priority=PRIORITY_BACKGROUND,
+            )
+        except Exception as e:
+            return {"custom_id": line["custom_id"], "response": None,
+                    "error": {"message": str(e) or type(e).__name__}}
+        return {
+            "custom_id": line["custom_id"],
+            "response": {
+                "status_code": 200,
+                "body": {
+                    "model": result.model,
+                    "choices": [{"index": 0, "message": {"role": "assistant", "content": result.text}}],
+                    "usage": result.usage,
+                },
+            },
+            "error": None,
+        }
+
+    @staticmethod
+    def _succeeded(output_path: Path) -> set:
+        """
+        Drops the failed results of an earlier run from the output file and
+        returns the custom_ids that succeeded.
+        """
+        if not output_path.exists():
+            return set()
+        kept = [r for r in read_jsonl(output_path) if not r.get("error")]
+        write_jsonl(output_path, kept)
+        return {r["custom_id"] for r in kept}
+
+    async def run(self, job_path: Path, output_path: Path) -> dict:
+        done = self._succeeded(output_path)
+        lines = [line for line in read_jsonl(job_path) if line["custom_id"] not in done]
+        pending = iter(lines)
+        failed = 0
+        output_path.parent.mkdir(parents=True, exist_ok=True)
+        with open(output_path, "a", encoding="utf-8") as out:
+            async def worker():
+                nonlocal failed
+                for line in pending:
+                    result = await self._run_line(line)
+                    failed += result["error"] is not None
+                    out.write(json.dumps(result, ensure_ascii=False) + "\n")
+                    out.flush()
+
+            slots = self.gateway.backend(self.backend).max_concurrency
+            await asyncio.gather(*(worker() for _ in range(max(1, min(slots, len(lines))))))
+        return {
+            "total": len(done) + len(lines),
+            "skipped": len(done),
+            "failed": failed,
+        }
+
+
+# ==================== LOAD ====================
+
+def validate_senses(data) -> List[dict]:
+    senses = data.get("senses") if isinstance(data, dict) else None
+    if not isinstance(senses, list):
+        raise ValueError("Result has no 'senses' list")
+    result = []
+    for sense in senses:
+        if not isinstance(sense, dict) or not isinstance(sense.get("gloss"), str) or not sense["gloss"].strip():
+            continue
+        translations = sense.get("translations")
+        result.append({
+            "pos": sense["pos"].strip().lower() if isinstance(sense.get("pos"), str) else None,
+            "gloss": sense["gloss"].strip(),
+            "translations": [
+                t.strip() for t in (translations if isinstance(translations, list) else [])
+                if isinstance(t, str) and t.strip()
+            ],
+        })
+    if not result:
+        raise ValueError("Result contains no senses")
+    return result
+
+
+class BatchResultLoader:
+    """
+    Validates batch results and bulk-loads them into the database.
+    """
+
+    def __init__(self, db):
+        self.db = db
+
+    def load(self, manifest: dict, results: List[dict]) -> dict:
+        if manifest["kind"] == "glosses":
+            return self._load_glosses(manifest, results)
+        if manifest["kind"] == "annotate":
+            return self._load_annotations(manifest, results)
+        raise ValueError(f"Unknown job kind: {manifest['kind']}")
+
+    @staticmethod
+    def _parsed(results: List[dict], prefix: str, model: str, validate) -> Tuple[Dict[str, object], Dict[str, str]]:
+        """
+        Results answered by another model than the job's are rejected: the
+        job's model is what gets stored, and it is part of the chunk hashes.
+        """
+        parsed, errors = {}, {}
+        for result in results:
+            custom_id = result.get("custom_id", "")
+            if not custom_id.startswith(prefix):
+                continue
+            key = custom_id[len(prefix):]
+            try:
+                content = result_content(result)
+                if not served_by(result, model):
+                    raise ValueError(f"answered by {result['response']['body'].get('model')}, "
+                                     f"the job was prepared for {model}")
+                parsed[key] = validate(extract_json(content), key)
+            except Exception as e:
+                errors[custom_id] = str(e) or type(e).__name__
+        return parsed, errors
+
+    def _load_glosses(self, manifest: dict, results: List[dict]) -> dict:
+        parsed, errors = self._parsed(
+            results, "gloss-", manifest["model"], lambda data, entry_id: validate_senses(data)
+        )
+        counts = self.db.bulk_insert_dict_senses(
+            {int(entry_id): senses for entry_id, senses in parsed.items()},
+            manifest["target_language"]
+        )
+        return {**counts, "failed": len(errors), "errors": errors}
+
+    def _load_annotations(self, manifest: dict, results: List[dict]) -> dict:
+        chunks = manifest["chunks"]
+        parsed, errors = self._parsed(
+            results, "chunk-", manifest["model"], lambda data, chunk_hash: validate_tokens(data, chunks.get(chunk_hash))
+        )
+        self.db.save_annotation_chunks(
+            manifest["model"],
+            [(chunk_hash, chunks[chunk_hash], tokens) for chunk_hash, tokens in parsed.items() if chunk_hash in chunks]
+        )
+
+        # a lesson is annotated once all its chunks are stored and its text is unchanged
+        lessons = manifest["lessons"]
+        all_hashes = list(dict.fromkeys(h for lesson in lessons.values() for h in lesson["chunk_hashes"]))
+        known = self.db.get_annotation_chunks(all_hashes)
+        annotated, incomplete = 0, 0
+        for lesson_id, lesson in lessons.items():
+            current = self.db.get_lesson(int(lesson_id))
+            if (current is None or text_hash(current.text or "") != lesson["text_hash"]
+                    or not all(h in known for h in lesson["chunk_hashes"])):
+                incomplete += 1
+                continue
+            self.db.save_lesson_annotation(
+                int(lesson_id), lesson["text_hash"], manifest["model"], lesson["chunk_hashes"],
+                sum(len(known[h]) for h in lesson["chunk_hashes"])
+            )
+            annotated += 1
+        return {
+            "chunks": len(parsed),
+            "lessons_annotated": annotated,
+            "lessons_incomplete": incomplete,
+            "failed": len(errors),
+            "errors": errors,
+        }
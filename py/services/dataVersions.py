@@ -0,0 +1,86 @@
+import secrets
+import sqlite3
+import threading
+from typing import Dict, Iterable, Tuple
+
+from sqlalchemy import event
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.orm import Session
+
+from py.domains.ImparaDomainsORM import DataVersion
+
+VERSIONED_TABLES = (
+    "user", "language", "languages", "course", "lesson",
+    "dict_entry", "dict_sense", "dict_translation", "dict_example", "user_sense_state", "token_dict_map",
+    "token_frequency",
+)
+
+
+class DataVersions:
+    """
+    Version counters of tables, bumped in the data_version table in the same
+    transaction as every write made through a Session on the engine: ORM
+    flushes as well as bulk insert/update/delete statements.
+
+    Readers get the counters from memory. They are reread only after SQLite
+    reports a commit on the file (PRAGMA data_version on a connection of
+    our own), so they follow writes from other processes too. Counters
+    start at a random value, so a recreated database does not repeat the
+    versions of the old one; 0 means the table was never written.
+    """
+
+    def __init__(self, engine, tables: Iterable[str] = VERSIONED_TABLES):
+        self.engine = engine
+        self.tables = frozenset(tables)
+        self._lock = threading.Lock()
+        self._versions: Dict[str, int] = {}
+        self._data_version = None
+        self._probe = sqlite3.connect(engine.url.database, check_same_thread=False, isolation_level=None)
+        event.listen(Session, "after_flush", self._after_flush)
+        event.listen(Session, "do_orm_execute", self._do_orm_execute)
+
+    def close(self):
+        event.remove(Session, "after_flush", self._after_flush)
+        event.remove(Session, "do_orm_execute", self._do_orm_execute)
+        with self._lock:
+            self._probe.close()
+
+    def _bump(self, session: Session, tables: Iterable[str]):
+        tables = self.tables.intersection(tables)
+        if not tables:
+            return
+        table = DataVersion.__table__
+        stmt = sqlite_insert(table).values([
+            {"table_name": name, "version": secrets.randbelow(1 << 30) + 1} for name in sorted(tables)
+        ])
+        session.connection().execute(
+            stmt.on_conflict_do_update(index_elements=["table_name"], set_={"version": table.c.version + 1})
+        )
+
+    def _after_flush(self, session: Session, flush_context):
+        if session.bind is not self.engine:
+            return
+        # new/dirty/deleted still hold the flushed objects at this point
+        self._bump(session, {obj.__table__.name for obj in (*session.new, *session.dirty, *session.deleted)})
+
+    def _do_orm_execute(self, state):
+        if state.session.bind is not self.engine or not (state.is_insert or state.is_update or state.is_delete):
+            return
+        name = getattr(state.statement.table, "name", None)
+        if name is not None:
+            self._bump(state.session, [name])
+
+    def current(self) -> Dict[str, int]:
+        with self._lock:
+            (data_version,) = self._probe.execute("PRAGMA data_version").fetchone()
+            if data_version != self._data_version:
+                self._versions = dict(self._probe.execute("SELECT table_name, version FROM data_version"))
+                self._data_version = data_version
+            return self._versions
+
+    def get(self, *tables: str) -> Tuple[int, ...]:
+        versions = self.current()
+        return tuple(versions.get(name, 0) for name in tables)
+
+    def etag(self, *tables: str) -> str:
+        return '"' + ".".join(str(v) for v in self.get(*tables)) + '"'
@@ -0,0 +1,207 @@
+"""
+Statements and result shaping shared by ImparaDB and AsyncImparaDB, so the
+sync and the async layer return the same data.
+"""
+import json
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import Select, select
+from sqlalchemy.orm import selectinload
+
+from py.domains.ImparaDomainsORM import (
+    AnnotationChunk, DictEntry, DictSense, DictTranslation, Lesson, LessonTokenCount, LessonTokenOccurrence,
+    Token, UserSenseState
+)
+from py.services.lessonTokenizer import LessonTokenizer
+
+# SQLite limits the number of bound parameters per statement
+IN_CLAUSE_CHUNK_SIZE = 500
+
+# page size of the list routes when no limit is given, and the largest allowed
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 1000
+
+# tables a dictionary_tree() is read from
+DICTIONARY_TABLES = ("dict_entry", "dict_sense", "dict_translation", "dict_example")
+
+
+def page_query(model, filters=(), after_id: Optional[int] = None,
+               limit: Optional[int] = None, fields: Optional[List[str]] = None) -> Select:
+    """
+    Rows ordered by id, starting after the keyset cursor after_id. With
+    fields only those columns (plus id) are selected.
+    """
+    if fields:
+        columns = model.__table__.columns
+        unknown = [f for f in fields if f not in columns]
+        if unknown:
+            raise ValueError(f"Unknown fields for {model.__name__}: {', '.join(unknown)}")
+        names = ["id"] + [f for f in dict.fromkeys(fields) if f != "id"]
+        query = select(*[columns[name] for name in names])
+    else:
+        query = select(model)
+    query = query.where(*filters)
+    if after_id is not None:
+        query = query.where(model.id > after_id)
+    query = query.order_by(model.id)
+    if limit is not None:
+        query = query.limit(limit)
+    return query
+
+
+def top_level_lessons_query(course_id: int) -> Select:
+    return select(Lesson).where(Lesson.course_id == course_id, Lesson.parent_lesson_id.is_(None))
+
+
+def lesson_tokens_query(lesson_id: int, token_type: Optional[str] = None) -> Select:
+    query = select(
+        Token.id, Token.token, Token.normalized, Token.token_type, Token.ngrams,
+        LessonTokenCount.count_total, LessonTokenCount.first_pos, LessonTokenCount.last_pos
+    ).join(LessonTokenCount, LessonTokenCount.token_id == Token.id).where(
+        LessonTokenCount.lesson_id == lesson_id
+    )
+    if token_type:
+        query = query.where(Token.token_type == token_type)
+    return query.order_by(LessonTokenCount.count_total.desc(), Token.token)
+
+
+def lesson_occurrences_query(lesson_id: int) -> Select:
+    return select(LessonTokenOccurrence).where(
+        LessonTokenOccurrence.lesson_id == lesson_id
+    ).order_by(LessonTokenOccurrence.start_pos)
+
+
+def row_dict(obj) -> dict:
+    return {c.key: getattr(obj, c.key) for c in obj.__table__.columns}
+
+
+def sense_translations(target_language: Optional[str] = None):
+    if target_language:
+        return DictSense.translations.and_(DictTranslation.target_language == target_language)
+    return DictSense.translations
+
+
+def dictionary_tree_options(target_language: Optional[str] = None) -> list:
+    return [
+        selectinload(DictEntry.senses).selectinload(sense_translations(target_language)),
+        selectinload(DictEntry.senses).selectinload(DictSense.examples),
+    ]
+
+
+def dictionary_entry_query(language: str, lemma: str, target_language: Optional[str] = None) -> Select:
+    return (
+        select(DictEntry)
+        .where(DictEntry.language == language, DictEntry.lemma == lemma)
+        .options(*dictionary_tree_options(target_language))
+    )
+
+
+def dictionary_tree(entry: DictEntry) -> dict:
+    tree = row_dict(entry)
+    tree["senses"] = [
+        {
+            **row_dict(sense),
+            "translations": [row_dict(t) for t in sense.translations],
+            "examples": [row_dict(ex) for ex in sense.examples],
+        }
+        for sense in entry.senses
+    ]
+    return tree
+
+
+def lookup_forms(tokenizer: LessonTokenizer, tokens: Optional[List[str]] = None,
+                 text: Optional[str] = None) -> Tuple[List[str], List[str], List[str]]:
+    """
+    Returns the distinct surfaces to look up and the lemma and normalized
+    forms to query for them.
+    """
+    if text:
+        tokens = [m.matched for m in tokenizer.tokenize(text) if m.token_type == "word"]
+    surfaces = list(dict.fromkeys(t for t in (tokens or []) if t))
+    lemma_forms = list({form for t in surfaces for form in (t, t.lower())})
+    normalized_forms = list({tokenizer.normalize(t) for t in surfaces})
+    return surfaces, lemma_forms, normalized_forms
+
+
+def lookup_entries_queries(language: str, lemma_forms: List[str], normalized_forms: List[str],
+                           target_language: Optional[str] = None) -> List[Select]:
+    queries = []
+    for column, values in ((DictEntry.lemma, lemma_forms), (DictEntry.normalized, normalized_forms)):
+        for i in range(0, len(values), IN_CLAUSE_CHUNK_SIZE):
+            queries.append(
+                select(DictEntry)
+                .where(DictEntry.language == language, column.in_(values[i:i + IN_CLAUSE_CHUNK_SIZE]))
+                .options(selectinload(DictEntry.senses).selectinload(sense_translations(target_language)))
+            )
+    return queries
+
+
+def user_states_queries(user_id: int, sense_ids: List[int]) -> List[Select]:
+    return [
+        select(UserSenseState).where(
+            UserSenseState.user_id == user_id,
+            UserSenseState.sense_id.in_(sense_ids[i:i + IN_CLAUSE_CHUNK_SIZE])
+        )
+        for i in range(0, len(sense_ids), IN_CLAUSE_CHUNK_SIZE)
+    ]
+
+
+def annotation_chunks_queries(chunk_hashes: List[str]) -> List[Select]:
+    return [
+        select(AnnotationChunk.chunk_hash, AnnotationChunk.tokens)
+        .where(AnnotationChunk.chunk_hash.in_(chunk_hashes[i:i + IN_CLAUSE_CHUNK_SIZE]))
+        for i in range(0, len(chunk_hashes), IN_CLAUSE_CHUNK_SIZE)
+    ]
+
+
+def lesson_annotation_result(annotation, chunks: Dict[str, List[dict]]) -> Optional[dict]:
+    """
+    Merges the chunk tokens of a stored LessonAnnotation in text order.
+    None if a chunk is missing.
+    """
+    chunk_hashes = json.loads(annotation.chunk_hashes)
+    if len(chunks) < len(set(chunk_hashes)):
+        return None
+    return {
+        "lesson_id": annotation.lesson_id,
+        "text_hash": annotation.text_hash,
+        "model": annotation.model,
+        "annotated_at": annotation.annotated_at,
+        "token_count": annotation.token_count,
+        "tokens": [token for chunk_hash in chunk_hashes for token in chunks[chunk_hash]],
+    }
+
+
+def lookup_result(tokenizer: LessonTokenizer, language: str, surfaces: List[str],
+                  entries: Dict[int, DictEntry], states: Dict[int, dict]) -> dict:
+    by_lemma = {}
+    by_normalized = {}
+    for entry in entries.values():
+        by_lemma.setdefault(entry.lemma, set()).add(entry.id)
+        if entry.normalized:
+            by_normalized.setdefault(entry.normalized, set()).add(entry.id)
+    matches = {}
+    for t in surfaces:
+        ids = by_lemma.get(t, set()) | by_lemma.get(t.lower(), set()) \
+            | by_normalized.get(tokenizer.normalize(t), set())
+        matches[t] = sorted(ids)
+
+    result_entries = []
+    for entry in entries.values():
+        tree = row_dict(entry)
+        tree["senses"] = [
+            {
+                **row_dict(sense),
+                "translations": [row_dict(tr) for tr in sense.translations],
+                "user_state": states.get(sense.id),
+            }
+            for sense in entry.senses
+        ]
+        result_entries.append(tree)
+
+    return {
+        "language": language,
+        "matches": matches,
+        "unknown": [t for t, ids in matches.items() if not ids],
+        "entries": result_entries,
+    }
@@ -1,20 +1,126 @@
 import os
+import zlib
 from typing import List, Optional
 from datetime import datetime
 import json
 
-from sqlalchemy import create_engine, select
+from sqlalchemy import create_engine, select, delete, insert, func, literal
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
 from sqlalchemy.orm import Session
 
 from py.domains.ImparaDomainsORM import (
     User, Language, Languages, Base,
-    Course, Lesson, DictEntry, DictSense, DictTranslation, DictExample, UserSenseState
+    Course, Lesson, DictEntry, DictSense, DictTranslation, DictExample, UserSenseState,
+    Token, LessonTokenCount, LessonTokenOccurrence, LessonLexStats,
+    TokenFrequency, CourseTokenFrequency, TokenDictMap,
+    AnnotationChunk, LessonAnnotation
 )
+from py.services.databaseQueries import (
+    DICTIONARY_TABLES, IN_CLAUSE_CHUNK_SIZE, annotation_chunks_queries, dictionary_entry_query,
+    dictionary_tree, lesson_annotation_result, lesson_occurrences_query, lesson_tokens_query,
+    lookup_entries_queries, lookup_forms, lookup_result, page_query, row_dict, top_level_lessons_query,
+    user_states_queries
+)
+from py.services.dataVersions import DataVersions
+from py.services.entityCache import EntityCache
+from py.services.fullTextSearch import SEARCH_INDEXES, FullTextSearch
+from py.services.learningPriorityCache import LearningPriorityCache
+from py.services.lessonTokenizer import LessonTokenizer, TokenMatch
+from py.services.sqlitePragmas import apply_sqlite_pragmas
 
 PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '../..'))
 
+# Bump when a start has to migrate or backfill data that the schema
+# fingerprint below does not cover.
+SCHEMA_REVISION = 1
+
+LANGUAGES = [
+    # Global major languages
+    ('en', 'English'),
+    ('zh', 'Chinese'),
+    ('hi', 'Hindi'),
+    ('es', 'Spanish'),
+    ('fr', 'French'),
+    ('ar', 'Arabic'),
+    ('bn', 'Bengali'),
+    ('ru', 'Russian'),
+    ('pt', 'Portuguese'),
+    ('ur', 'Urdu'),
+    ('id', 'Indonesian'),
+    ('de', 'German'),
+    ('ja', 'Japanese'),
+    ('sw', 'Swahili'),
+    ('tr', 'Turkish'),
+    ('vi', 'Vietnamese'),
+    ('ko', 'Korean'),
+    ('fa', 'Persian'),
+    ('th', 'Thai'),
+    ('ms', 'Malay'),
+
+    # European languages
+    ('it', 'Italian'),
+    ('nl', 'Dutch'),
+    ('pl', 'Polish'),
+    ('uk', 'Ukrainian'),
+    ('ro', 'Romanian'),
+    ('cs', 'Czech'),
+    ('el', 'Greek'),
+    ('hu', 'Hungarian'),
+    ('sv', 'Swedish'),
+    ('fi', 'Finnish'),
+    ('da', 'Danish'),
+    ('no', 'Norwegian'),
+    ('sk', 'Slovak'),
+    ('bg', 'Bulgarian'),
+    ('hr', 'Croatian'),
+    ('sr', 'Serbian'),
+    ('sl', 'Slovenian'),
+    ('et', 'Estonian'),
+    ('lv', 'Latvian'),
+    ('lt', 'Lithuanian'),
+    ('ga', 'Irish'),
+    ('mt', 'Maltese'),
+    ('is', 'Icelandic'),
+    ('sq', 'Albanian'),
+    ('mk', 'Macedonian'),
+    ('be', 'Belarusian'),
+]
+
+
+def schema_fingerprint() -> int:
+    """
+    Checksum of the ORM tables, the FTS indexes, the seeded languages and
+    SCHEMA_REVISION. ImparaDB stores it in PRAGMA user_version once the
+    schema is created and seeded, and skips that work while it matches.
+    """
+    tables = [
+        (table.name,
+         [(c.name, type(c.type).__name__, c.nullable, c.primary_key) for c in table.columns],
+         sorted(index.name for index in table.indexes))
+        for table in Base.metadata.sorted_tables
+    ]
+    return zlib.crc32(repr((tables, SEARCH_INDEXES, LANGUAGES, SCHEMA_REVISION)).encode()) & 0x7fffffff
+
+
+SCHEMA_MARKER = schema_fingerprint()
+
+# tables the learning priority candidates are read from
+PRIORITY_CANDIDATE_TABLES = ("token_frequency", "token_dict_map", "dict_sense")
+
+
 class ImparaDB:
-    def __init__(self, db_filename):
+    def __init__(self, db_filename, max_ngram: int = 3, cache_mode: str = "off", cache_items: int = 4096,
+                 sqlite_pragmas: Optional[dict] = None):
+        """
+        cache_mode "local" or "versioned" keeps rows read by get_* and
+        dictionary entries in an EntityCache, see there. sqlite_pragmas
+        overrides SQLITE_PRAGMAS, which every connection is opened with.
+        """
+        self.tokenizer = LessonTokenizer(max_ngram=max_ngram)
+        self.learning_priorities = LearningPriorityCache(
+            self._load_priority_candidates,
+            self._load_user_srs_levels
+        )
         # Ensure the directory exists before connecting to the database
         db_dir = os.path.dirname(db_filename)
         os.makedirs(db_dir, exist_ok=True)
@@ -22,70 +128,62 @@ class ImparaDB:
             f"sqlite:///{db_filename}",
             connect_args={"check_same_thread": False}
         )
-        Base.metadata.create_all(self.engine) # <- creates missing tables based on the ORM models
-        
-        language_list = [
-                    # Global major languages
-                    ('en', 'English'),
-                    ('zh', 'Chinese'),
-                    ('hi', 'Hindi'),
-                    ('es', 'Spanish'),
-                    ('fr', 'French'),
-                    ('ar', 'Arabic'),
-                    ('bn', 'Bengali'),
-                    ('ru', 'Russian'),
-                    ('pt', 'Portuguese'),
-                    ('ur', 'Urdu'),
-                    ('id', 'Indonesian'),
-                    ('de', 'German'),
-                    ('ja', 'Japanese'),
-                    ('sw', 'Swahili'),
-                    ('tr', 'Turkish'),
-                    ('vi', 'Vietnamese'),
-                    ('ko', 'Korean'),
-                    ('fa', 'Persian'),
-                    ('th', 'Thai'),
-                    ('ms', 'Malay'),
-
-                    # European languages
-                    ('it', 'Italian'),
-                    ('nl', 'Dutch'),
-                    ('pl', 'Polish'),
-                    ('uk', 'Ukrainian'),
-                    ('ro', 'Romanian'),
-                    ('cs', 'Czech'),
-                    ('el', 'Greek'),
-                    ('hu', 'Hungarian'),
-                    ('sv', 'Swedish'),
-                    ('fi', 'Finnish'),
-                    ('da', 'Danish'),
-                    ('no', 'Norwegian'),
-                    ('sk', 'Slovak'),
-                    ('bg', 'Bulgarian'),
-                    ('hr', 'Croatian'),
-                    ('sr', 'Serbian'),
-                    ('sl', 'Slovenian'),
-                    ('et', 'Estonian'),
-                    ('lv', 'Latvian'),
-                    ('lt', 'Lithuanian'),
-                    ('ga', 'Irish'),
-                    ('mt', 'Maltese'),
-                    ('is', 'Icelandic'),
-                    ('sq', 'Albanian'),
-                    ('mk', 'Macedonian'),
-                    ('be', 'Belarusian')
-                ]  
-
-        with Session(self.engine) as session:
-            for code, name in language_list:
-                exists = session.scalar(select(Languages).where(Languages.code == code))
-                if not exists:
-                    session.add(Languages(code=code, name=name))
+        apply_sqlite_pragmas(self.engine, sqlite_pragmas)
+        with self.engine.connect() as conn:
+            schema_current = conn.exec_driver_sql("PRAGMA user_version").scalar() == SCHEMA_MARKER
+        if not schema_current:
+            Base.metadata.create_all(self.engine) # <- creates missing tables based on the ORM models
+        self.versions = DataVersions(self.engine)
+        self.cache = EntityCache(self.versions, cache_items, cache_mode)
+        self.full_text_search = FullTextSearch(self.engine)
+        self._priority_versions = None
+        if not schema_current:
+            self._apply_schema()
+
+    def _apply_schema(self):
+        """
+        Creates the FTS indexes, seeds the language list and runs data
+        backfills, then stores SCHEMA_MARKER so later starts skip all of it.
+        """
+        self.full_text_search.create()
+        with Session(self.engine) as session:
+            session.execute(
+                sqlite_insert(Languages).values([{"code": code, "name": name} for code, name in LANGUAGES])
+                .on_conflict_do_nothing(index_elements=["code"])
+            )
             session.commit()
+            needs_frequency_backfill = (
+                session.scalar(select(LessonTokenCount.lesson_id).limit(1)) is not None
+                and session.scalar(select(TokenFrequency.token_id).limit(1)) is None
+            )
+        if needs_frequency_backfill:
+            self.rebuild_token_frequencies()
+        with self.engine.begin() as conn:
+            conn.exec_driver_sql(f"PRAGMA user_version = {SCHEMA_MARKER}")
 
     def close(self):
+        self.versions.close()
         self.engine.dispose()
 
+    def _get_cached(self, model, key):
+        def load():
+            with Session(self.engine) as session:
+                return session.get(model, key)
+        return self.cache.load((model.__tablename__, key), load, (model.__tablename__,))
+
+    def _list_page(self, model, filters=(), after_id: Optional[int] = None,
+                   limit: Optional[int] = None, fields: Optional[List[str]] = None):
+        """
+        Lists rows ordered by id, starting after the keyset cursor after_id.
+        With fields only those columns (plus id) are selected and the rows
+        are returned as dicts instead of ORM instances.
+        """
+        query = page_query(model, filters, after_id, limit, fields)
+        with Session(self.engine) as session:
+            if fields:
+                return [dict(row._mapping) for row in session.execute(query)]
+            return list(session.scalars(query))
+
     def insert_user(self, user: User) -> User:
         with Session(self.engine) as session:
             session.add(user)
@@ -129,17 +227,29 @@ class ImparaDB:
             return course
 
     def get_course(self, course_id: int) -> Optional[Course]:
-        with Session(self.engine) as session:
-            return session.get(Course, course_id)
+        return self._get_cached(Course, course_id)
 
     def update_course(self, course_id: int, **kwargs) -> Optional[Course]:
+        """
+        A target_language change reindexes the course's lessons at once,
+        because their tokens and frequencies belong to the old language.
+        """
         with Session(self.engine) as session:
             course = session.get(Course, course_id)
             if course:
+                previous_language = course.target_language
                 for key, value in kwargs.items():
                     if hasattr(course, key):
                         setattr(course, key, value)
+                reindex = course.target_language != previous_language
+                if reindex:
+                    session.flush()
+                    for lesson in session.scalars(select(Lesson).where(Lesson.course_id == course_id)).all():
+                        self._index_lesson(session, lesson)
                 session.commit()
+                self.cache.invalidate(("course", course_id))
+                if reindex:
+                    self.learning_priorities.invalidate()
                 session.refresh(course)
             return course
 
@@ -149,10 +259,11 @@ class ImparaDB:
             if course:
                 session.delete(course)
                 session.commit()
+                self.cache.invalidate(("course", course_id))
 
-    def list_courses(self) -> List[Course]:
-        with Session(self.engine) as session:
-            return session.query(Course).all()
+    def list_courses(self, after_id: Optional[int] = None, limit: Optional[int] = None,
+                     fields: Optional[List[str]] = None) -> List[Course]:
+        return self._list_page(Course, after_id=after_id, limit=limit, fields=fields)
 
     def list_courses_by_user(self, user_id: int) -> List[Course]:
         with Session(self.engine) as session:
@@ -164,25 +275,48 @@ class ImparaDB:
 
     # ==================== LESSON CRUD ====================
 
-    def insert_lesson(self, lesson: Lesson) -> Lesson:
+    def insert_lesson(self, lesson: Lesson, index: bool = True) -> Lesson:
+        """
+        With index=False the token index is left to a later reindex_lesson()
+        call, e.g. from a background job.
+        """
         with Session(self.engine) as session:
             session.add(lesson)
+            session.flush()
+            if index:
+                self._index_lesson(session, lesson)
             session.commit()
+            if index:
+                self.learning_priorities.invalidate()
             session.refresh(lesson)
             return lesson
 
     def get_lesson(self, lesson_id: int) -> Optional[Lesson]:
-        with Session(self.engine) as session:
-            return session.get(Lesson, lesson_id)
+        return self._get_cached(Lesson, lesson_id)
 
-    def update_lesson(self, lesson_id: int, **kwargs) -> Optional[Lesson]:
+    def update_lesson(self, lesson_id: int, index: bool = True, **kwargs) -> Optional[Lesson]:
+        """
+        With index=False a text change is not indexed here, see insert_lesson().
+        A course change is always indexed at once, because the frequency
+        tables need the previous course.
+        """
         with Session(self.engine) as session:
             lesson = session.get(Lesson, lesson_id)
             if lesson:
+                previous_course_id = lesson.course_id
+                reindex = False
                 for key, value in kwargs.items():
                     if hasattr(lesson, key):
+                        if getattr(lesson, key) != value and (key == "course_id" or (key == "text" and index)):
+                            reindex = True
                         setattr(lesson, key, value)
+                if reindex:
+                    session.flush()
+                    self._index_lesson(session, lesson, previous_course_id)
                 session.commit()
+                self.cache.invalidate(("lesson", lesson_id))
+                if reindex:
+                    self.learning_priorities.invalidate()
                 session.refresh(lesson)
             return lesson
 
@@ -190,12 +324,17 @@ class ImparaDB:
         with Session(self.engine) as session:
             lesson = session.get(Lesson, lesson_id)
             if lesson:
+                old_counts = self._clear_lesson_tokens(session, lesson_id)
+                self._apply_frequency_deltas(session, lesson.course_id, old_counts, None, {})
+                session.execute(delete(LessonAnnotation).where(LessonAnnotation.lesson_id == lesson_id))
                 session.delete(lesson)
                 session.commit()
+                self.cache.invalidate(("lesson", lesson_id))
+                self.learning_priorities.invalidate()
 
-    def list_lessons(self) -> List[Lesson]:
-        with Session(self.engine) as session:
-            return session.query(Lesson).all()
+    def list_lessons(self, after_id: Optional[int] = None, limit: Optional[int] = None,
+                     fields: Optional[List[str]] = None) -> List[Lesson]:
+        return self._list_page(Lesson, after_id=after_id, limit=limit, fields=fields)
 
     def list_lessons_by_course(self, course_id: int) -> List[Lesson]:
         with Session(self.engine) as session:
@@ -207,10 +346,382 @@ class ImparaDB:
 
     def list_top_level_lessons(self, course_id: int) -> List[Lesson]:
         with Session(self.engine) as session:
-            return session.query(Lesson).filter(
-                Lesson.course_id == course_id,
-                Lesson.parent_lesson_id.is_(None)
-            ).all()
+            return list(session.scalars(top_level_lessons_query(course_id)))
+
+    # ==================== LESSON TOKEN INDEX ====================
+
+    def _clear_lesson_tokens(self, session: Session, lesson_id: int) -> dict:
+        """
+        Deletes the token rows of a lesson and returns its previous counts as
+        token id -> (count, language, token_type).
+        """
+        old_counts = {
+            token_id: (count, language, token_type)
+            for token_id, count, language, token_type in session.execute(
+                select(LessonTokenCount.token_id, LessonTokenCount.count_total, Token.language, Token.token_type)
+                .join(Token, Token.id == LessonTokenCount.token_id)
+                .where(LessonTokenCount.lesson_id == lesson_id)
+            )
+        }
+        session.execute(delete(LessonTokenOccurrence).where(LessonTokenOccurrence.lesson_id == lesson_id))
+        session.execute(delete(LessonTokenCount).where(LessonTokenCount.lesson_id == lesson_id))
+        session.execute(delete(LessonLexStats).where(LessonLexStats.lesson_id == lesson_id))
+        return old_counts
+
+    def _ensure_tokens(self, session: Session, language: str, stats, now: str) -> dict:
+        """
+        Inserts missing tokens of one language in bulk and returns a
+        mapping (token, token_type) -> token id.
+        """
+        rows = [
+            {
+                "language": language,
+                "token": s.token,
+                "normalized": s.normalized,
+                "token_type": s.token_type,
+                "ngrams": s.ngrams,
+                "created_at": now,
+            }
+            for s in stats
+        ]
+        if not rows:
+            return {}
+        session.execute(
+            sqlite_insert(Token.__table__).on_conflict_do_nothing(
+                index_elements=["language", "token", "token_type"]
+            ),
+            rows
+        )
+        token_ids = {}
+        values = list({r["token"] for r in rows})
+        for i in range(0, len(values), IN_CLAUSE_CHUNK_SIZE):
+            chunk = values[i:i + IN_CLAUSE_CHUNK_SIZE]
+            result = session.execute(
+                select(Token.id, Token.token, Token.token_type).where(
+                    Token.language == language,
+                    Token.token.in_(chunk)
+                )
+            )
+            for token_id, token, token_type in result:
+                token_ids[(token, token_type)] = token_id
+        return token_ids
+
+    def _index_lesson(self, session: Session, lesson: Lesson, previous_course_id: Optional[int] = None,
+                      matches: Optional[List[TokenMatch]] = None):
+        """
+        Rewrites the token counts, occurrences and lex stats of a single lesson
+        inside the caller's transaction and applies the difference to the
+        frequency tables. Other lessons are left untouched. `matches` is the
+        tokenizer output for the lesson text, if already computed.
+        """
+        old_counts = self._clear_lesson_tokens(session, lesson.id)
+        if previous_course_id is None:
+            previous_course_id = lesson.course_id
+        course = session.get(Course, lesson.course_id) if lesson.course_id else None
+        if course is None:
+            self._apply_frequency_deltas(session, previous_course_id, old_counts, None, {})
+            return
+        language = course.target_language
+        text = lesson.text or ""
+        if matches is None:
+            matches = self.tokenizer.tokenize(text)
+        stats = self.tokenizer.count(matches)
+        now = datetime.now().isoformat()
+        token_ids = self._ensure_tokens(session, language, stats.values(), now)
+
+        if stats:
+            session.execute(insert(LessonTokenCount.__table__), [
+                {
+                    "lesson_id": lesson.id,
+                    "token_id": token_ids[key],
+                    "count_total": s.count_total,
+                    "count_unique": s.count_unique,
+                    "first_pos": s.first_pos,
+                    "last_pos": s.last_pos,
+                    "computed_at": now,
+                }
+                for key, s in stats.items()
+            ])
+            session.execute(insert(LessonTokenOccurrence.__table__), [
+                {
+                    "lesson_id": lesson.id,
+                    "token_id": token_ids[(m.token, m.token_type)],
+                    "start_pos": m.start_pos,
+                    "end_pos": m.end_pos,
+                    "matched": m.matched,
+                }
+                for m in matches
+            ])
+
+        words = [s for s in stats.values() if s.token_type == "word"]
+        phrases = [s for s in stats.values() if s.token_type == "phrase"]
+        session.add(LessonLexStats(
+            lesson_id=lesson.id,
+            language=language,
+            words_total=sum(s.count_total for s in words),
+            words_unique=len(words),
+            phrases_total=sum(s.count_total for s in phrases),
+            phrases_unique=len(phrases),
+            chars_total=len(text),
+            computed_at=now,
+        ))
+        new_counts = {
+            token_ids[key]: (s.count_total, language, s.token_type)
+            for key, s in stats.items()
+        }
+        self._apply_frequency_deltas(session, previous_course_id, old_counts, lesson.course_id, new_counts)
+
+    def _apply_frequency_deltas(self, session: Session, old_course_id: Optional[int], old_counts: dict,
+                                new_course_id: Optional[int], new_counts: dict):
+        """
+        Subtracts a lesson's old counts and adds its new counts to the
+        per-language and per-course frequency tables.
+        """
+        language_deltas = {}
+        course_deltas = {}
+        for counts, course_id, sign in ((old_counts, old_course_id, -1), (new_counts, new_course_id, 1)):
+            for token_id, (count, language, token_type) in counts.items():
+                delta = language_deltas.setdefault(token_id, [0, language, token_type])
+                delta[0] += sign * count
+                if course_id is not None:
+                    delta = course_deltas.setdefault((course_id, token_id), [0, language, token_type])
+                    delta[0] += sign * count
+
+        language_rows = [
+            {"token_id": token_id, "language": language, "token_type": token_type, "freq": freq}
+            for token_id, (freq, language, token_type) in language_deltas.items() if freq != 0
+        ]
+        if language_rows:
+            stmt = sqlite_insert(TokenFrequency.__table__)
+            session.execute(
+                stmt.on_conflict_do_update(
+                    index_elements=["token_id"],
+                    set_={"freq": stmt.table.c.freq + stmt.excluded.freq}
+                ),
+                language_rows
+            )
+        course_rows = [
+            {"course_id": course_id, "token_id": token_id, "language": language, "token_type": token_type, "freq": freq}
+            for (course_id, token_id), (freq, language, token_type) in course_deltas.items() if freq != 0
+        ]
+        if course_rows:
+            stmt = sqlite_insert(CourseTokenFrequency.__table__)
+            session.execute(
+                stmt.on_conflict_do_update(
+                    index_elements=["course_id", "token_id"],
+                    set_={"freq": stmt.table.c.freq + stmt.excluded.freq}
+                ),
+                course_rows
+            )
+        touched = [r["token_id"] for r in language_rows]
+        for i in range(0, len(touched), IN_CLAUSE_CHUNK_SIZE):
+            session.execute(delete(TokenFrequency).where(
+                TokenFrequency.token_id.in_(touched[i:i + IN_CLAUSE_CHUNK_SIZE]),
+                TokenFrequency.freq <= 0
+            ))
+        for course_id in {r["course_id"] for r in course_rows}:
+            touched = [r["token_id"] for r in course_rows if r["course_id"] == course_id]
+            for i in range(0, len(touched), IN_CLAUSE_CHUNK_SIZE):
+                session.execute(delete(CourseTokenFrequency).where(
+                    CourseTokenFrequency.course_id == course_id,
+                    CourseTokenFrequency.token_id.in_(touched[i:i + IN_CLAUSE_CHUNK_SIZE]),
+                    CourseTokenFrequency.freq <= 0
+                ))
+
+    def rebuild_token_frequencies(self):
+        """
+        Recomputes both frequency tables from lesson_token_count in one pass.
+        Only needed to backfill; lesson writes keep the tables up to date.
+        """
+        with Session(self.engine) as session:
+            session.execute(delete(TokenFrequency))
+            session.execute(delete(CourseTokenFrequency))
+            session.execute(insert(TokenFrequency).from_select(
+                ["token_id", "language", "token_type", "freq"],
+                select(Token.id, Token.language, Token.token_type, func.sum(LessonTokenCount.count_total))
+                .join(LessonTokenCount, LessonTokenCount.token_id == Token.id)
+                .group_by(Token.id)
+            ))
+            session.execute(insert(CourseTokenFrequency).from_select(
+                ["course_id", "token_id", "language", "token_type", "freq"],
+                select(Lesson.course_id, Token.id, Token.language, Token.token_type, func.sum(LessonTokenCount.count_total))
+                .join(LessonTokenCount, LessonTokenCount.token_id == Token.id)
+                .join(Lesson, Lesson.id == LessonTokenCount.lesson_id)
+                .group_by(Lesson.course_id, Token.id)
+            ))
+            session.commit()
+        self.learning_priorities.invalidate()
+
+    def _ranked_frequencies(self, session: Session, model, scope_filter, token_type: Optional[str],
+                            total: int, limit: int, offset: int) -> List[dict]:
+        """
+        Reads one page of a frequency table and derives DENSE_RANK, zipf_score
+        and rel_freq for it without aggregating the whole corpus.
+        """
+        filters = list(scope_filter)
+        if token_type:
+            filters.append(model.token_type == token_type)
+        rows = session.execute(
+            select(model.token_id, Token.token, model.token_type, model.freq)
+            .join(Token, Token.id == model.token_id)
+            .where(*filters)
+            .order_by(model.freq.desc(), model.token_id)
+            .limit(limit)
+            .offset(offset)
+        ).all()
+        if not rows:
+            return []
+        higher = session.scalar(
+            select(func.count(func.distinct(model.freq))).where(*filters, model.freq > rows[0].freq)
+        ) or 0
+        result = []
+        rank = higher
+        previous_freq = None
+        for row in rows:
+            if row.freq != previous_freq:
+                rank += 1
+                previous_freq = row.freq
+            result.append({
+                "token_id": row.token_id,
+                "token": row.token,
+                "token_type": row.token_type,
+                "freq": row.freq,
+                "rank": rank,
+                "zipf_score": row.freq * rank,
+                "rel_freq": round(row.freq / total, 6) if total else 0.0,
+            })
+        return result
+
+    def list_token_frequencies(self, language: str, token_type: Optional[str] = None,
+                               limit: int = 200, offset: int = 0) -> List[dict]:
+        with Session(self.engine) as session:
+            # lesson_lex_stats holds the per-lesson totals, which is far fewer rows than tokens
+            if token_type == "word":
+                total_column = LessonLexStats.words_total
+            elif token_type == "phrase":
+                total_column = LessonLexStats.phrases_total
+            else:
+                total_column = LessonLexStats.words_total + LessonLexStats.phrases_total
+            total = session.scalar(
+                select(func.sum(total_column)).where(LessonLexStats.language == language)
+            ) or 0
+            return self._ranked_frequencies(
+                session, TokenFrequency, [TokenFrequency.language == language], token_type, total, limit, offset
+            )
+
+    def list_course_token_frequencies(self, course_id: int, token_type: Optional[str] = None,
+                                      limit: int = 200, offset: int = 0) -> List[dict]:
+        with Session(self.engine) as session:
+            filters = [CourseTokenFrequency.course_id == course_id]
+            if token_type:
+                filters.append(CourseTokenFrequency.token_type == token_type)
+            total = session.scalar(select(func.sum(CourseTokenFrequency.freq)).where(*filters)) or 0
+            return self._ranked_frequencies(
+                session, CourseTokenFrequency, [CourseTokenFrequency.course_id == course_id], token_type, total, limit, offset
+            )
+
+    def reindex_lesson(self, lesson_id: int, matches: Optional[List[TokenMatch]] = None,
+                       text: Optional[str] = None) -> Optional[LessonLexStats]:
+        """
+        Rebuilds the token index of one lesson. `matches` is tokenizer output
+        computed elsewhere for `text`; it is only used while the lesson still
+        has that text. Returns None if the lesson does not exist.
+        """
+        with Session(self.engine) as session:
+            lesson = session.get(Lesson, lesson_id)
+            if lesson is None:
+                return None
+            if matches is not None and (lesson.text or "") != (text or ""):
+                matches = None
+            self._index_lesson(session, lesson, matches=matches)
+            session.commit()
+            self.learning_priorities.invalidate()
+            return session.get(LessonLexStats, lesson_id)
+
+    def reindex_lessons(self, course_id: Optional[int] = None) -> int:
+        with Session(self.engine) as session:
+            query = session.query(Lesson)
+            if course_id is not None:
+                query = query.filter(Lesson.course_id == course_id)
+            lessons = query.all()
+            for lesson in lessons:
+                self._index_lesson(session, lesson)
+            session.commit()
+            self.learning_priorities.invalidate()
+            return len(lessons)
+
+    def list_lesson_tokens(self, lesson_id: int, token_type: Optional[str] = None) -> List[dict]:
+        with Session(self.engine) as session:
+            return [dict(row._mapping) for row in session.execute(lesson_tokens_query(lesson_id, token_type))]
+
+    def list_lesson_token_occurrences(self, lesson_id: int) -> List[LessonTokenOccurrence]:
+        with Session(self.engine) as session:
+            return list(session.scalars(lesson_occurrences_query(lesson_id)))
+
+    def get_lesson_lex_stats(self, lesson_id: int) -> Optional[LessonLexStats]:
+        with Session(self.engine) as session:
+            return session.get(LessonLexStats, lesson_id)
+
+    # ==================== LESSON ANNOTATION ====================
+
+    def get_annotation_chunks(self, chunk_hashes: List[str]) -> dict:
+        """
+        Returns chunk hash -> annotated tokens for the hashes already stored.
+        """
+        result = {}
+        with Session(self.engine) as session:
+            for query in annotation_chunks_queries(chunk_hashes):
+                for chunk_hash, tokens in session.execute(query):
+                    result[chunk_hash] = json.loads(tokens)
+        return result
+
+    def save_annotation_chunks(self, model: str, chunks: List[tuple]):
+        """
+        Stores newly annotated (chunk_hash, text, tokens) chunks. Chunks are
+        content addressed, so existing hashes are left alone.
+        """
+        if not chunks:
+            return
+        now = datetime.now().isoformat()
+        with Session(self.engine) as session:
+            stmt = sqlite_insert(AnnotationChunk.__table__).on_conflict_do_nothing(index_elements=["chunk_hash"])
+            session.execute(stmt, [
+                {
+                    "chunk_hash": chunk_hash,
+                    "model": model,
+                    "text": text,
+                    "tokens": json.dumps(tokens, ensure_ascii=False),
+                    "token_count": len(tokens),
+                    "created_at": now,
+                }
+                for chunk_hash, text, tokens in chunks
+            ])
+            session.commit()
+
+    def save_lesson_annotation(self, lesson_id: int, text_hash: str, model: str,
+                               chunk_hashes: List[str], token_count: int) -> LessonAnnotation:
+        with Session(self.engine) as session:
+            annotation = session.get(LessonAnnotation, lesson_id) or LessonAnnotation(lesson_id=lesson_id)
+            annotation.text_hash = text_hash
+            annotation.model = model
+            annotation.chunk_hashes = json.dumps(chunk_hashes)
+            annotation.token_count = token_count
+            annotation.annotated_at = datetime.now().isoformat()
+            session.add(annotation)
+            session.commit()
+            session.refresh(annotation)
+            return annotation
+
+    def get_lesson_annotation(self, lesson_id: int) -> Optional[dict]:
+        """
+        Returns the stored annotation of a lesson with its tokens merged in
+        text order, or None. Callers compare text_hash with the current text.
+        """
+        with Session(self.engine) as session:
+            annotation = session.get(LessonAnnotation, lesson_id)
+        if annotation is None:
+            return None
+        return lesson_annotation_result(annotation, self.get_annotation_chunks(json.loads(annotation.chunk_hashes)))
 
     # ==================== DICTIONARY ENTRY CRUD ====================
 
@@ -222,8 +733,7 @@ class ImparaDB:
             return entry
 
     def get_dict_entry(self, entry_id: int) -> Optional[DictEntry]:
-        with Session(self.engine) as session:
-            return session.get(DictEntry, entry_id)
+        return self._get_cached(DictEntry, entry_id)
 
     def update_dict_entry(self, entry_id: int, **kwargs) -> Optional[DictEntry]:
         with Session(self.engine) as session:
@@ -233,6 +743,7 @@ class ImparaDB:
                     if hasattr(entry, key):
                         setattr(entry, key, value)
                 session.commit()
+                self.cache.invalidate(("dict_entry", entry_id))
                 session.refresh(entry)
             return entry
 
@@ -242,23 +753,69 @@ class ImparaDB:
             if entry:
                 session.delete(entry)
                 session.commit()
+                self.cache.invalidate(("dict_entry", entry_id))
 
-    def list_dict_entries(self) -> List[DictEntry]:
-        with Session(self.engine) as session:
-            return session.query(DictEntry).all()
+    def list_dict_entries(self, after_id: Optional[int] = None, limit: Optional[int] = None,
+                          fields: Optional[List[str]] = None) -> List[DictEntry]:
+        return self._list_page(DictEntry, after_id=after_id, limit=limit, fields=fields)
+
+    def list_dict_entries_by_language(self, language: str, after_id: Optional[int] = None,
+                                      limit: Optional[int] = None, fields: Optional[List[str]] = None) -> List[DictEntry]:
+        return self._list_page(DictEntry, [DictEntry.language == language], after_id, limit, fields)
 
-    def list_dict_entries_by_language(self, language: str) -> List[DictEntry]:
+    def list_dict_entries_without_senses(self, language: str, limit: Optional[int] = None) -> List[DictEntry]:
         with Session(self.engine) as session:
-            return session.query(DictEntry).filter(DictEntry.language == language).all()
+            query = (
+                select(DictEntry)
+                .where(DictEntry.language == language, ~DictEntry.senses.any())
+                .order_by(DictEntry.id)
+            )
+            if limit is not None:
+                query = query.limit(limit)
+            return list(session.scalars(query))
 
     def get_dict_entry_by_lemma(self, language: str, lemma: str) -> Optional[DictEntry]:
-        with Session(self.engine) as session:
-            return session.scalar(
-                select(DictEntry).where(
-                    DictEntry.language == language,
-                    DictEntry.lemma == lemma
+        def load():
+            with Session(self.engine) as session:
+                return session.scalar(
+                    select(DictEntry).where(
+                        DictEntry.language == language,
+                        DictEntry.lemma == lemma
+                    )
                 )
-            )
+        return self.cache.load(("dict_entry_lemma", language, lemma), load, ("dict_entry",), derived=True)
+
+    def get_dictionary_entry(self, language: str, lemma: str, target_language: Optional[str] = None) -> Optional[dict]:
+        """
+        Loads one lemma with all senses, translations and examples in a fixed
+        number of queries (entry, senses, translations, examples).
+        """
+        def load():
+            with Session(self.engine) as session:
+                entry = session.scalar(dictionary_entry_query(language, lemma, target_language))
+                return dictionary_tree(entry) if entry is not None else None
+        return self.cache.load(("dictionary", language, lemma, target_language), load, DICTIONARY_TABLES, derived=True)
+
+    def lookup_dictionary(self, language: str, tokens: Optional[List[str]] = None, text: Optional[str] = None,
+                          user_id: Optional[int] = None, target_language: Optional[str] = None) -> dict:
+        """
+        Resolves many surface tokens (or all words of a text) against
+        DictEntry.lemma and DictEntry.normalized with set-based queries.
+        Senses carry the user's UserSenseState when user_id is given.
+        """
+        surfaces, lemma_forms, normalized_forms = lookup_forms(self.tokenizer, tokens, text)
+        entries = {}
+        states = {}
+        with Session(self.engine) as session:
+            for query in lookup_entries_queries(language, lemma_forms, normalized_forms, target_language):
+                for entry in session.scalars(query):
+                    entries[entry.id] = entry
+            if user_id is not None:
+                sense_ids = [sense.id for entry in entries.values() for sense in entry.senses]
+                for query in user_states_queries(user_id, sense_ids):
+                    for state in session.scalars(query):
+                        states[state.sense_id] = row_dict(state)
+            return lookup_result(self.tokenizer, language, surfaces, entries, states)
 
     # ==================== DICTIONARY SENSE CRUD ====================
 
@@ -270,8 +827,7 @@ class ImparaDB:
             return sense
 
     def get_dict_sense(self, sense_id: int) -> Optional[DictSense]:
-        with Session(self.engine) as session:
-            return session.get(DictSense, sense_id)
+        return self._get_cached(DictSense, sense_id)
 
     def update_dict_sense(self, sense_id: int, **kwargs) -> Optional[DictSense]:
         with Session(self.engine) as session:
@@ -281,6 +837,7 @@ class ImparaDB:
                     if hasattr(sense, key):
                         setattr(sense, key, value)
                 session.commit()
+                self.cache.invalidate(("dict_sense", sense_id))
                 session.refresh(sense)
             return sense
 
@@ -288,17 +845,70 @@ class ImparaDB:
         with Session(self.engine) as session:
             sense = session.get(DictSense, sense_id)
             if sense:
+                session.execute(delete(TokenDictMap).where(TokenDictMap.sense_id == sense_id))
                 session.delete(sense)
                 session.commit()
+                self.cache.invalidate(("dict_sense", sense_id))
+                self.learning_priorities.invalidate()
 
-    def list_dict_senses(self) -> List[DictSense]:
-        with Session(self.engine) as session:
-            return session.query(DictSense).all()
+    def list_dict_senses(self, after_id: Optional[int] = None, limit: Optional[int] = None,
+                         fields: Optional[List[str]] = None) -> List[DictSense]:
+        return self._list_page(DictSense, after_id=after_id, limit=limit, fields=fields)
 
     def list_dict_senses_by_entry(self, entry_id: int) -> List[DictSense]:
         with Session(self.engine) as session:
             return session.query(DictSense).filter(DictSense.entry_id == entry_id).all()
 
+    def bulk_insert_dict_senses(self, senses_by_entry: dict, target_language: str) -> dict:
+        """
+        Inserts generated senses in one transaction. senses_by_entry maps
+        entry id -> [{"pos", "gloss", "translations": [str]}]. Entries that
+        have senses by now are skipped. Returns the inserted row counts.
+        """
+        counts = {"entries": 0, "senses": 0, "translations": 0, "skipped_entries": 0}
+        if not senses_by_entry:
+            return counts
+        with Session(self.engine) as session:
+            entry_ids = list(senses_by_entry)
+            taken = set()
+            for i in range(0, len(entry_ids), IN_CLAUSE_CHUNK_SIZE):
+                taken.update(session.scalars(
+                    select(DictSense.entry_id).where(DictSense.entry_id.in_(entry_ids[i:i + IN_CLAUSE_CHUNK_SIZE]))
+                ))
+            rows = []
+            for entry_id, senses in senses_by_entry.items():
+                if entry_id in taken:
+                    counts["skipped_entries"] += 1
+                    continue
+                counts["entries"] += 1
+                for order, sense in enumerate(senses, start=1):
+                    rows.append({
+                        "entry_id": entry_id,
+                        "pos": sense.get("pos"),
+                        "gloss": sense.get("gloss"),
+                        "note": sense.get("note"),
+                        "sense_order": order,
+                    })
+            if rows:
+                sense_ids = session.scalars(
+                    insert(DictSense.__table__).returning(DictSense.__table__.c.id, sort_by_parameter_order=True),
+                    rows
+                ).all()
+                translations = [
+                    {"sense_id": sense_id, "target_language": target_language, "translation": translation}
+                    for sense_id, row in zip(sense_ids, rows)
+                    for translation in dict.fromkeys(senses_by_entry[row["entry_id"]][row["sense_order"] - 1].get("translations") or [])
+                ]
+                if translations:
+                    session.execute(
+                        sqlite_insert(DictTranslation.__table__).on_conflict_do_nothing(),
+                        translations
+                    )
+                counts["senses"] = len(rows)
+                counts["translations"] = len(translations)
+            session.commit()
+        return counts
+
     # ==================== DICTIONARY TRANSLATION CRUD ====================
 
     def insert_dict_translation(self, translation: DictTranslation) -> DictTranslation:
@@ -309,8 +919,7 @@ class ImparaDB:
             return translation
 
     def get_dict_translation(self, translation_id: int) -> Optional[DictTranslation]:
-        with Session(self.engine) as session:
-            return session.get(DictTranslation, translation_id)
+        return self._get_cached(DictTranslation, translation_id)
 
     def update_dict_translation(self, translation_id: int, **kwargs) -> Optional[DictTranslation]:
         with Session(self.engine) as session:
@@ -320,6 +929,7 @@ class ImparaDB:
                     if hasattr(translation, key):
                         setattr(translation, key, value)
                 session.commit()
+                self.cache.invalidate(("dict_translation", translation_id))
                 session.refresh(translation)
             return translation
 
@@ -329,10 +939,11 @@ class ImparaDB:
             if translation:
                 session.delete(translation)
                 session.commit()
+                self.cache.invalidate(("dict_translation", translation_id))
 
-    def list_dict_translations(self) -> List[DictTranslation]:
-        with Session(self.engine) as session:
-            return session.query(DictTranslation).all()
+    def list_dict_translations(self, after_id: Optional[int] = None, limit: Optional[int] = None,
+                               fields: Optional[List[str]] = None) -> List[DictTranslation]:
+        return self._list_page(DictTranslation, after_id=after_id, limit=limit, fields=fields)
 
     def list_dict_translations_by_sense(self, sense_id: int) -> List[DictTranslation]:
         with Session(self.engine) as session:
@@ -352,8 +963,7 @@ class ImparaDB:
             return example
 
     def get_dict_example(self, example_id: int) -> Optional[DictExample]:
-        with Session(self.engine) as session:
-            return session.get(DictExample, example_id)
+        return self._get_cached(DictExample, example_id)
 
     def update_dict_example(self, example_id: int, **kwargs) -> Optional[DictExample]:
         with Session(self.engine) as session:
@@ -363,6 +973,7 @@ class ImparaDB:
                     if hasattr(example, key):
                         setattr(example, key, value)
                 session.commit()
+                self.cache.invalidate(("dict_example", example_id))
                 session.refresh(example)
             return example
 
@@ -372,10 +983,11 @@ class ImparaDB:
             if example:
                 session.delete(example)
                 session.commit()
+                self.cache.invalidate(("dict_example", example_id))
 
-    def list_dict_examples(self) -> List[DictExample]:
-        with Session(self.engine) as session:
-            return session.query(DictExample).all()
+    def list_dict_examples(self, after_id: Optional[int] = None, limit: Optional[int] = None,
+                           fields: Optional[List[str]] = None) -> List[DictExample]:
+        return self._list_page(DictExample, after_id=after_id, limit=limit, fields=fields)
 
     def list_dict_examples_by_sense(self, sense_id: int) -> List[DictExample]:
         with Session(self.engine) as session:
@@ -387,12 +999,12 @@ class ImparaDB:
         with Session(self.engine) as session:
             session.add(state)
             session.commit()
+            self.learning_priorities.invalidate_user(state.user_id)
             session.refresh(state)
             return state
 
     def get_user_sense_state(self, user_id: int, sense_id: int) -> Optional[UserSenseState]:
-        with Session(self.engine) as session:
-            return session.get(UserSenseState, (user_id, sense_id))
+        return self._get_cached(UserSenseState, (user_id, sense_id))
 
     def update_user_sense_state(self, user_id: int, sense_id: int, **kwargs) -> Optional[UserSenseState]:
         with Session(self.engine) as session:
@@ -402,6 +1014,8 @@ class ImparaDB:
                     if hasattr(state, key):
                         setattr(state, key, value)
                 session.commit()
+                self.cache.invalidate(("user_sense_state", (user_id, sense_id)))
+                self.learning_priorities.invalidate_user(user_id)
                 session.refresh(state)
             return state
 
@@ -411,6 +1025,8 @@ class ImparaDB:
             if state:
                 session.delete(state)
                 session.commit()
+                self.cache.invalidate(("user_sense_state", (user_id, sense_id)))
+                self.learning_priorities.invalidate_user(user_id)
 
     def list_user_sense_states(self, user_id: int) -> List[UserSenseState]:
         with Session(self.engine) as session:
@@ -420,6 +1036,100 @@ class ImparaDB:
         with Session(self.engine) as session:
             return session.query(UserSenseState).filter(UserSenseState.sense_id == sense_id).all()
 
+    # ==================== TOKEN DICTIONARY MAP ====================
+
+    def insert_token_dict_map(self, mapping: TokenDictMap) -> TokenDictMap:
+        with Session(self.engine) as session:
+            session.add(mapping)
+            session.commit()
+            self.learning_priorities.invalidate()
+            session.refresh(mapping)
+            return mapping
+
+    def delete_token_dict_map(self, token_id: int, sense_id: int):
+        with Session(self.engine) as session:
+            mapping = session.get(TokenDictMap, (token_id, sense_id))
+            if mapping:
+                session.delete(mapping)
+                session.commit()
+                self.learning_priorities.invalidate()
+
+    def list_token_dict_maps_by_token(self, token_id: int) -> List[TokenDictMap]:
+        with Session(self.engine) as session:
+            return session.query(TokenDictMap).filter(TokenDictMap.token_id == token_id).all()
+
+    def list_token_dict_maps_by_sense(self, sense_id: int) -> List[TokenDictMap]:
+        with Session(self.engine) as session:
+            return session.query(TokenDictMap).filter(TokenDictMap.sense_id == sense_id).all()
+
+    def auto_map_tokens(self, language: str) -> int:
+        """
+        Links every word token of a language to all senses of the dictionary
+        entry whose lemma or normalized form matches. Existing links are kept.
+        """
+        with Session(self.engine) as session:
+            before = session.scalar(select(func.count()).select_from(TokenDictMap)) or 0
+            for entry_column, token_column in ((DictEntry.lemma, Token.token), (DictEntry.normalized, Token.normalized)):
+                session.execute(
+                    sqlite_insert(TokenDictMap.__table__).from_select(
+                        ["token_id", "sense_id", "entry_id", "confidence"],
+                        select(Token.id, DictSense.id, DictEntry.id, literal(1.0))
+                        .join(DictEntry, (DictEntry.language == Token.language) & (entry_column == token_column))
+                        .join(DictSense, DictSense.entry_id == DictEntry.id)
+                        .where(Token.language == language, Token.token_type == "word")
+                    ).on_conflict_do_nothing(index_elements=["token_id", "sense_id"])
+                )
+            after = session.scalar(select(func.count()).select_from(TokenDictMap)) or 0
+            session.commit()
+        self.learning_priorities.invalidate()
+        return after - before
+
+    # ==================== FULL TEXT SEARCH ====================
+
+    def search(self, query: str, scopes: Optional[List[str]] = None, language: Optional[str] = None,
+               prefix: bool = True, limit: int = 20, offset: int = 0) -> dict:
+        return self.full_text_search.search(query, scopes, language, prefix, limit, offset)
+
+    def rebuild_search_index(self):
+        self.full_text_search.rebuild()
+
+    # ==================== LEARNING PRIORITY ====================
+
+    def _load_priority_candidates(self, language: str) -> list:
+        with Session(self.engine) as session:
+            return [
+                tuple(row) for row in session.execute(
+                    select(TokenFrequency.freq, Token.id, Token.token, Token.token_type, TokenDictMap.sense_id)
+                    .join(Token, Token.id == TokenFrequency.token_id)
+                    .join(TokenDictMap, TokenDictMap.token_id == TokenFrequency.token_id)
+                    .join(DictSense, DictSense.id == TokenDictMap.sense_id)
+                    .where(TokenFrequency.language == language)
+                    .order_by(TokenFrequency.freq.desc(), Token.id, TokenDictMap.sense_id)
+                )
+            ]
+
+    def _load_user_srs_levels(self, user_id: int) -> dict:
+        with Session(self.engine) as session:
+            return dict(session.execute(
+                select(UserSenseState.sense_id, UserSenseState.srs_level).where(UserSenseState.user_id == user_id)
+            ).all())
+
+    def list_learning_priorities(self, user_id: int, language: str, limit: int = 50) -> List[dict]:
+        if self.cache.mode == "versioned":
+            self._sync_learning_priorities()
+        return self.learning_priorities.get(user_id, language, limit)
+
+    def _sync_learning_priorities(self):
+        # the cache is only invalidated by this process's writes; in
+        # "versioned" mode writes of other processes are caught here
+        candidates, levels = self.versions.get(*PRIORITY_CANDIDATE_TABLES), self.versions.get("user_sense_state")
+        if self._priority_versions is not None:
+            if candidates != self._priority_versions[0]:
+                self.learning_priorities.invalidate()
+            elif levels != self._priority_versions[1]:
+                self.learning_priorities.invalidate_results()
+        self._priority_versions = (candidates, levels)
+
     def ensure_settings_defaults(self, settings: json):
         self.ensure_entry(settings,'openAiKey', None)
         self.ensure_entry(settings,'openAiModel', 'gpt-3.5-turbo')
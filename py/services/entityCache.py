@@ -0,0 +1,119 @@
+import threading
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Optional, Tuple
+
+from py.services.dataVersions import DataVersions
+
+CACHE_MODES = ("off", "local", "versioned")
+
+
+class EntityCache:
+    """
+    Bounded LRU of rows read by primary key and of results built from several
+    tables (dictionary trees). Rows are detached ORM objects shared by all
+    callers, so they must be treated as read-only.
+
+    In "local" mode a row is dropped by the ImparaDB method that updates or
+    deletes it. Derived results remember the table versions they were built
+    from and are reloaded once one of those tables is written. "versioned"
+    checks rows against the table versions too, which also catches writes
+    of other processes, so it is the mode for several workers on one
+    database. Misses (None) are not cached.
+    """
+
+    def __init__(self, versions: Optional[DataVersions], max_items: int = 4096, mode: str = "local"):
+        if mode not in CACHE_MODES:
+            raise ValueError(f"Unknown cache mode: {mode}")
+        self.versions = versions
+        self.mode = mode
+        self.max_items = max_items if mode != "off" else 0
+        self._lock = threading.Lock()
+        self._items: "OrderedDict[tuple, tuple]" = OrderedDict()
+        self._generation = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_items > 0
+
+    def _begin(self, key: tuple, tables: Tuple[str, ...], derived: bool):
+        stamp = self.versions.get(*tables) if derived or self.mode == "versioned" else None
+        with self._lock:
+            item = self._items.get(key)
+            if item is not None and item[1] == stamp:
+                self._items.move_to_end(key)
+                self.hits += 1
+                return True, item[0]
+            self.misses += 1
+            return False, (stamp, self._generation)
+
+    def _store(self, key: tuple, value: Any, ticket: tuple):
+        stamp, generation = ticket
+        if value is None:
+            return
+        with self._lock:
+            # an invalidation while loading may mean the value is stale already
+            if generation != self._generation:
+                return
+            self._items[key] = (value, stamp)
+            self._items.move_to_end(key)
+            while len(self._items) > self.max_items:
+                self._items.popitem(last=False)
+                self.evictions += 1
+
+    def load(self, key: tuple, loader: Callable[[], Any], tables: Tuple[str, ...] = (), derived: bool = False) -> Any:
+        """
+        Returns the cached value of key or loader()'s result. tables are the
+        tables the value is read from; derived values are always checked
+        against their versions.
+        """
+        if not self.enabled:
+            return loader()
+        hit, value = self._begin(key, tables, derived)
+        if hit:
+            return value
+        result = loader()
+        self._store(key, result, value)
+        return result
+
+    async def load_async(self, key: tuple, loader: Callable[[], Awaitable[Any]],
+                         tables: Tuple[str, ...] = (), derived: bool = False) -> Any:
+        if not self.enabled:
+            return await loader()
+        hit, value = self._begin(key, tables, derived)
+        if hit:
+            return value
+        result = await loader()
+        self._store(key, result, value)
+        return result
+
+    def invalidate(self, *keys: tuple):
+        if not self.enabled:
+            return
+        with self._lock:
+            self._generation += 1
+            for key in keys:
+                if self._items.pop(key, None) is not None:
+                    self.invalidations += 1
+
+    def clear(self):
+        with self._lock:
+            self._generation += 1
+            self._items.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "mode": self.mode,
+                "items": len(self._items),
+                "max_items": self.max_items,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": self.hits / total if total else 0.0,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+            }
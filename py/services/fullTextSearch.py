@@ -0,0 +1,150 @@
+import re
+from typing import Dict, List, Optional
+
+from sqlalchemy import text
+
+SEARCH_TERM_PATTERN = re.compile(r"\w+", re.UNICODE)
+
+# scope -> indexed table, indexed columns and the query parts used to search it.
+# The FTS tables use the source table as external content, so only the index is
+# stored twice; triggers keep it in sync with every insert, update and delete.
+SEARCH_INDEXES = {
+    "dict_entry": {
+        "table": "dict_entry",
+        "columns": ["lemma", "normalized"],
+        "select": "e.id, e.language, e.lemma, e.normalized",
+        "joins": "JOIN dict_entry e ON e.id = dict_entry_fts.rowid",
+        "language": "e.language",
+        "snippet_column": 0,
+    },
+    "dict_sense": {
+        "table": "dict_sense",
+        "columns": ["gloss"],
+        "select": "s.id, s.entry_id, e.language, e.lemma, s.gloss",
+        "joins": "JOIN dict_sense s ON s.id = dict_sense_fts.rowid "
+                 "JOIN dict_entry e ON e.id = s.entry_id",
+        "language": "e.language",
+        "snippet_column": 0,
+    },
+    "dict_translation": {
+        "table": "dict_translation",
+        "columns": ["translation"],
+        "select": "t.id, t.sense_id, e.language, e.lemma, t.target_language, t.translation",
+        "joins": "JOIN dict_translation t ON t.id = dict_translation_fts.rowid "
+                 "JOIN dict_sense s ON s.id = t.sense_id "
+                 "JOIN dict_entry e ON e.id = s.entry_id",
+        "language": "e.language",
+        "snippet_column": 0,
+    },
+    "dict_example": {
+        "table": "dict_example",
+        "columns": ["example"],
+        "select": "ex.id, ex.sense_id, e.language, e.lemma, ex.example, ex.translation",
+        "joins": "JOIN dict_example ex ON ex.id = dict_example_fts.rowid "
+                 "JOIN dict_sense s ON s.id = ex.sense_id "
+                 "JOIN dict_entry e ON e.id = s.entry_id",
+        "language": "e.language",
+        "snippet_column": 0,
+    },
+    "lesson": {
+        "table": "lesson",
+        "columns": ["title", "text"],
+        "select": "l.id, l.course_id, c.target_language AS language, l.title",
+        "joins": "JOIN lesson l ON l.id = lesson_fts.rowid "
+                 "LEFT JOIN course c ON c.id = l.course_id",
+        "language": "c.target_language",
+        "snippet_column": 1,
+    },
+}
+
+
+class FullTextSearch:
+    """
+    FTS5 indexes over the dictionary tables and lesson texts.
+    """
+
+    def __init__(self, engine):
+        self.engine = engine
+
+    def create(self):
+        """
+        Creates missing FTS tables and their sync triggers. A newly created
+        index is filled from the existing rows once.
+        """
+        with self.engine.begin() as conn:
+            existing = {
+                row[0] for row in conn.execute(text("SELECT name FROM sqlite_master WHERE type = 'table'"))
+            }
+            for index in SEARCH_INDEXES.values():
+                table = index["table"]
+                fts = f"{table}_fts"
+                columns = ", ".join(index["columns"])
+                new_values = ", ".join(f"new.{c}" for c in index["columns"])
+                old_values = ", ".join(f"old.{c}" for c in index["columns"])
+                conn.execute(text(
+                    f"CREATE VIRTUAL TABLE IF NOT EXISTS {fts} USING fts5("
+                    f"{columns}, content='{table}', content_rowid='id', "
+                    f"tokenize='unicode61 remove_diacritics 2', prefix='2 3')"
+                ))
+                conn.execute(text(
+                    f"CREATE TRIGGER IF NOT EXISTS {fts}_ai AFTER INSERT ON {table} BEGIN "
+                    f"INSERT INTO {fts}(rowid, {columns}) VALUES (new.id, {new_values}); END"
+                ))
+                conn.execute(text(
+                    f"CREATE TRIGGER IF NOT EXISTS {fts}_ad AFTER DELETE ON {table} BEGIN "
+                    f"INSERT INTO {fts}({fts}, rowid, {columns}) VALUES ('delete', old.id, {old_values}); END"
+                ))
+                conn.execute(text(
+                    f"CREATE TRIGGER IF NOT EXISTS {fts}_au AFTER UPDATE OF {columns} ON {table} BEGIN "
+                    f"INSERT INTO {fts}({fts}, rowid, {columns}) VALUES ('delete', old.id, {old_values}); "
+                    f"INSERT INTO {fts}(rowid, {columns}) VALUES (new.id, {new_values}); END"
+                ))
+                if fts not in existing:
+                    conn.execute(text(f"INSERT INTO {fts}({fts}) VALUES ('rebuild')"))
+
+    def rebuild(self):
+        with self.engine.begin() as conn:
+            for index in SEARCH_INDEXES.values():
+                fts = f"{index['table']}_fts"
+                conn.execute(text(f"INSERT INTO {fts}({fts}) VALUES ('rebuild')"))
+
+    @staticmethod
+    def build_match(query: str, prefix: bool = True) -> Optional[str]:
+        """
+        Turns free user input into a safe FTS5 match expression. Every word
+        is quoted, so FTS5 operators in the input are searched literally.
+        """
+        terms = SEARCH_TERM_PATTERN.findall(query or "")
+        if not terms:
+            return None
+        suffix = "*" if prefix else ""
+        return " ".join(f'"{term}"{suffix}' for term in terms)
+
+    def search(self, query: str, scopes: Optional[List[str]] = None, language: Optional[str] = None,
+               prefix: bool = True, limit: int = 20, offset: int = 0) -> Dict[str, List[dict]]:
+        scopes = scopes or list(SEARCH_INDEXES)
+        unknown = [s for s in scopes if s not in SEARCH_INDEXES]
+        if unknown:
+            raise ValueError(f"Unknown search scopes: {', '.join(unknown)}")
+        match = self.build_match(query, prefix)
+        if match is None:
+            return {scope: [] for scope in scopes}
+
+        results = {}
+        with self.engine.connect() as conn:
+            for scope in scopes:
+                index = SEARCH_INDEXES[scope]
+                fts = f"{index['table']}_fts"
+                sql = (
+                    f"SELECT {index['select']}, bm25({fts}) AS rank, "
+                    f"snippet({fts}, {index['snippet_column']}, '[', ']', '…', 12) AS snippet "
+                    f"FROM {fts} {index['joins']} "
+                    f"WHERE {fts} MATCH :match"
+                )
+                params = {"match": match, "limit": limit, "offset": offset}
+                if language:
+                    sql += f" AND {index['language']} = :language"
+                    params["language"] = language
+                sql += " ORDER BY rank LIMIT :limit OFFSET :offset"
+                results[scope] = [dict(row._mapping) for row in conn.execute(text(sql), params)]
+        return results
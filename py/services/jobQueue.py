@@ -0,0 +1,477 @@
+import json
+import multiprocessing
+import os
+import socket
+import threading
+import time
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Callable, Dict, List, Optional
+
+from sqlalchemy import delete, func, select, update
+from sqlalchemy.orm import Session
+
+from py.domains.ImparaDomainsORM import Job
+
+JOB_STATUSES = ("queued", "running", "succeeded", "failed", "cancelled")
+FINISHED_STATUSES = ("succeeded", "failed", "cancelled")
+
+
+class JobCancelled(Exception):
+    pass
+
+
+class JobFailed(Exception):
+    """
+    Raised by a handler for an error that a retry would not fix, e.g. a
+    missing optional dependency. The job fails at once.
+    """
+
+
+class JobQueue:
+    """
+    Persistent job queue in the `job` table.
+
+    Jobs are claimed with a conditional UPDATE, so several worker pools
+    (threads or server processes) can share one database. A failed job is
+    queued again with exponential backoff until max_attempts is reached.
+    Running jobs whose worker stopped sending heartbeats for stale_seconds
+    are queued again.
+    """
+
+    def __init__(self, engine, retry_delay: float = 5.0, stale_seconds: float = 120.0):
+        self.engine = engine
+        self.retry_delay = retry_delay
+        self.stale_seconds = stale_seconds
+        # set on enqueue, so idle workers in this process pick up new jobs at once
+        self.notify = threading.Event()
+
+    @staticmethod
+    def _to_dict(job: Job) -> dict:
+        return {
+            "id": job.id,
+            "kind": job.kind,
+            "payload": json.loads(job.payload),
+            "status": job.status,
+            "priority": job.priority,
+            "dedupe_key": job.dedupe_key,
+            "attempts": job.attempts,
+            "max_attempts": job.max_attempts,
+            "progress": job.progress,
+            "message": job.message,
+            "result": json.loads(job.result) if job.result is not None else None,
+            "error": job.error,
+            "cancel_requested": job.cancel_requested,
+            "created_ts": job.created_ts,
+            "run_after_ts": job.run_after_ts,
+            "started_ts": job.started_ts,
+            "finished_ts": job.finished_ts,
+        }
+
+    def enqueue(self, kind: str, payload: Optional[dict] = None, priority: int = 0,
+                max_attempts: int = 3, dedupe_key: Optional[str] = None, delay: float = 0.0) -> dict:
+        """
+        Adds a job. If a job with the same dedupe_key is still queued, that
+        job is returned instead, so repeated saves do not pile up work.
+        """
+        now = time.time()
+        with Session(self.engine) as session:
+            if dedupe_key is not None:
+                queued = session.scalars(
+                    select(Job).where(Job.dedupe_key == dedupe_key, Job.status == "queued").limit(1)
+                ).first()
+                if queued is not None:
+                    return self._to_dict(queued)
+            job = Job(
+                kind=kind,
+                payload=json.dumps(payload or {}, ensure_ascii=False),
+                status="queued",
+                priority=priority,
+                dedupe_key=dedupe_key,
+                attempts=0,
+                max_attempts=max(1, max_attempts),
+                progress=0.0,
+                cancel_requested=False,
+                created_ts=now,
+                run_after_ts=now + delay,
+            )
+            session.add(job)
+            session.commit()
+            result = self._to_dict(job)
+        self.notify.set()
+        return result
+
+    def claim(self, worker_id: str, kinds: List[str]) -> Optional[dict]:
+        """
+        Marks the next due job of one of `kinds` as running for worker_id.
+        Lower priority values run first, then oldest first.
+        """
+        now = time.time()
+        with Session(self.engine) as session:
+            candidates = session.scalars(
+                select(Job.id)
+                .where(Job.status == "queued", Job.run_after_ts <= now, Job.kind.in_(kinds))
+                .order_by(Job.priority, Job.id)
+                .limit(8)
+            ).all()
+            for job_id in candidates:
+                claimed = session.execute(
+                    update(Job)
+                    .where(Job.id == job_id, Job.status == "queued")
+                    .values(
+                        status="running", locked_by=worker_id, attempts=Job.attempts + 1,
+                        started_ts=now, heartbeat_ts=now, progress=0.0, message=None, error=None
+                    )
+                ).rowcount
+                session.commit()
+                if claimed:
+                    return self._to_dict(session.get(Job, job_id))
+        return None
+
+    def progress(self, job_id: int, progress: float, message: Optional[str] = None) -> bool:
+        """
+        Stores the progress of a running job and returns whether it should
+        stop because a cancel was requested.
+        """
+        with Session(self.engine) as session:
+            session.execute(
+                update(Job)
+                .where(Job.id == job_id, Job.status == "running")
+                .values(progress=min(1.0, max(0.0, progress)), message=message, heartbeat_ts=time.time())
+            )
+            session.commit()
+            return bool(session.scalar(select(Job.cancel_requested).where(Job.id == job_id)))
+
+    def cancel_requested(self, job_id: int) -> bool:
+        with Session(self.engine) as session:
+            return bool(session.scalar(select(Job.cancel_requested).where(Job.id == job_id)))
+
+    def _finish(self, job_id: int, **values):
+        with Session(self.engine) as session:
+            session.execute(
+                update(Job)
+                .where(Job.id == job_id, Job.status == "running")
+                .values(locked_by=None, finished_ts=time.time(), **values)
+            )
+            session.commit()
+
+    def succeed(self, job_id: int, result: Any = None):
+        self._finish(job_id, status="succeeded", progress=1.0,
+                     result=json.dumps(result, ensure_ascii=False) if result is not None else None)
+
+    def mark_cancelled(self, job_id: int):
+        self._finish(job_id, status="cancelled", message="cancelled")
+
+    def fail(self, job_id: int, error: str, retry: bool = True) -> str:
+        """
+        Records a failed attempt. Returns the new status: queued if the job
+        will be retried, failed otherwise.
+        """
+        now = time.time()
+        with Session(self.engine) as session:
+            job = session.get(Job, job_id)
+            if job is None or job.status != "running":
+                return job.status if job is not None else "failed"
+            job.error = error
+            job.locked_by = None
+            if job.cancel_requested:
+                job.status = "cancelled"
+                job.finished_ts = now
+            elif retry and job.attempts < job.max_attempts:
+                job.status = "queued"
+                job.run_after_ts = now + self.retry_delay * 2 ** (job.attempts - 1)
+            else:
+                job.status = "failed"
+                job.finished_ts = now
+            session.commit()
+            return job.status
+
+    def cancel(self, job_id: int) -> Optional[dict]:
+        """
+        Cancels a queued job at once. A running job is asked to stop and
+        ends as cancelled at its next progress report.
+        """
+        now = time.time()
+        with Session(self.engine) as session:
+            job = session.get(Job, job_id)
+            if job is None:
+                return None
+            if job.status == "queued":
+                job.status = "cancelled"
+                job.finished_ts = now
+                job.cancel_requested = True
+            elif job.status == "running":
+                job.cancel_requested = True
+            session.commit()
+            return self._to_dict(job)
+
+    def retry(self, job_id: int) -> Optional[dict]:
+        """
+        Queues a failed or cancelled job again with a fresh set of attempts.
+        """
+        with Session(self.engine) as session:
+            job = session.get(Job, job_id)
+            if job is None:
+                return None
+            if job.status in ("failed", "cancelled"):
+                job.status = "queued"
+                job.attempts = 0
+                job.cancel_requested = False
+                job.error = None
+                job.finished_ts = None
+                job.run_after_ts = time.time()
+                session.commit()
+                self.notify.set()
+            return self._to_dict(job)
+
+    def heartbeat(self, worker_id: str):
+        with Session(self.engine) as session:
+            session.execute(
+                update(Job)
+                .where(Job.locked_by == worker_id, Job.status == "running")
+                .values(heartbeat_ts=time.time())
+            )
+            session.commit()
+
+    def release(self, worker_id: str) -> int:
+        """
+        Queues the running jobs of a worker pool that is shutting down again.
+        """
+        with Session(self.engine) as session:
+            count = session.execute(
+                update(Job)
+                .where(Job.locked_by == worker_id, Job.status == "running")
+                .values(status="queued", locked_by=None, run_after_ts=time.time())
+            ).rowcount
+            session.commit()
+            return count
+
+    def requeue_stale(self) -> int:
+        with Session(self.engine) as session:
+            count = session.execute(
+                update(Job)
+                .where(Job.status == "running", Job.heartbeat_ts < time.time() - self.stale_seconds)
+                .values(status="queued", locked_by=None, run_after_ts=time.time())
+            ).rowcount
+            session.commit()
+        if count:
+            self.notify.set()
+        return count
+
+    def get(self, job_id: int) -> Optional[dict]:
+        with Session(self.engine) as session:
+            job = session.get(Job, job_id)
+            return self._to_dict(job) if job is not None else None
+
+    def list(self, status: Optional[str] = None, kind: Optional[str] = None, dedupe_key: Optional[str] = None,
+             limit: int = 100, offset: int = 0) -> List[dict]:
+        with Session(self.engine) as session:
+            query = select(Job)
+            if status:
+                query = query.where(Job.status == status)
+            if kind:
+                query = query.where(Job.kind == kind)
+            if dedupe_key:
+                query = query.where(Job.dedupe_key.startswith(dedupe_key, autoescape=True))
+            query = query.order_by(Job.id.desc()).limit(limit).offset(offset)
+            return [self._to_dict(job) for job in session.scalars(query)]
+
+    def purge(self, older_than_seconds: float = 7 * 24 * 3600) -> int:
+        with Session(self.engine) as session:
+            count = session.execute(
+                delete(Job).where(
+                    Job.status.in_(FINISHED_STATUSES),
+                    Job.finished_ts < time.time() - older_than_seconds
+                )
+            ).rowcount
+            session.commit()
+            return count
+
+    def stats(self) -> dict:
+        with Session(self.engine) as session:
+            rows = session.execute(select(Job.kind, Job.status, func.count()).group_by(Job.kind, Job.status)).all()
+        by_status = {status: 0 for status in JOB_STATUSES}
+        by_kind: Dict[str, Dict[str, int]] = {}
+        for kind, status, count in rows:
+            by_status[status] = by_status.get(status, 0) + count
+            by_kind.setdefault(kind, {})[status] = count
+        return {"by_status": by_status, "by_kind": by_kind}
+
+
+class JobContext:
+    """
+    What a job handler gets: the job's payload, progress reporting with
+    cooperative cancellation, and run_cpu() for CPU bound steps.
+    """
+
+    def __init__(self, pool: "JobWorkerPool", job: dict):
+        self.pool = pool
+        self.job = job
+        self.id = job["id"]
+        self.payload = job["payload"]
+        self._last_report = 0.0
+
+    def progress(self, done: float, total: float = 1.0, message: Optional[str] = None):
+        """
+        Reports done/total. Writes are throttled to a few per second.
+        Raises JobCancelled if the job was cancelled meanwhile.
+        """
+        now = time.monotonic()
+        if now - self._last_report < 0.25 and done < total:
+            return
+        self._last_report = now
+        if self.pool.queue.progress(self.id, done / total if total else 1.0, message):
+            raise JobCancelled()
+
+    def check_cancelled(self):
+        if self.pool.queue.cancel_requested(self.id):
+            raise JobCancelled()
+
+    def run_cpu(self, fn: Callable, *args):
+        """
+        Runs fn(*args) in the process pool when there is one, else inline.
+        fn and its arguments must be picklable.
+        """
+        executor = self.pool.executor()
+        if executor is None:
+            return fn(*args)
+        try:
+            return executor.submit(fn, *args).result()
+        except BrokenProcessPool:
+            # a worker process died; start a fresh pool for the next job
+            self.pool.reset_executor(executor)
+            raise
+
+
+Handler = Callable[[JobContext], Any]
+
+
+class JobWorkerPool:
+    """
+    Runs jobs from a JobQueue on `workers` threads. Handlers are registered
+    per job kind and return a JSON serializable result. CPU bound steps can
+    use a pool of `processes` worker processes via JobContext.run_cpu().
+    """
+
+    def __init__(self, queue: JobQueue, workers: int = 2, processes: int = 0,
+                 poll_interval: float = 1.0, heartbeat_interval: float = 30.0):
+        self.queue = queue
+        self.workers = max(1, workers)
+        self.processes = max(0, processes)
+        self.poll_interval = poll_interval
+        self.heartbeat_interval = heartbeat_interval
+        self.worker_id = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self.handlers: Dict[str, Handler] = {}
+        self._threads: List[threading.Thread] = []
+        self._stopping = threading.Event()
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._executor_lock = threading.Lock()
+        self._lock = threading.Lock()
+        self.active = 0
+        self.completed = 0
+        self.failed = 0
+        self.cancelled = 0
+
+    def register(self, kind: str, handler: Handler):
+        self.handlers[kind] = handler
+
+    def executor(self) -> Optional[ProcessPoolExecutor]:
+        if not self.processes:
+            return None
+        with self._executor_lock:
+            if self._executor is None:
+                # spawn, because forking a process that runs threads is unsafe
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.processes, mp_context=multiprocessing.get_context("spawn")
+                )
+            return self._executor
+
+    def reset_executor(self, broken: ProcessPoolExecutor):
+        with self._executor_lock:
+            if self._executor is broken:
+                self._executor = None
+        broken.shutdown(wait=False, cancel_futures=True)
+
+    def start(self):
+        if self._threads:
+            return
+        self._stopping.clear()
+        self.queue.requeue_stale()
+        for i in range(self.workers):
+            thread = threading.Thread(target=self._work, name=f"job-worker-{i}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+        thread = threading.Thread(target=self._heartbeat, name="job-heartbeat", daemon=True)
+        thread.start()
+        self._threads.append(thread)
+
+    def stop(self, timeout: float = 10.0):
+        self._stopping.set()
+        self.queue.notify.set()
+        deadline = time.monotonic() + timeout
+        for thread in self._threads:
+            thread.join(max(0.0, deadline - time.monotonic()))
+        self._threads = []
+        # jobs that did not finish in time run again on the next start
+        self.queue.release(self.worker_id)
+        with self._executor_lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=False, cancel_futures=True)
+                self._executor = None
+
+    def _heartbeat(self):
+        while not self._stopping.wait(self.heartbeat_interval):
+            try:
+                self.queue.heartbeat(self.worker_id)
+                self.queue.requeue_stale()
+            except Exception as e:
+                print(f"Job heartbeat failed: {e}")
+
+    def _work(self):
+        while not self._stopping.is_set():
+            try:
+                job = self.queue.claim(self.worker_id, list(self.handlers))
+            except Exception as e:
+                print(f"Claiming a job failed: {e}")
+                job = None
+            if job is None:
+                self.queue.notify.wait(self.poll_interval)
+                self.queue.notify.clear()
+                continue
+            self._run(job)
+
+    def _run(self, job: dict):
+        with self._lock:
+            self.active += 1
+        try:
+            result = self.handlers[job["kind"]](JobContext(self, job))
+        except JobCancelled:
+            self.queue.mark_cancelled(job["id"])
+            with self._lock:
+                self.cancelled += 1
+        except Exception as e:
+            status = self.queue.fail(job["id"], str(e) or type(e).__name__, retry=not isinstance(e, JobFailed))
+            print(f"Job {job['id']} ({job['kind']}) attempt {job['attempts']} failed: {e}")
+            with self._lock:
+                self.failed += status == "failed"
+        else:
+            self.queue.succeed(job["id"], result)
+            with self._lock:
+                self.completed += 1
+        finally:
+            with self._lock:
+                self.active -= 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "worker_id": self.worker_id,
+                "workers": self.workers,
+                "processes": self.processes,
+                "handlers": sorted(self.handlers),
+                "active": self.active,
+                "completed": self.completed,
+                "failed": self.failed,
+                "cancelled": self.cancelled,
+            }
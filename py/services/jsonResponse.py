@@ -0,0 +1,15 @@
+from typing import Any
+
+import orjson
+from starlette.responses import JSONResponse
+
+
+class OrjsonResponse(JSONResponse):
+    """
+    JSONResponse rendered with orjson. Content has been through
+    jsonable_encoder already, so only plain types reach orjson; non-string
+    dict keys are written as strings like json.dumps does.
+    """
+
+    def render(self, content: Any) -> bytes:
+        return orjson.dumps(content, option=orjson.OPT_NON_STR_KEYS)
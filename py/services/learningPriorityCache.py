@@ -0,0 +1,131 @@
+import heapq
+import threading
+from typing import Callable, Dict, List, Optional, Tuple
+
+# (freq, token_id, token, token_type, sense_id), sorted by freq descending
+Candidate = Tuple[int, int, str, str, int]
+
+
+class LearningPriorityCache:
+    """
+    Caches the "important but not learned" list per (user, language).
+
+    The frequency-ordered token -> sense candidates of a language are loaded
+    once and shared by all users. A user's list is derived from them and the
+    user's srs levels, walking the candidates by descending frequency and
+    stopping as soon as no remaining candidate can enter the top list.
+    """
+
+    def __init__(self,
+                 load_candidates: Callable[[str], List[Candidate]],
+                 load_user_levels: Callable[[int], Dict[int, int]],
+                 max_srs_level: int = 2,
+                 depth: int = 200):
+        self.load_candidates = load_candidates
+        self.load_user_levels = load_user_levels
+        self.max_srs_level = max_srs_level
+        self.depth = depth
+        self._lock = threading.Lock()
+        self._candidates: Dict[str, List[Candidate]] = {}
+        # (user, language) -> (ranked list, depth it was ranked with)
+        self._results: Dict[Tuple[int, str], Tuple[List[dict], int]] = {}
+        self._generation = 0
+        self._results_generation = 0
+        self._user_generation: Dict[int, int] = {}
+        self.hits = 0
+        self.misses = 0
+
+    def novelty(self, srs_level: Optional[int]) -> float:
+        if srs_level is None:
+            return 1.0
+        if srs_level > self.max_srs_level:
+            return 0.0
+        return 1.0 / (1 + srs_level)
+
+    def get(self, user_id: int, language: str, limit: int = 50) -> List[dict]:
+        key = (user_id, language)
+        with self._lock:
+            cached = self._results.get(key)
+            if cached is not None:
+                result, ranked_depth = cached
+                # a list shorter than its depth holds every eligible candidate
+                if limit <= ranked_depth or len(result) < ranked_depth:
+                    self.hits += 1
+                    return result[:limit]
+            self.misses += 1
+            generation = (self._generation, self._results_generation, self._user_generation.get(user_id, 0))
+            candidates = self._candidates.get(language)
+
+        if candidates is None:
+            candidates = self.load_candidates(language)
+            with self._lock:
+                if self._generation == generation[0]:
+                    self._candidates[language] = candidates
+        depth = max(limit, self.depth)
+        result = self._rank(candidates, self.load_user_levels(user_id), depth)
+
+        with self._lock:
+            if (self._generation, self._results_generation, self._user_generation.get(user_id, 0)) == generation:
+                self._results[key] = (result, depth)
+        return result[:limit]
+
+    def _rank(self, candidates: List[Candidate], levels: Dict[int, int], depth: int) -> List[dict]:
+        heap = []
+        for position, (freq, token_id, token, token_type, sense_id) in enumerate(candidates):
+            # novelty is at most 1, so no later candidate can beat the current top list
+            if len(heap) >= depth and freq <= heap[0][0]:
+                break
+            srs_level = levels.get(sense_id)
+            novelty = self.novelty(srs_level)
+            if novelty == 0.0:
+                continue
+            priority = freq * novelty
+            item = (priority, -position, {
+                "token_id": token_id,
+                "token": token,
+                "token_type": token_type,
+                "sense_id": sense_id,
+                "freq": freq,
+                "srs_level": srs_level,
+                "priority": round(priority, 6),
+            })
+            if len(heap) < depth:
+                heapq.heappush(heap, item)
+            elif item[:2] > heap[0][:2]:
+                heapq.heapreplace(heap, item)
+        return [entry for _, _, entry in sorted(heap, key=lambda x: x[:2], reverse=True)]
+
+    def invalidate_user(self, user_id: int):
+        with self._lock:
+            self._user_generation[user_id] = self._user_generation.get(user_id, 0) + 1
+            for key in [k for k in self._results if k[0] == user_id]:
+                del self._results[key]
+
+    def invalidate_results(self):
+        """
+        Drops the lists of all users but keeps the candidates, e.g. after
+        srs levels changed without knowing whose.
+        """
+        with self._lock:
+            self._results_generation += 1
+            self._results.clear()
+
+    def invalidate(self):
+        """
+        Drops everything, e.g. after lessons or token mappings changed.
+        """
+        with self._lock:
+            self._generation += 1
+            self._candidates.clear()
+            self._results.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "languages": len(self._candidates),
+                "entries": len(self._results),
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": round(self.hits / total, 4) if total else 0.0,
+            }
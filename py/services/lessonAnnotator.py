@@ -0,0 +1,206 @@
+import asyncio
+import hashlib
+import json
+import re
+from dataclasses import dataclass, field
+from typing import Awaitable, Callable, Dict, List, Optional
+
+# Bump when the prompt or the token schema changes, so stored chunks are redone.
+ANNOTATION_VERSION = 1
+
+SENTENCE_END = re.compile(r"(?<=[.!?…。！？])\s+|\n\s*\n")
+
+CEFR_LEVELS = {"A1", "A2", "B1", "B2", "C1", "C2"}
+TOKEN_TYPES = {"word", "punct"}
+
+SYSTEM_PROMPT = "You are a JSON API. Output MUST be valid JSON only. No markdown, no code fences, no explanations."
+
+USER_PROMPT = """Return ONLY JSON matching this schema:
+{{"tokens":[{{"value":"string","type":"word|punct","difficulty":"A1|A2|B1|B2|C1|C2|null","translationEN":"string"}}]}}
+
+Rules:
+- Tokenize into words and punctuation, in text order. Do not include whitespace tokens.
+- difficulty is only for type=word, else null. Evaluate difficulty according to CEFR levels.
+- translationEN is only for type=word, else empty string. Always translate to English.
+Text:
+
+{text}"""
+
+# (model, system, prompt) -> raw model output
+Complete = Callable[[str, str, str], Awaitable[str]]
+
+
+def text_hash(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def chunk_hash(text: str, model: str) -> str:
+    return text_hash(json.dumps([ANNOTATION_VERSION, model, text], ensure_ascii=False))
+
+
+def split_sentences(text: str) -> List[str]:
+    return [s.strip() for s in SENTENCE_END.split(text or "") if s and s.strip()]
+
+
+def split_chunks(text: str, max_chars: int = 1200, boundary_every: int = 4) -> List[str]:
+    """
+    Splits a text into chunks of whole sentences of at most max_chars
+    characters (a longer sentence becomes a chunk of its own).
+
+    Chunk ends are content defined: a chunk also ends after every sentence
+    whose hash is divisible by boundary_every. An edit therefore only moves
+    the boundaries up to the next such sentence, and the chunks after it
+    keep their text and hash.
+    """
+    sentences = split_sentences(text)
+    chunks = []
+    current = ""
+    for sentence in sentences:
+        if current and len(current) + 1 + len(sentence) > max_chars:
+            chunks.append(current)
+            current = ""
+        current = f"{current} {sentence}" if current else sentence
+        if int(text_hash(sentence)[:8], 16) % boundary_every == 0:
+            chunks.append(current)
+            current = ""
+    if current:
+        chunks.append(current)
+    return chunks
+
+
+def extract_json(raw: str):
+    """
+    Parses JSON out of model output, tolerating code fences and trailing
+    text, like extractJsonFromModelOutput in the reader.
+    """
+    if not raw:
+        raise ValueError("Empty model response")
+    try:
+        return json.loads(raw)
+    except ValueError:
+        pass
+    cleaned = re.sub(r"```json|```", "", raw).strip()
+    starts = [i for i in (cleaned.find("{"), cleaned.find("[")) if i != -1]
+    if not starts:
+        raise ValueError("No JSON start found")
+    try:
+        value, _ = json.JSONDecoder().raw_decode(cleaned[min(starts):])
+        return value
+    except ValueError:
+        raise ValueError("Could not parse JSON from model output")
+
+
+def validate_tokens(data, text: Optional[str] = None) -> List[dict]:
+    """
+    Checks the annotation schema and normalizes every token to
+    {value, type, difficulty, translationEN}. Whitespace tokens are dropped.
+    With text, at least 90% of the tokens must be found in it in order.
+    """
+    tokens = data.get("tokens") if isinstance(data, dict) else data
+    if not isinstance(tokens, list):
+        raise ValueError("Annotation has no 'tokens' list")
+    result = []
+    for token in tokens:
+        if not isinstance(token, dict) or not isinstance(token.get("value"), str):
+            raise ValueError(f"Invalid annotation token: {token!r}")
+        value = token["value"]
+        token_type = token.get("type")
+        if token_type == "ws" or not value.strip():
+            continue
+        if token_type not in TOKEN_TYPES:
+            token_type = "word" if any(c.isalnum() for c in value) else "punct"
+        difficulty = token.get("difficulty")
+        difficulty = difficulty.strip().upper() if isinstance(difficulty, str) else None
+        if token_type != "word" or difficulty not in CEFR_LEVELS:
+            difficulty = None
+        translation = token.get("translationEN")
+        result.append({
+            "value": value,
+            "type": token_type,
+            "difficulty": difficulty,
+            "translationEN": translation if token_type == "word" and isinstance(translation, str) else "",
+        })
+    if not result:
+        raise ValueError("Annotation contains no tokens")
+    if text is not None:
+        position, found = 0, 0
+        for token in result:
+            index = text.find(token["value"], position)
+            if index != -1:
+                found += 1
+                position = index + len(token["value"])
+        if found < 0.9 * len(result):
+            raise ValueError("Annotation tokens do not match the text")
+    return result
+
+
+@dataclass
+class ChunkAnnotation:
+    index: int
+    text: str
+    chunk_hash: str
+    tokens: Optional[List[dict]] = None
+    error: Optional[str] = None
+    reused: bool = False
+
+
+@dataclass
+class AnnotationResult:
+    model: str
+    text_hash: str
+    chunks: List[ChunkAnnotation] = field(default_factory=list)
+
+    @property
+    def failed(self) -> List[ChunkAnnotation]:
+        return [c for c in self.chunks if c.error is not None]
+
+    @property
+    def tokens(self) -> List[dict]:
+        return [token for c in self.chunks for token in (c.tokens or [])]
+
+
+class LessonAnnotator:
+    """
+    Annotates lesson texts with per-token CEFR difficulty and English
+    translation, one sentence-aligned chunk per LLM call.
+
+    Chunks are content addressed: chunks found in `known` (hash -> tokens)
+    are reused and only the rest is sent to the model, at most
+    `concurrency` at a time.
+    """
+
+    def __init__(self, complete: Complete, concurrency: int = 4, max_chars: int = 1200, retries: int = 1):
+        self.complete = complete
+        self.concurrency = concurrency
+        self.max_chars = max_chars
+        self.retries = retries
+
+    def plan(self, text: str, model: str) -> AnnotationResult:
+        result = AnnotationResult(model=model, text_hash=text_hash(text))
+        for index, chunk in enumerate(split_chunks(text, self.max_chars)):
+            result.chunks.append(ChunkAnnotation(index=index, text=chunk, chunk_hash=chunk_hash(chunk, model)))
+        return result
+
+    async def annotate(self, result: AnnotationResult, known: Dict[str, List[dict]]) -> AnnotationResult:
+        semaphore = asyncio.Semaphore(max(1, self.concurrency))
+
+        async def run(chunk: ChunkAnnotation):
+            async with semaphore:
+                for _ in range(self.retries + 1):
+                    try:
+                        raw = await self.complete(result.model, SYSTEM_PROMPT, USER_PROMPT.format(text=chunk.text))
+                        chunk.tokens = validate_tokens(extract_json(raw), chunk.text)
+                        chunk.error = None
+                        return
+                    except Exception as e:
+                        chunk.error = str(e) or type(e).__name__
+
+        pending = []
+        for chunk in result.chunks:
+            if chunk.chunk_hash in known:
+                chunk.tokens = known[chunk.chunk_hash]
+                chunk.reused = True
+            else:
+                pending.append(chunk)
+        await asyncio.gather(*(run(chunk) for chunk in pending))
+        return result
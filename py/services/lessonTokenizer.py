@@ -0,0 +1,122 @@
+import re
+import unicodedata
+from dataclasses import dataclass
+from typing import Dict, List
+
+WORD_PATTERN = re.compile(r"\w+(?:['’-]\w+)*", re.UNICODE)
+PHRASE_GAP_PATTERN = re.compile(r"^\s+$")
+
+
+@dataclass
+class TokenMatch:
+    token: str
+    normalized: str
+    token_type: str
+    ngrams: int
+    start_pos: int
+    end_pos: int
+    matched: str
+
+
+@dataclass
+class TokenStats:
+    token: str
+    normalized: str
+    token_type: str
+    ngrams: int
+    count_total: int
+    first_pos: int
+    last_pos: int
+    # distinct spellings in the text, e.g. "Casa" and "casa"
+    count_unique: int = 1
+
+
+class LessonTokenizer:
+    """
+    Splits a lesson text into words and multi-word phrases (n-grams).
+    Phrases only span words separated by plain whitespace, so punctuation
+    such as commas or full stops ends a phrase.
+    """
+
+    def __init__(self, max_ngram: int = 3):
+        self.max_ngram = max(1, max_ngram)
+
+    @staticmethod
+    def normalize(token: str) -> str:
+        return unicodedata.normalize("NFKC", token).casefold()
+
+    def tokenize(self, text: str) -> List[TokenMatch]:
+        if not text:
+            return []
+        words = [
+            m for m in WORD_PATTERN.finditer(text)
+            if not m.group().isdigit()
+        ]
+        matches: List[TokenMatch] = []
+        for i, word in enumerate(words):
+            surface = word.group()
+            matches.append(TokenMatch(
+                token=surface.lower(),
+                normalized=self.normalize(surface),
+                token_type="word",
+                ngrams=1,
+                start_pos=word.start(),
+                end_pos=word.end(),
+                matched=surface,
+            ))
+            end = i
+            for n in range(2, self.max_ngram + 1):
+                nxt = end + 1
+                if nxt >= len(words):
+                    break
+                gap = text[words[end].end():words[nxt].start()]
+                if not PHRASE_GAP_PATTERN.match(gap):
+                    break
+                end = nxt
+                surface = text[word.start():words[end].end()]
+                phrase = " ".join(w.group() for w in words[i:end + 1])
+                matches.append(TokenMatch(
+                    token=phrase.lower(),
+                    normalized=self.normalize(phrase),
+                    token_type="phrase",
+                    ngrams=n,
+                    start_pos=word.start(),
+                    end_pos=words[end].end(),
+                    matched=surface,
+                ))
+        return matches
+
+    def count(self, matches: List[TokenMatch]) -> Dict[tuple, TokenStats]:
+        """
+        Aggregates matches into one TokenStats per (token, token_type).
+        """
+        stats: Dict[tuple, TokenStats] = {}
+        spellings: Dict[tuple, set] = {}
+        for m in matches:
+            key = (m.token, m.token_type)
+            entry = stats.get(key)
+            if entry is None:
+                stats[key] = TokenStats(
+                    token=m.token,
+                    normalized=m.normalized,
+                    token_type=m.token_type,
+                    ngrams=m.ngrams,
+                    count_total=1,
+                    first_pos=m.start_pos,
+                    last_pos=m.start_pos,
+                )
+                spellings[key] = {m.matched}
+            else:
+                entry.count_total += 1
+                entry.last_pos = m.start_pos
+                spellings[key].add(m.matched)
+        for key, entry in stats.items():
+            entry.count_unique = len(spellings[key])
+        return stats
+
+
+def tokenize_text(text: str, max_ngram: int = 3) -> List[TokenMatch]:
+    """
+    Module level entry point, so tokenizing can run in a worker process.
+    """
+    return LessonTokenizer(max_ngram=max_ngram).tokenize(text)
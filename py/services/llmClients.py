@@ -0,0 +1,88 @@
+import importlib.util
+import threading
+import time
+from typing import TYPE_CHECKING, List, Optional
+
+import httpx
+
+if TYPE_CHECKING:
+    from openai import OpenAI
+
+HTTP2_AVAILABLE = importlib.util.find_spec("h2") is not None
+
+
+class LLMClientManager:
+    """
+    Application-scoped LLM clients.
+
+    The OpenAI SDK client and the raw async HTTP client are created once and
+    reused by every request, so connections (and their TLS sessions) stay
+    open between calls. HTTP/2 is used when the h2 package is installed.
+    The openai package is only imported when the SDK client is first used.
+    Call aclose() at shutdown.
+    """
+
+    def __init__(self, api_key: Optional[str], base_url: str = "https://api.openai.com/v1",
+                 timeout: float = 60.0, max_connections: int = 20, max_keepalive_connections: int = 10,
+                 keepalive_expiry: float = 60.0, models_ttl_seconds: float = 3600.0):
+        self.api_key = api_key
+        self.base_url = base_url.rstrip("/")
+        self.timeout = timeout
+        self.limits = httpx.Limits(
+            max_connections=max_connections,
+            max_keepalive_connections=max_keepalive_connections,
+            keepalive_expiry=keepalive_expiry,
+        )
+        self.models_ttl_seconds = models_ttl_seconds
+        self._lock = threading.Lock()
+        self._openai: Optional["OpenAI"] = None
+        self._http: Optional[httpx.AsyncClient] = None
+        self._models: Optional[List[str]] = None
+        self._models_expires = 0.0
+
+    @property
+    def openai(self) -> "OpenAI":
+        with self._lock:
+            if self._openai is None:
+                from openai import OpenAI
+                self._openai = OpenAI(
+                    api_key=self.api_key,
+                    base_url=self.base_url,
+                    timeout=self.timeout,
+                    http_client=httpx.Client(limits=self.limits, http2=HTTP2_AVAILABLE, timeout=self.timeout),
+                )
+            return self._openai
+
+    @property
+    def http(self) -> httpx.AsyncClient:
+        with self._lock:
+            if self._http is None:
+                self._http = httpx.AsyncClient(
+                    base_url=self.base_url,
+                    headers={"Authorization": f"Bearer {self.api_key}"},
+                    limits=self.limits,
+                    http2=HTTP2_AVAILABLE,
+                    timeout=self.timeout,
+                )
+            return self._http
+
+    def list_models(self) -> List[str]:
+        now = time.monotonic()
+        with self._lock:
+            if self._models is not None and now < self._models_expires:
+                return self._models
+        models = [model.id for model in self.openai.models.list().data]
+        with self._lock:
+            self._models = models
+            self._models_expires = now + self.models_ttl_seconds
+        return models
+
+    async def aclose(self):
+        with self._lock:
+            openai, http = self._openai, self._http
+            self._openai = self._http = None
+            self._models = None
+        if openai is not None:
+            openai.close()
+        if http is not None:
+            await http.aclose()
@@ -0,0 +1,313 @@
+import asyncio
+import heapq
+import itertools
+import time
+from abc import ABC, abstractmethod
+from contextlib import asynccontextmanager
+from dataclasses import dataclass, field
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, List, Optional
+
+import httpx
+
+# Lower runs first.
+PRIORITY_INTERACTIVE = 0
+PRIORITY_BACKGROUND = 10
+
+PRIORITIES = {
+    "interactive": PRIORITY_INTERACTIVE,
+    "background": PRIORITY_BACKGROUND,
+}
+
+
+@dataclass
+class LLMRequest:
+    system: str
+    prompt: str
+    model: Optional[str] = None
+    json_mode: bool = False
+    temperature: Optional[float] = None
+
+
+@dataclass
+class LLMResult:
+    text: str
+    model: str
+    backend: str
+    id: Optional[str] = None
+    usage: Dict[str, int] = field(default_factory=dict)
+
+    def to_dict(self) -> dict:
+        return {
+            "id": self.id,
+            "backend": self.backend,
+            "model": self.model,
+            "usage": self.usage,
+            "text": self.text,
+        }
+
+
+class LLMBackend(ABC):
+    """
+    A chat completion provider. Subclasses implement complete().
+    """
+
+    def __init__(self, name: str, default_model: str, max_concurrency: int = 4):
+        self.name = name
+        self.default_model = default_model
+        self.max_concurrency = max_concurrency
+
+    @abstractmethod
+    async def complete(self, request: LLMRequest) -> LLMResult:
+        ...
+
+    async def aclose(self):
+        pass
+
+    @staticmethod
+    def _usage(prompt_tokens: Optional[int], completion_tokens: Optional[int]) -> Dict[str, int]:
+        prompt_tokens = prompt_tokens or 0
+        completion_tokens = completion_tokens or 0
+        return {
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": completion_tokens,
+            "total_tokens": prompt_tokens + completion_tokens,
+        }
+
+
+class OpenAIBackend(LLMBackend):
+    """
+    Chat completions over an OpenAI compatible HTTP API. The client is
+    expected to carry base_url and authorization, see LLMClientManager.
+    """
+
+    def __init__(self, client: Callable[[], httpx.AsyncClient], name: str = "openai",
+                 default_model: str = "gpt-4o-mini", max_concurrency: int = 8):
+        super().__init__(name, default_model, max_concurrency)
+        self.client = client
+
+    async def complete(self, request: LLMRequest) -> LLMResult:
+        payload = {
+            "model": request.model or self.default_model,
+            "messages": [
+                {"role": "system", "content": request.system},
+                {"role": "user", "content": request.prompt}
+            ],
+        }
+        if request.temperature is not None:
+            payload["temperature"] = request.temperature
+        if request.json_mode:
+            payload["response_format"] = {"type": "json_object"}
+        response = await self.client().post("/chat/completions", json=payload)
+        response.raise_for_status()
+        data = response.json()
+        usage = data.get("usage") or {}
+        return LLMResult(
+            text=data["choices"][0]["message"]["content"] or "",
+            model=data.get("model") or payload["model"],
+            backend=self.name,
+            id=data.get("id"),
+            usage=self._usage(usage.get("prompt_tokens"), usage.get("completion_tokens")),
+        )
+
+
+class OllamaBackend(LLMBackend):
+    """
+    Ollama's /api/chat without streaming.
+    """
+
+    def __init__(self, base_url: str = "http://localhost:11434", name: str = "ollama",
+                 default_model: str = "qwen3-vl:8b", max_concurrency: int = 1, timeout: float = 300.0):
+        super().__init__(name, default_model, max_concurrency)
+        self.http = httpx.AsyncClient(
+            base_url=base_url.rstrip("/"),
+            timeout=timeout,
+            limits=httpx.Limits(max_connections=max_concurrency, max_keepalive_connections=max_concurrency),
+        )
+
+    async def complete(self, request: LLMRequest) -> LLMResult:
+        payload = {
+            "model": request.model or self.default_model,
+            "stream": False,
+            "messages": [
+                {"role": "system", "content": request.system},
+                {"role": "user", "content": request.prompt}
+            ],
+        }
+        if request.temperature is not None:
+            payload["options"] = {"temperature": request.temperature}
+        if request.json_mode:
+            payload["format"] = "json"
+        response = await self.http.post("/api/chat", json=payload)
+        response.raise_for_status()
+        data = response.json()
+        return LLMResult(
+            text=(data.get("message") or {}).get("content", ""),
+            model=data.get("model") or payload["model"],
+            backend=self.name,
+            usage=self._usage(data.get("prompt_eval_count"), data.get("eval_count")),
+        )
+
+    async def aclose(self):
+        await self.http.aclose()
+
+
+class StubBackend(LLMBackend):
+    """
+    Local backend for tests and offline development. Replies with
+    reply(request), by default an echo of the prompt, after `delay` seconds.
+    """
+
+    def __init__(self, name: str = "stub", default_model: str = "stub", max_concurrency: int = 4,
+                 delay: float = 0.0, reply: Optional[Callable[[LLMRequest], str]] = None):
+        super().__init__(name, default_model, max_concurrency)
+        self.delay = delay
+        self.reply = reply or (lambda request: request.prompt)
+
+    async def complete(self, request: LLMRequest) -> LLMResult:
+        if self.delay:
+            await asyncio.sleep(self.delay)
+        text = self.reply(request)
+        return LLMResult(
+            text=text,
+            model=request.model or self.default_model,
+            backend=self.name,
+            usage=self._usage(len(request.prompt.split()), len(text.split())),
+        )
+
+
+class _Lane:
+    """
+    Concurrency slots of one backend, handed out by priority, then FIFO.
+    """
+
+    def __init__(self, max_concurrency: int):
+        self.max_concurrency = max(1, max_concurrency)
+        self.active = 0
+        self._waiters: List[tuple] = []
+        self._sequence = itertools.count()
+        self.completed = 0
+        self.failed = 0
+        self.timed_out = 0
+        self.wait_seconds = 0.0
+
+    async def acquire(self, priority: int):
+        if self.active < self.max_concurrency and not self._waiters:
+            self.active += 1
+            return
+        future = asyncio.get_running_loop().create_future()
+        entry = (priority, next(self._sequence), future)
+        heapq.heappush(self._waiters, entry)
+        try:
+            await future
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled():
+                # the slot was handed over just as we gave up
+                self.release()
+            elif entry in self._waiters:
+                self._waiters.remove(entry)
+                heapq.heapify(self._waiters)
+            raise
+
+    def release(self):
+        while self._waiters:
+            _, _, future = heapq.heappop(self._waiters)
+            if not future.done():
+                # the slot passes on directly, active stays the same
+                future.set_result(None)
+                return
+        self.active -= 1
+
+    @property
+    def queued(self) -> int:
+        return sum(1 for _, _, future in self._waiters if not future.done())
+
+
+class LLMGateway:
+    """
+    Single entry point for LLM calls.
+
+    Every backend has a concurrency cap. Calls beyond it wait in a priority
+    queue, so interactive requests overtake queued background work (e.g.
+    annotation) on a busy backend. `timeout` limits the call itself and
+    starts once it has a slot, so time spent queued never times out.
+    """
+
+    def __init__(self, backends: List[LLMBackend], default_backend: Optional[str] = None,
+                 timeout: float = 120.0):
+        self.backends: Dict[str, LLMBackend] = {backend.name: backend for backend in backends}
+        self.default_backend = default_backend or backends[0].name
+        self.timeout = timeout
+        self._lanes = {backend.name: _Lane(backend.max_concurrency) for backend in backends}
+
+    def backend(self, name: Optional[str] = None) -> LLMBackend:
+        name = name or self.default_backend
+        if name not in self.backends:
+            raise ValueError(f"Unknown LLM backend: {name}")
+        return self.backends[name]
+
+    async def run(self, backend: Optional[str], call: Callable[[], Awaitable[Any]],
+                  priority: int = PRIORITY_INTERACTIVE, timeout: Optional[float] = None) -> Any:
+        """
+        Runs `call` in a slot of the backend. Used for calls that do not fit
+        complete(), e.g. the Responses API.
+        """
+        lane = self._lanes[self.backend(backend).name]
+        queued_at = time.monotonic()
+        await lane.acquire(priority)
+        lane.wait_seconds += time.monotonic() - queued_at
+        try:
+            result = await asyncio.wait_for(call(), timeout if timeout is not None else self.timeout)
+        except asyncio.TimeoutError:
+            lane.timed_out += 1
+            raise TimeoutError(f"LLM backend '{self.backend(backend).name}' timed out")
+        except Exception:
+            lane.failed += 1
+            raise
+        finally:
+            lane.release()
+        lane.completed += 1
+        return result
+
+    @asynccontextmanager
+    async def slot(self, backend: Optional[str] = None, priority: int = PRIORITY_INTERACTIVE) -> AsyncIterator[None]:
+        """
+        Holds a slot of the backend for the body of the with block. Used for
+        streamed responses, which run as long as the model keeps writing, so
+        `timeout` does not apply to them.
+        """
+        lane = self._lanes[self.backend(backend).name]
+        queued_at = time.monotonic()
+        await lane.acquire(priority)
+        lane.wait_seconds += time.monotonic() - queued_at
+        try:
+            yield
+        except Exception:
+            lane.failed += 1
+            raise
+        finally:
+            lane.release()
+        lane.completed += 1
+
+    async def complete(self, request: LLMRequest, backend: Optional[str] = None,
+                       priority: int = PRIORITY_INTERACTIVE, timeout: Optional[float] = None) -> LLMResult:
+        target = self.backend(backend)
+        return await self.run(target.name, lambda: target.complete(request), priority, timeout)
+
+    def stats(self) -> dict:
+        result = {}
+        for name, lane in self._lanes.items():
+            finished = lane.completed + lane.failed
+            result[name] = {
+                "max_concurrency": lane.max_concurrency,
+                "active": lane.active,
+                "queued": lane.queued,
+                "completed": lane.completed,
+                "failed": lane.failed,
+                "timed_out": lane.timed_out,
+                "avg_wait_ms": round(lane.wait_seconds / finished * 1000, 1) if finished else 0.0,
+            }
+        return {"default_backend": self.default_backend, "backends": result}
+
+    async def aclose(self):
+        for backend in self.backends.values():
+            await backend.aclose()
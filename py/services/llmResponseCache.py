@@ -0,0 +1,72 @@
+import threading
+from typing import Any, Optional
+
+from py.services.persistentCache import PersistentCache
+
+
+class LLMResponseCache:
+    """
+    Content-addressed cache for LLM responses.
+
+    Keys are hashes of everything that shapes the answer (endpoint, model,
+    system prompt, user prompt and request options). Alongside the hit
+    counters it records the tokens that cache hits did not have to pay for.
+    """
+
+    def __init__(self, cache: PersistentCache):
+        self.cache = cache
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.bypassed = 0
+        self.saved_prompt_tokens = 0
+        self.saved_completion_tokens = 0
+
+    def key(self, endpoint: str, model: str, system: str, prompt: str, **options) -> str:
+        return PersistentCache.make_key(endpoint, model, system, prompt, options)
+
+    def get(self, key: str) -> Optional[Any]:
+        entry = self.lookup(key)
+        return entry["response"] if entry is not None else None
+
+    def lookup(self, key: str) -> Optional[dict]:
+        """
+        Like get(), but returns the whole entry: {"response", "usage"}.
+        """
+        entry = self.cache.get(key)
+        with self._lock:
+            if entry is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self.saved_prompt_tokens += entry["usage"].get("prompt_tokens", 0)
+            self.saved_completion_tokens += entry["usage"].get("completion_tokens", 0)
+        return entry
+
+    def bypass(self):
+        with self._lock:
+            self.bypassed += 1
+
+    def put(self, key: str, response: Any, prompt_tokens: int = 0, completion_tokens: int = 0):
+        self.cache.put(key, {
+            "response": response,
+            "usage": {"prompt_tokens": prompt_tokens or 0, "completion_tokens": completion_tokens or 0},
+        })
+
+    def clear(self):
+        self.cache.clear()
+
+    def stats(self) -> dict:
+        stats = self.cache.stats()
+        with self._lock:
+            lookups = self.hits + self.misses
+            stats.update({
+                "hits": self.hits,
+                "misses": self.misses,
+                "bypassed": self.bypassed,
+                "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+                "saved_prompt_tokens": self.saved_prompt_tokens,
+                "saved_completion_tokens": self.saved_completion_tokens,
+                "saved_total_tokens": self.saved_prompt_tokens + self.saved_completion_tokens,
+            })
+        return stats
@@ -0,0 +1,75 @@
+import json
+from typing import Any, AsyncIterator, Tuple
+
+import httpx
+
+
+def sse_event(event: str, data: Any) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
+async def _data_events(response: httpx.Response) -> AsyncIterator[dict]:
+    async for line in response.aiter_lines():
+        if not line.startswith("data:"):
+            continue
+        data = line[5:].strip()
+        if data == "[DONE]":
+            return
+        if data:
+            yield json.loads(data)
+
+
+async def _open(http: httpx.AsyncClient, path: str, payload: dict):
+    request = http.build_request("POST", path, json=payload)
+    response = await http.send(request, stream=True)
+    if response.is_error:
+        await response.aread()
+        await response.aclose()
+        response.raise_for_status()
+    return response
+
+
+async def stream_chat_completion(http: httpx.AsyncClient, payload: dict) -> AsyncIterator[Tuple[str, Any]]:
+    """
+    Streams a chat completion. Yields ("delta", text) while tokens arrive and
+    finally ("completed", {"id", "model", "usage"}).
+    """
+    response = await _open(http, "/chat/completions", {
+        **payload, "stream": True, "stream_options": {"include_usage": True}
+    })
+    completed = {"id": None, "model": payload.get("model"), "usage": None}
+    try:
+        async for chunk in _data_events(response):
+            completed["id"] = chunk.get("id") or completed["id"]
+            completed["model"] = chunk.get("model") or completed["model"]
+            for choice in chunk.get("choices") or []:
+                text = (choice.get("delta") or {}).get("content")
+                if text:
+                    yield "delta", text
+            if chunk.get("usage"):
+                completed["usage"] = chunk["usage"]
+    finally:
+        await response.aclose()
+    yield "completed", completed
+
+
+async def stream_response(http: httpx.AsyncClient, payload: dict) -> AsyncIterator[Tuple[str, Any]]:
+    """
+    Streams a Responses API call. Yields ("delta", text) for every output
+    text delta and finally ("completed", response) with the usage block.
+    """
+    response = await _open(http, "/responses", {**payload, "stream": True})
+    completed = {}
+    try:
+        async for event in _data_events(response):
+            kind = event.get("type")
+            if kind == "response.output_text.delta":
+                yield "delta", event.get("delta", "")
+            elif kind == "response.completed":
+                completed = event.get("response") or {}
+            elif kind in ("response.failed", "error"):
+                error = (event.get("response") or {}).get("error") or event
+                raise RuntimeError(error.get("message") or json.dumps(error))
+    finally:
+        await response.aclose()
+    yield "completed", completed
@@ -0,0 +1,238 @@
+import hashlib
+import json
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+
+from sqlalchemy import bindparam, delete, func, select, update
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.orm import Session
+
+from py.domains.ImparaDomainsORM import CacheEntry
+
+
+class PersistentCache:
+    """
+    Two-tier cache: an in-memory LRU in front of the cache_entry table.
+
+    Values must be JSON serializable. Entries of one namespace are evicted
+    from disk by least recent access once their total size exceeds max_bytes.
+    With ttl_seconds entries expire in both tiers.
+
+    Hits only read the database. Their access times are collected and
+    written in one transaction every touch_interval seconds, and before an
+    eviction, so a read-mostly cache does not take the write lock per lookup.
+    """
+
+    def __init__(self, engine, namespace: str, memory_items: int = 1024,
+                 max_bytes: int = 64 * 1024 * 1024, ttl_seconds: Optional[float] = None,
+                 touch_interval: float = 60.0):
+        self.engine = engine
+        self.namespace = namespace
+        self.memory_items = memory_items
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self.touch_interval = touch_interval
+        self._memory: "OrderedDict[str, tuple]" = OrderedDict()
+        self._touched: Dict[str, float] = {}
+        self._touched_since = time.time()
+        self._lock = threading.Lock()
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        with Session(self.engine) as session:
+            self._bytes = session.scalar(
+                select(func.sum(CacheEntry.size_bytes)).where(CacheEntry.namespace == namespace)
+            ) or 0
+
+    @staticmethod
+    def make_key(*parts) -> str:
+        raw = json.dumps(parts, ensure_ascii=False, sort_keys=True, separators=(",", ":"))
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    def _remember(self, key: str, value: Any, expires_ts: Optional[float]):
+        self._memory[key] = (value, expires_ts)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_items:
+            self._memory.popitem(last=False)
+
+    def _touch(self, key: str, now: float) -> bool:
+        """
+        Notes an access, called with the lock held. True once the collected
+        access times are due to be written.
+        """
+        self._touched[key] = now
+        return now - self._touched_since >= self.touch_interval
+
+    def get(self, key: str) -> Optional[Any]:
+        now = time.time()
+        with self._lock:
+            cached = self._memory.get(key)
+            if cached is not None:
+                value, expires_ts = cached
+                if expires_ts is None or expires_ts > now:
+                    self._memory.move_to_end(key)
+                    self.memory_hits += 1
+                    due = self._touch(key, now)
+                else:
+                    del self._memory[key]
+                    cached = None
+        if cached is not None:
+            if due:
+                self.flush_access_times()
+            return value
+
+        with Session(self.engine) as session:
+            entry = session.get(CacheEntry, (self.namespace, key))
+            if entry is None or (entry.expires_ts is not None and entry.expires_ts <= now):
+                with self._lock:
+                    self.misses += 1
+                return None
+            value = json.loads(entry.value)
+            expires_ts = entry.expires_ts
+
+        with self._lock:
+            self.disk_hits += 1
+            self._remember(key, value, expires_ts)
+            due = self._touch(key, now)
+        if due:
+            self.flush_access_times()
+        return value
+
+    def flush_access_times(self):
+        """
+        Writes the access times collected since the last flush.
+        """
+        with self._lock:
+            touched, self._touched = self._touched, {}
+            self._touched_since = time.time()
+        if not touched:
+            return
+        table = CacheEntry.__table__
+        with Session(self.engine) as session:
+            session.execute(
+                update(table)
+                .where(table.c.namespace == self.namespace, table.c.key == bindparam("touched_key"))
+                .values(last_access_ts=bindparam("touched_ts")),
+                [{"touched_key": key, "touched_ts": ts} for key, ts in touched.items()]
+            )
+            session.commit()
+
+    def put(self, key: str, value: Any, ttl_seconds: Optional[float] = None):
+        now = time.time()
+        ttl = ttl_seconds if ttl_seconds is not None else self.ttl_seconds
+        expires_ts = now + ttl if ttl else None
+        raw = json.dumps(value, ensure_ascii=False)
+        size = len(raw.encode("utf-8"))
+        with Session(self.engine) as session:
+            previous = session.scalar(
+                select(CacheEntry.size_bytes).where(CacheEntry.namespace == self.namespace, CacheEntry.key == key)
+            ) or 0
+            stmt = sqlite_insert(CacheEntry.__table__).values(
+                namespace=self.namespace, key=key, value=raw, size_bytes=size,
+                created_ts=now, last_access_ts=now, expires_ts=expires_ts
+            )
+            session.execute(stmt.on_conflict_do_update(
+                index_elements=["namespace", "key"],
+                set_={
+                    "value": stmt.excluded.value,
+                    "size_bytes": stmt.excluded.size_bytes,
+                    "created_ts": stmt.excluded.created_ts,
+                    "last_access_ts": stmt.excluded.last_access_ts,
+                    "expires_ts": stmt.excluded.expires_ts,
+                }
+            ))
+            session.commit()
+        with self._lock:
+            self._bytes += size - previous
+            self._touched.pop(key, None)
+            self._remember(key, value, expires_ts)
+            over_limit = self._bytes > self.max_bytes
+        if over_limit:
+            self.evict()
+
+    def evict(self):
+        """
+        Drops expired entries, then the least recently accessed ones until
+        the namespace is back to 90% of max_bytes.
+        """
+        target = int(self.max_bytes * 0.9)
+        # recent hits must count before the least recently used are picked
+        self.flush_access_times()
+        with Session(self.engine) as session:
+            removed = session.execute(
+                delete(CacheEntry).where(
+                    CacheEntry.namespace == self.namespace,
+                    CacheEntry.expires_ts.is_not(None),
+                    CacheEntry.expires_ts <= time.time()
+                )
+            ).rowcount or 0
+            total = session.scalar(
+                select(func.sum(CacheEntry.size_bytes)).where(CacheEntry.namespace == self.namespace)
+            ) or 0
+            victims = []
+            if total > target:
+                for key, size in session.execute(
+                    select(CacheEntry.key, CacheEntry.size_bytes)
+                    .where(CacheEntry.namespace == self.namespace)
+                    .order_by(CacheEntry.last_access_ts)
+                ):
+                    if total <= target:
+                        break
+                    victims.append(key)
+                    total -= size
+                for i in range(0, len(victims), 500):
+                    session.execute(delete(CacheEntry).where(
+                        CacheEntry.namespace == self.namespace,
+                        CacheEntry.key.in_(victims[i:i + 500])
+                    ))
+            session.commit()
+        with self._lock:
+            for key in victims:
+                self._memory.pop(key, None)
+            self.evictions += removed + len(victims)
+            self._bytes = total
+
+    def delete(self, key: str):
+        with Session(self.engine) as session:
+            size = session.scalar(
+                select(CacheEntry.size_bytes).where(CacheEntry.namespace == self.namespace, CacheEntry.key == key)
+            ) or 0
+            session.execute(delete(CacheEntry).where(CacheEntry.namespace == self.namespace, CacheEntry.key == key))
+            session.commit()
+        with self._lock:
+            self._memory.pop(key, None)
+            self._touched.pop(key, None)
+            self._bytes -= size
+
+    def clear(self):
+        with Session(self.engine) as session:
+            session.execute(delete(CacheEntry).where(CacheEntry.namespace == self.namespace))
+            session.commit()
+        with self._lock:
+            self._memory.clear()
+            self._touched.clear()
+            self._bytes = 0
+
+    def stats(self) -> dict:
+        with Session(self.engine) as session:
+            entries = session.scalar(
+                select(func.count()).select_from(CacheEntry).where(CacheEntry.namespace == self.namespace)
+            ) or 0
+        with self._lock:
+            hits = self.memory_hits + self.disk_hits
+            total = hits + self.misses
+            return {
+                "namespace": self.namespace,
+                "entries": entries,
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "memory_entries": len(self._memory),
+                "memory_hits": self.memory_hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_ratio": round(hits / total, 4) if total else 0.0,
+            }
@@ -0,0 +1,92 @@
+import asyncio
+import threading
+from typing import Any, Awaitable, Callable, Dict, Hashable
+
+
+class _Call:
+    __slots__ = ("event", "result", "error")
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """
+    Coalesces identical concurrent calls.
+
+    While a call for a key is in flight, further calls for the same key wait
+    for it and receive its result, or its exception, instead of starting
+    their own. Nothing is remembered once the call has finished, so a
+    failure is never served to later callers. do() is for worker threads,
+    do_async() for coroutines on the event loop.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls: Dict[Hashable, _Call] = {}
+        self._futures: Dict[Hashable, asyncio.Future] = {}
+        self.upstream_calls = 0
+        self.coalesced = 0
+        self.failures = 0
+
+    def do(self, key: Hashable, fn: Callable[[], Any]) -> Any:
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+                self.upstream_calls += 1
+            else:
+                self.coalesced += 1
+
+        if not leader:
+            call.event.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = fn()
+            return call.result
+        except BaseException as e:
+            call.error = e
+            with self._lock:
+                self.failures += 1
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.event.set()
+
+    async def do_async(self, key: Hashable, fn: Callable[[], Awaitable[Any]]) -> Any:
+        with self._lock:
+            task = self._futures.get(key)
+            if task is None:
+                # the call runs as a task of its own, so it does not depend
+                # on the caller that started it staying around
+                task = self._futures[key] = asyncio.ensure_future(fn())
+                task.add_done_callback(lambda t: self._finished(key, t))
+                self.upstream_calls += 1
+            else:
+                self.coalesced += 1
+        # shield: a caller that gives up, the first one included, only stops
+        # waiting; the shared call goes on for the others
+        return await asyncio.shield(task)
+
+    def _finished(self, key: Hashable, task: asyncio.Future):
+        with self._lock:
+            if self._futures.get(key) is task:
+                del self._futures[key]
+            if not task.cancelled() and task.exception() is not None:  # also marks it retrieved
+                self.failures += 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "in_flight": len(self._calls) + len(self._futures),
+                "upstream_calls": self.upstream_calls,
+                "coalesced": self.coalesced,
+                "failures": self.failures,
+            }
@@ -0,0 +1,41 @@
+from typing import Dict, Optional
+
+from sqlalchemy import event
+
+# WAL lets readers run while a process writes, and with synchronous=NORMAL
+# a commit only syncs at checkpoints. busy_timeout makes a writer wait for
+# the write lock instead of failing with "database is locked".
+SQLITE_PRAGMAS = {
+    "journal_mode": "WAL",
+    "busy_timeout": 5000,
+    "synchronous": "NORMAL",
+    "mmap_size": 256 * 1024 * 1024,
+    "cache_size": -16 * 1024,  # KiB, per connection
+}
+
+
+def sqlite_pragmas(overrides: Optional[Dict[str, object]] = None) -> Dict[str, object]:
+    """
+    SQLITE_PRAGMAS with overrides applied. A pragma set to None is left at
+    SQLite's default.
+    """
+    pragmas = {**SQLITE_PRAGMAS, **(overrides or {})}
+    return {name: value for name, value in pragmas.items() if value is not None}
+
+
+def apply_sqlite_pragmas(engine, overrides: Optional[Dict[str, object]] = None):
+    """
+    Runs the pragmas on every new connection of engine. Works for sync
+    engines and, through their sync_engine, for aiosqlite engines.
+    """
+    pragmas = sqlite_pragmas(overrides)
+
+    def on_connect(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        try:
+            for name, value in pragmas.items():
+                cursor.execute(f"PRAGMA {name} = {value}")
+        finally:
+            cursor.close()
+
+    event.listen(getattr(engine, "sync_engine", engine), "connect", on_connect)
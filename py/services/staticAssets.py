@@ -0,0 +1,201 @@
+import gzip
+import hashlib
+import mimetypes
+import os
+import re
+import tempfile
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional
+
+from starlette.datastructures import Headers
+from starlette.responses import FileResponse, Response
+from starlette.staticfiles import StaticFiles
+
+COMPRESSIBLE = {".js", ".mjs", ".css", ".html", ".svg", ".json", ".map", ".txt", ".xml", ".webmanifest", ".ico"}
+# in order of preference when a client accepts several
+ENCODINGS = {"br": ".br", "gzip": ".gz"}
+# main.3f9c0a7d21e4b6c8.js (browser builder) or main-KX3V7Q2A.js (application builder)
+HASHED_NAME = re.compile(r"[.-]([0-9a-f]{16,}|[0-9A-Z]{8})\.[^./]+$")
+
+IMMUTABLE = "public, max-age=31536000, immutable"
+REVALIDATE = "no-cache"
+
+
+def _brotli():
+    try:
+        import brotli
+    except ImportError:
+        return None
+    return brotli
+
+
+def compress(data: bytes, encoding: str) -> bytes:
+    if encoding == "gzip":
+        return gzip.compress(data, compresslevel=9, mtime=0)
+    return _brotli().compress(data, quality=11)
+
+
+def available_encodings() -> List[str]:
+    return [e for e in ENCODINGS if e != "br" or _brotli() is not None]
+
+
+def accepted_encodings(accept_encoding: str) -> set:
+    """
+    Content codings of an Accept-Encoding header with a non-zero q-value.
+    """
+    accepted, refused = set(), set()
+    for part in accept_encoding.lower().split(","):
+        coding, _, params = part.strip().partition(";")
+        q = 1.0
+        for param in params.split(";"):
+            name, _, value = param.strip().partition("=")
+            if name == "q":
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        (accepted if q > 0 else refused).add(coding.strip())
+    if "*" in accepted:
+        accepted |= set(ENCODINGS) - refused
+    return accepted
+
+
+def etag_matches(if_none_match: str, etag: str) -> bool:
+    # If-None-Match uses the weak comparison
+    tags = [t.strip() for t in if_none_match.split(",")]
+    return "*" in tags or etag in (t[2:] if t.startswith("W/") else t for t in tags)
+
+
+class ImmutableStaticFiles(StaticFiles):
+    """
+    StaticFiles for a directory whose files never change once written, e.g.
+    content-addressed audio, so clients may cache them for good.
+    """
+
+    def file_response(self, *args, **kwargs) -> Response:
+        response = super().file_response(*args, **kwargs)
+        response.headers["cache-control"] = IMMUTABLE
+        return response
+
+
+@dataclass
+class StaticVariant:
+    path: Path
+    stat: os.stat_result
+    etag: str
+    body: Optional[bytes] = None
+
+
+@dataclass
+class StaticAsset:
+    media_type: str
+    cache_control: str
+    variants: Dict[str, StaticVariant] = field(default_factory=dict)
+
+
+class StaticAssets:
+    """
+    The built Angular app, indexed once. Requests are answered from the
+    index without touching the file system: each file has a strong ETag
+    from its content, hashed bundles are cached as immutable, and
+    compressible files are served as their .br/.gz sibling when the client
+    accepts it. index.html is kept in memory.
+
+    With precompress missing or outdated .gz/.br siblings are written while
+    indexing (.br needs the brotli package), so only the first start after
+    a build pays for compression.
+    """
+
+    def __init__(self, folder: Path, precompress: bool = True, min_size: int = 1024,
+                 memory_files: Iterable[str] = ("index.html",)):
+        self.folder = Path(folder)
+        self.precompress = precompress
+        self.min_size = min_size
+        self.memory_files = set(memory_files)
+        self.assets: Dict[str, StaticAsset] = {}
+        self.reload()
+
+    @property
+    def index(self) -> Optional[StaticAsset]:
+        return self.assets.get("index.html")
+
+    def get(self, path: str) -> Optional[StaticAsset]:
+        return self.assets.get(path.lstrip("/"))
+
+    def reload(self) -> int:
+        assets = {}
+        for root, _, files in os.walk(self.folder):
+            for name in files:
+                path = Path(root) / name
+                if path.suffix in (".br", ".gz") and path.with_suffix("").exists():
+                    continue
+                key = path.relative_to(self.folder).as_posix()
+                assets[key] = self._index_file(key, path)
+        self.assets = assets
+        return len(assets)
+
+    def _index_file(self, key: str, path: Path) -> StaticAsset:
+        in_memory = key in self.memory_files
+        data = path.read_bytes()
+        digest = hashlib.sha256(data).hexdigest()[:32]
+        asset = StaticAsset(
+            media_type=mimetypes.guess_type(path.name)[0] or "application/octet-stream",
+            cache_control=IMMUTABLE if HASHED_NAME.search(path.name) else REVALIDATE,
+        )
+        stat = path.stat()
+        asset.variants["identity"] = StaticVariant(path, stat, f'"{digest}"', data if in_memory else None)
+        if path.suffix not in COMPRESSIBLE:
+            return asset
+        for encoding, suffix in ENCODINGS.items():
+            etag = f'"{digest}-{encoding}"'
+            if in_memory:
+                if encoding in available_encodings():
+                    asset.variants[encoding] = StaticVariant(path, stat, etag, compress(data, encoding))
+                continue
+            sibling = path.with_name(path.name + suffix)
+            if self.precompress and len(data) >= self.min_size and encoding in available_encodings():
+                self._write_sibling(sibling, data, encoding, stat)
+            try:
+                sibling_stat = sibling.stat()
+            except FileNotFoundError:
+                continue
+            if sibling_stat.st_mtime >= stat.st_mtime:
+                asset.variants[encoding] = StaticVariant(sibling, sibling_stat, etag)
+        return asset
+
+    @staticmethod
+    def _write_sibling(sibling: Path, data: bytes, encoding: str, stat: os.stat_result):
+        try:
+            if sibling.stat().st_mtime >= stat.st_mtime:
+                return
+        except FileNotFoundError:
+            pass
+        # a unique temp name, so processes that precompress the same folder
+        # never write into each other's file before it is published
+        tmp = None
+        try:
+            fd, tmp = tempfile.mkstemp(dir=sibling.parent, prefix=sibling.name + ".", suffix=".tmp")
+            with os.fdopen(fd, "wb") as f:
+                f.write(compress(data, encoding))
+            os.replace(tmp, sibling)
+        except OSError as e:
+            print(f"Warning: could not write {sibling}: {e}")
+            if tmp:
+                Path(tmp).unlink(missing_ok=True)
+
+    def response(self, asset: StaticAsset, request_headers: Headers) -> Response:
+        accepted = accepted_encodings(request_headers.get("accept-encoding", ""))
+        encoding = next((e for e in ENCODINGS if e in accepted and e in asset.variants), "identity")
+        variant = asset.variants[encoding]
+        headers = {"etag": variant.etag, "cache-control": asset.cache_control}
+        if len(asset.variants) > 1:
+            headers["vary"] = "Accept-Encoding"
+        if_none_match = request_headers.get("if-none-match")
+        if if_none_match and etag_matches(if_none_match, variant.etag):
+            return Response(status_code=304, headers=headers)
+        if encoding != "identity":
+            headers["content-encoding"] = encoding
+        if variant.body is not None:
+            return Response(variant.body, media_type=asset.media_type, headers=headers)
+        return FileResponse(variant.path, media_type=asset.media_type, headers=headers, stat_result=variant.stat)
@@ -0,0 +1,261 @@
+import importlib.util
+import io
+import os
+import re
+import tempfile
+import threading
+from abc import ABC, abstractmethod
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Tuple
+
+from py.services.lessonAnnotator import split_sentences
+from py.services.persistentCache import PersistentCache
+from py.services.singleFlight import SingleFlight
+
+
+class TTSEngine(ABC):
+    """
+    Renders text to audio bytes. Engine libraries are imported lazily, so a
+    missing optional dependency only disables that engine.
+    """
+
+    name = ""
+    module = ""
+    extension = ""
+    media_type = ""
+
+    def available(self) -> bool:
+        return importlib.util.find_spec(self.module) is not None
+
+    @abstractmethod
+    def render(self, text: str, lang: str) -> bytes:
+        ...
+
+
+class Pyttsx3Engine(TTSEngine):
+    """
+    Offline speech through the platform voices (SAPI5, NSSpeechSynthesizer,
+    eSpeak). The driver must only be used from the thread that created it
+    (SAPI5 is a COM object), so all renders run on one thread of their own.
+    """
+
+    name = "pyttsx3"
+    module = "pyttsx3"
+    extension = "wav"
+    media_type = "audio/wav"
+
+    def __init__(self, rate: Optional[int] = None):
+        self.rate = rate
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="pyttsx3")
+        self._engine = None
+
+    def _voice_for(self, lang: str) -> Optional[str]:
+        lang = lang.lower()
+        for voice in self._engine.getProperty("voices"):
+            languages = [
+                (l.decode("utf-8", "ignore") if isinstance(l, bytes) else str(l)).lstrip("\x05").lower()
+                for l in (getattr(voice, "languages", None) or [])
+            ]
+            if any(l.startswith(lang) for l in languages) or lang in re.split(r"[\W_]+", voice.id.lower()):
+                return voice.id
+        return None
+
+    def render(self, text: str, lang: str) -> bytes:
+        return self._executor.submit(self._render, text, lang).result()
+
+    def _render(self, text: str, lang: str) -> bytes:
+        import pyttsx3
+
+        if self._engine is None:
+            self._engine = pyttsx3.init()
+            if self.rate:
+                self._engine.setProperty("rate", self.rate)
+        voice = self._voice_for(lang)
+        if voice:
+            self._engine.setProperty("voice", voice)
+        fd, path = tempfile.mkstemp(suffix=f".{self.extension}")
+        os.close(fd)
+        try:
+            self._engine.save_to_file(text, path)
+            self._engine.runAndWait()
+            with open(path, "rb") as f:
+                return f.read()
+        finally:
+            os.remove(path)
+
+
+class GTTSEngine(TTSEngine):
+    """
+    Google Translate's text-to-speech. Needs network access.
+    """
+
+    name = "gtts"
+    module = "gtts"
+    extension = "mp3"
+    media_type = "audio/mpeg"
+
+    def render(self, text: str, lang: str) -> bytes:
+        from gtts import gTTS
+
+        buffer = io.BytesIO()
+        gTTS(text=text, lang=lang).write_to_fp(buffer)
+        return buffer.getvalue()
+
+
+class AudioCache:
+    """
+    Content-addressed audio files in one directory, evicted by least recent
+    use (file mtime) once they exceed max_bytes. Files never change once
+    written, so they can be served as immutable static files.
+    """
+
+    def __init__(self, directory: Path, max_bytes: int = 512 * 1024 * 1024):
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._bytes = sum(p.stat().st_size for p in self.directory.iterdir() if p.is_file())
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def path(self, key: str, extension: str) -> Path:
+        return self.directory / f"{key}.{extension}"
+
+    def get(self, key: str, extension: str) -> Optional[Path]:
+        path = self.path(key, extension)
+        try:
+            os.utime(path)
+        except FileNotFoundError:
+            with self._lock:
+                self.misses += 1
+            return None
+        with self._lock:
+            self.hits += 1
+        return path
+
+    def put(self, key: str, extension: str, audio: bytes) -> Path:
+        path = self.path(key, extension)
+        previous = path.stat().st_size if path.exists() else 0
+        fd, tmp = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        with os.fdopen(fd, "wb") as f:
+            f.write(audio)
+        os.replace(tmp, path)
+        with self._lock:
+            self._bytes += len(audio) - previous
+            over_limit = self._bytes > self.max_bytes
+        if over_limit:
+            self.evict()
+        return path
+
+    def evict(self):
+        target = int(self.max_bytes * 0.9)
+        files = sorted(
+            (p.stat().st_mtime, p.stat().st_size, p) for p in self.directory.iterdir()
+            if p.is_file() and p.suffix != ".tmp"
+        )
+        total = sum(size for _, size, _ in files)
+        removed = 0
+        for _, size, path in files:
+            if total <= target:
+                break
+            try:
+                path.unlink()
+            except FileNotFoundError:
+                pass
+            total -= size
+            removed += 1
+        with self._lock:
+            self._bytes = total
+            self.evictions += removed
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "directory": str(self.directory),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+            }
+
+
+class TextToSpeechService:
+    """
+    Speech synthesis with a disk cache keyed by (engine, lang, text).
+    Identical concurrent renders share one engine call.
+    """
+
+    def __init__(self, engines: List[TTSEngine], cache: AudioCache, default_engine: Optional[str] = None):
+        self.engines: Dict[str, TTSEngine] = {engine.name: engine for engine in engines}
+        self.default_engine = default_engine or engines[0].name
+        self.cache = cache
+        self.flight = SingleFlight()
+        self.rendered = 0
+
+    def engine(self, name: Optional[str] = None) -> TTSEngine:
+        name = name or self.default_engine
+        engine = self.engines.get(name)
+        if engine is None:
+            raise ValueError(f"Unknown TTS engine: {name}")
+        if not engine.available():
+            raise RuntimeError(f"TTS engine '{name}' is not installed")
+        return engine
+
+    @staticmethod
+    def key(engine: str, lang: str, text: str) -> str:
+        return PersistentCache.make_key(engine, lang, text.strip())
+
+    def synthesize(self, text: str, lang: str, engine: Optional[str] = None) -> Tuple[Path, TTSEngine]:
+        tts = self.engine(engine)
+        key = self.key(tts.name, lang, text)
+        path = self.cache.get(key, tts.extension)
+        if path is not None:
+            return path, tts
+
+        def render():
+            audio = tts.render(text.strip(), lang)
+            self.rendered += 1
+            return self.cache.put(key, tts.extension, audio)
+
+        return self.flight.do(key, render), tts
+
+    def audio_name(self, text: str, lang: str, engine: Optional[str] = None) -> str:
+        tts = self.engines[engine or self.default_engine]
+        return self.cache.path(self.key(tts.name, lang, text), tts.extension).name
+
+    def prerender(self, text: str, lang: str, engine: Optional[str] = None,
+                  progress: Optional[Callable[[int, int], None]] = None) -> dict:
+        """
+        Renders every sentence of a text that is not cached yet.
+        progress(done, total) is called before each sentence.
+        """
+        counts = {"sentences": 0, "rendered": 0, "cached": 0, "failed": 0}
+        tts = self.engine(engine)
+        sentences = split_sentences(text)
+        for sentence in sentences:
+            if progress is not None:
+                progress(counts["sentences"], len(sentences))
+            counts["sentences"] += 1
+            if self.cache.path(self.key(tts.name, lang, sentence), tts.extension).exists():
+                counts["cached"] += 1
+                continue
+            try:
+                self.synthesize(sentence, lang, tts.name)
+                counts["rendered"] += 1
+            except Exception as e:
+                counts["failed"] += 1
+                print(f"TTS pre-render failed for {sentence[:40]!r}: {e}")
+        return counts
+
+    def stats(self) -> dict:
+        return {
+            "default_engine": self.default_engine,
+            "engines": {name: engine.available() for name, engine in self.engines.items()},
+            "rendered": self.rendered,
+            "cache": self.cache.stats(),
+        }
@@ -0,0 +1,135 @@
+import asyncio
+import json
+import threading
+from typing import TYPE_CHECKING, List, Optional
+
+import httpx
+
+if TYPE_CHECKING:
+    import requests
+
+from py.services.persistentCache import PersistentCache
+from py.services.singleFlight import SingleFlight
+
+
+class TranslationService:
+    """
+    Client for the local translation service. Results are cached by
+    (text, from, to) and cache misses reuse pooled keep-alive connections.
+    Identical concurrent misses share one upstream request. requests is
+    only imported for the first synchronous call.
+    """
+
+    def __init__(self, cache: PersistentCache, api_url: str = "http://localhost:8000/translate",
+                 timeout: float = 10.0, pool_size: int = 10):
+        self.cache = cache
+        self.api_url = api_url
+        self.timeout = timeout
+        self.pool_size = pool_size
+        self._lock = threading.Lock()
+        self._http: Optional["requests.Session"] = None
+        self._async_http: Optional[httpx.AsyncClient] = None
+        self.flight = SingleFlight()
+
+    @property
+    def http(self) -> "requests.Session":
+        with self._lock:
+            if self._http is None:
+                import requests
+                from requests.adapters import HTTPAdapter
+                self._http = requests.Session()
+                adapter = HTTPAdapter(pool_connections=self.pool_size, pool_maxsize=self.pool_size)
+                self._http.mount("http://", adapter)
+                self._http.mount("https://", adapter)
+                self._http.headers.update({"Content-Type": "application/json; charset=utf-8"})
+            return self._http
+
+    def cache_key(self, text: str, to_lang: str, from_lang: Optional[str] = None) -> str:
+        return PersistentCache.make_key(text, from_lang or "", to_lang)
+
+    def translate(self, text: str, to_lang: str, from_lang: Optional[str] = None, use_cache: bool = True):
+        key = self.cache_key(text, to_lang, from_lang)
+        if use_cache:
+            cached = self.cache.get(key)
+            if cached is not None:
+                return cached
+
+        def fetch():
+            result = self.request(text, to_lang, from_lang)
+            self.cache.put(key, result)
+            return result
+
+        return self.flight.do(key, fetch)
+
+    def _payload(self, text: str, to_lang: str, from_lang: Optional[str] = None) -> bytes:
+        payload = {"text": text, "to": to_lang}
+        if from_lang:
+            payload["from"] = from_lang
+        return json.dumps(payload, ensure_ascii=False).encode("utf-8")
+
+    def request(self, text: str, to_lang: str, from_lang: Optional[str] = None):
+        response = self.http.post(
+            self.api_url,
+            data=self._payload(text, to_lang, from_lang),
+            timeout=self.timeout,
+        )
+        response.raise_for_status()
+        return response.json()
+
+    def _async_client(self) -> httpx.AsyncClient:
+        if self._async_http is None:
+            self._async_http = httpx.AsyncClient(
+                timeout=self.timeout,
+                headers={"Content-Type": "application/json; charset=utf-8"},
+                limits=httpx.Limits(max_connections=self.pool_size, max_keepalive_connections=self.pool_size),
+            )
+        return self._async_http
+
+    async def request_async(self, text: str, to_lang: str, from_lang: Optional[str] = None):
+        response = await self._async_client().post(self.api_url, content=self._payload(text, to_lang, from_lang))
+        response.raise_for_status()
+        return response.json()
+
+    async def translate_batch(self, texts: List[str], to_lang: str, from_lang: Optional[str] = None,
+                              concurrency: int = 8, use_cache: bool = True) -> List[dict]:
+        """
+        Translates many texts without blocking the event loop. Duplicates are
+        sent once, at most `concurrency` requests run at the same time, and
+        the results come back in input order with an error per failed item.
+        """
+        unique = list(dict.fromkeys(texts))
+        keys = {text: self.cache_key(text, to_lang, from_lang) for text in unique}
+        results = {}
+        if use_cache:
+            cached = await asyncio.to_thread(lambda: {text: self.cache.get(key) for text, key in keys.items()})
+            results = {text: {"result": value} for text, value in cached.items() if value is not None}
+        pending = [text for text in unique if text not in results]
+
+        semaphore = asyncio.Semaphore(max(1, concurrency))
+
+        async def run(text: str):
+            async with semaphore:
+                try:
+                    results[text] = {"result": await self.flight.do_async(
+                        keys[text], lambda: self.request_async(text, to_lang, from_lang)
+                    )}
+                except Exception as e:
+                    results[text] = {"error": str(e) or type(e).__name__}
+
+        await asyncio.gather(*(run(text) for text in pending))
+        fresh = {keys[text]: results[text]["result"] for text in pending if "result" in results[text]}
+        if fresh:
+            await asyncio.to_thread(lambda: [self.cache.put(key, value) for key, value in fresh.items()])
+        return [{"text": text, **results[text]} for text in texts]
+
+    def close(self):
+        with self._lock:
+            http, self._http = self._http, None
+        if http is not None:
+            http.close()
+
+    async def aclose(self):
+        self.close()
+        if self._async_http is not None:
+            await self._async_http.aclose()
+            self._async_http = None
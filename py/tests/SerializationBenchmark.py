@@ -0,0 +1,71 @@
+"""
+Serializes 10k dictionary rows the way list routes did before response
+models (jsonable_encoder + json.dumps) and the way they do now (response
+schema + pydantic-core / orjson), both standalone and through a FastAPI app.
+
+Run from the project root: python -m py.tests.SerializationBenchmark
+"""
+import json
+import tempfile
+import time
+from pathlib import Path
+from typing import List
+
+from fastapi import FastAPI
+from fastapi.datastructures import Default
+from fastapi.encoders import jsonable_encoder
+from fastapi.testclient import TestClient
+from pydantic import TypeAdapter
+from sqlalchemy.orm import Session
+
+from py.domains.ImparaDomainsORM import DictEntry
+from py.domains.ImparaSchemas import DictEntrySchema
+from py.services.databaseServiceORM import ImparaDB
+from py.services.jsonResponse import OrjsonResponse
+
+ROWS = 10_000
+ROUNDS = 10
+
+
+def timed(label, fn, baseline=None):
+    fn()
+    start = time.perf_counter()
+    for _ in range(ROUNDS):
+        size = len(fn())
+    ms = (time.perf_counter() - start) / ROUNDS * 1000
+    speedup = f"  {baseline / ms:.1f}x" if baseline else ""
+    print(f"{label:<42} {ms:8.1f} ms  {size / 1024:7.0f} KiB{speedup}")
+    return ms
+
+
+def main():
+    with tempfile.TemporaryDirectory() as tmp:
+        db = ImparaDB(str(Path(tmp) / "bench.db"))
+        with Session(db.engine) as session:
+            session.add_all([
+                DictEntry(language="it", lemma=f"parola{i}", normalized=f"parola{i}", ipa=None,
+                          created_at="2024-01-01T00:00:00")
+                for i in range(ROWS)
+            ])
+            session.commit()
+        rows = db.list_dict_entries()
+        entries = TypeAdapter(List[DictEntrySchema])
+
+        print(f"{len(rows)} DictEntry rows, mean of {ROUNDS} rounds")
+        before = timed("jsonable_encoder + json.dumps", lambda: json.dumps(jsonable_encoder(rows)).encode())
+        timed("schema + dump_json", lambda: entries.dump_json(entries.validate_python(rows)), before)
+        timed("schema + orjson", lambda: OrjsonResponse(
+            entries.dump_python(entries.validate_python(rows), mode="json")).body, before)
+
+        untyped = FastAPI()
+        untyped.get("/entries")(lambda: rows)
+        typed = FastAPI(default_response_class=Default(OrjsonResponse))
+        typed.get("/entries", response_model=List[DictEntrySchema])(lambda: rows)
+        with TestClient(untyped) as before_client, TestClient(typed) as after_client:
+            before = timed("GET /entries without response_model", lambda: before_client.get("/entries").content)
+            timed("GET /entries with response_model", lambda: after_client.get("/entries").content, before)
+        db.engine.dispose()
+
+
+if __name__ == "__main__":
+    main()
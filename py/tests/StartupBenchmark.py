@@ -0,0 +1,87 @@
+"""
+Measures what a server start costs: importing server.py (and which client
+libraries that pulls in), creating a new database, opening an existing one
+whose schema marker is current, and constructing ImparaServer. Every
+measurement runs in a fresh interpreter, so nothing is imported already.
+
+ImparaServer opens a database in a temporary directory, so data/ in the
+checkout is not touched. Its database is created by the first round, the
+other rounds open it like a real restart does.
+
+Run from the project root: python -m py.tests.StartupBenchmark
+"""
+import json
+import os
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+
+ROUNDS = 5
+PROJECT_ROOT = Path(__file__).resolve().parents[2]
+
+IMPORT_SERVER = """
+import json, sys, time
+start = time.perf_counter()
+import server
+elapsed = time.perf_counter() - start
+print(json.dumps({"ms": elapsed * 1000, "loaded": [m for m in ("openai", "requests", "httpx") if m in sys.modules]}))
+"""
+
+OPEN_DB = """
+import json, sys, time
+from py.services.databaseServiceORM import ImparaDB
+start = time.perf_counter()
+db = ImparaDB(sys.argv[1])
+elapsed = time.perf_counter() - start
+db.close()
+print(json.dumps({"ms": elapsed * 1000}))
+"""
+
+CONSTRUCT_SERVER = """
+import json, sys, time
+from pathlib import Path
+if __name__ == "__main__":
+    import server
+    server.db_path = lambda: str(Path(sys.argv[1]) / "impara.db")
+    start = time.perf_counter()
+    server.ImparaServer()
+    elapsed = time.perf_counter() - start
+    print(json.dumps({"ms": elapsed * 1000}))
+"""
+
+
+def run(code, *args):
+    env = dict(os.environ, PYTHONPATH=str(PROJECT_ROOT))
+    out = subprocess.run([sys.executable, "-c", code, *args], cwd=PROJECT_ROOT, env=env,
+                         capture_output=True, text=True, check=True).stdout
+    # the last line is ours, anything before it is printed by the services
+    return json.loads(out.strip().splitlines()[-1])
+
+
+def report(label, results):
+    times = sorted(r["ms"] for r in results)
+    print(f"{label:<36} median {times[len(times) // 2]:8.1f} ms  min {times[0]:8.1f} ms")
+
+
+def main():
+    print(f"median and min of {ROUNDS} fresh interpreters")
+    imports = [run(IMPORT_SERVER) for _ in range(ROUNDS)]
+    report("import server", imports)
+    print(f"{'':<36} client libraries loaded: {', '.join(imports[-1]['loaded']) or 'none'}")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        cold = [run(OPEN_DB, str(Path(tmp) / f"cold-{i}" / "impara.db")) for i in range(ROUNDS)]
+        report("ImparaDB, new database", cold)
+        warm_db = str(Path(tmp) / "warm" / "impara.db")
+        run(OPEN_DB, warm_db)
+        report("ImparaDB, existing database", [run(OPEN_DB, warm_db) for _ in range(ROUNDS)])
+
+        server_dir = Path(tmp) / "server"
+        server_dir.mkdir()
+        run(CONSTRUCT_SERVER, str(server_dir))
+        report("ImparaServer()", [run(CONSTRUCT_SERVER, str(server_dir)) for _ in range(ROUNDS)])
+
+
+if __name__ == "__main__":
+    main()
@@ -1,19 +1,51 @@
+import asyncio
+import importlib.util
 import json, sys, os
+from contextlib import asynccontextmanager
 from pathlib import Path
-
-from openai import OpenAI
-
-from py.domains.ImparaDomainsORM import User, Language, Languages, Course, Lesson, DictEntry, DictSense, DictTranslation, DictExample, UserSenseState
+from typing import List, Optional
+
+from py.domains.ImparaDomainsORM import User, Language, Languages, Course, Lesson, DictEntry, DictSense, DictTranslation, DictExample, UserSenseState, TokenDictMap
+from py.domains.DictionaryLookupRequest import DictionaryLookupRequest
+from py.domains.ImparaSchemas import (
+    CourseSchema, DictEntrySchema, DictExampleSchema, DictSenseSchema, DictTranslationSchema, JobSchema,
+    LanguageSchema, LanguagesSchema, LessonLexStatsSchema, LessonSchema, LessonTokenOccurrenceSchema,
+    TokenDictMapSchema, UserSchema, UserSenseStateSchema, page_of
+)
+from py.domains.LLMChatRequest import LLMChatRequest
 from py.domains.OpenAIRequest import OpenAIRequest
+from py.domains.TranslateBatchRequest import TranslateBatchRequest
+from py.services.asyncDatabaseService import AsyncImparaDB
+from py.services.databaseQueries import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE
 from py.services.databaseServiceORM import ImparaDB
+from py.services.jobQueue import JobContext, JobFailed, JobQueue, JobWorkerPool
+from py.services.jsonResponse import OrjsonResponse
+from py.services.lessonAnnotator import LessonAnnotator, split_sentences, text_hash
+from py.services.lessonTokenizer import tokenize_text
+from py.services.llmClients import LLMClientManager
+from py.services.llmGateway import (
+    LLMGateway, LLMRequest, OllamaBackend, OpenAIBackend, StubBackend,
+    PRIORITIES, PRIORITY_BACKGROUND, PRIORITY_INTERACTIVE
+)
+from py.services.llmResponseCache import LLMResponseCache
+from py.services.llmStreaming import sse_event, stream_chat_completion, stream_response
+from py.services.singleFlight import SingleFlight
+from py.services.staticAssets import ImmutableStaticFiles, StaticAssets, etag_matches
+from py.services.persistentCache import PersistentCache
+from py.services.textToSpeech import AudioCache, GTTSEngine, Pyttsx3Engine, TextToSpeechService
+from py.services.translationService import TranslationService
 
 import httpx
-from fastapi import Body, FastAPI, HTTPException
+from fastapi import Body, FastAPI, HTTPException, Query, Request
+from fastapi.datastructures import Default
 from fastapi.staticfiles import StaticFiles
-from fastapi.responses import FileResponse
+from fastapi.responses import FileResponse, Response, StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel
-import requests
+
+def db_path() -> str:
+    return os.path.join(os.path.abspath(os.path.dirname(__file__)), 'data', 'impara.db')
+
 
 class ImparaServer:
     def __init__(self):
@@ -23,21 +55,132 @@ class ImparaServer:
             print(f"Warning: Dist folder does not exist at {self.dist_folder}")
             print("Make sure to build the Angular app first using 'ng build'")
             self.dist_folder.mkdir(parents=True, exist_ok=True)
-
-        self.app = FastAPI(title="Angular UI Server", version="1.0.0")
+        self.static_assets = StaticAssets(self.dist_folder, precompress=self.settings.get("staticPrecompress", True))
+
+        # routes with a response_model are validated and serialized to JSON by
+        # pydantic-core; Default() keeps that path enabled on FastAPI versions
+        # that have it, everything else is rendered with orjson
+        self.app = FastAPI(
+            title="Angular UI Server",
+            version="1.0.0",
+            lifespan=self._lifespan,
+            default_response_class=Default(OrjsonResponse)
+        )
         self.app.add_middleware(
             CORSMiddleware,
             allow_origins=["*"],
             allow_credentials=True,
             allow_methods=["*"],
             allow_headers=["*"],
+            # the paging cursor of the list routes
+            expose_headers=["X-Next-After-Id"],
         )
         self.app.mount("/static", StaticFiles(directory=self.dist_folder), name="static")
+        tts_folder = Path(db_path()).parent / "tts"
+        self.tts = TextToSpeechService(
+            [Pyttsx3Engine(), GTTSEngine()],
+            AudioCache(tts_folder, max_bytes=self.settings.get("ttsCacheMaxBytes", 512 * 1024 * 1024)),
+            default_engine=self.settings.get("ttsDefaultEngine", "pyttsx3")
+        )
+        # mounted before the routes so the SPA catch-all does not shadow it
+        self.app.mount("/tts-audio", ImmutableStaticFiles(directory=tts_folder), name="tts-audio")
         self._add_routes()
         self.PROJECT_ROOT = os.path.abspath(os.path.dirname(__file__))
-        self.db = ImparaDB(os.path.join(self.PROJECT_ROOT, 'data/impara.db'))
-
-    def load_settings(self):
+        self.workers = max(1, self.settings.get("workers", 1))
+        cache_mode = self.settings.get("entityCacheMode", "local")
+        if self.workers > 1 and cache_mode == "local":
+            # a "local" cache would keep serving rows the other workers changed
+            if "entityCacheMode" in self.settings:
+                print('Note: entityCacheMode "local" is switched to "versioned" for several workers')
+            cache_mode = "versioned"
+        self.db = ImparaDB(
+            db_path(),
+            cache_mode=cache_mode,
+            cache_items=self.settings.get("entityCacheItems", 4096),
+            sqlite_pragmas=self.settings.get("sqlitePragmas")
+        )
+        self.adb = AsyncImparaDB(db_path(), cache=self.db.cache, sqlite_pragmas=self.settings.get("sqlitePragmas"))
+        self.translation_cache = PersistentCache(
+            self.db.engine,
+            "translation",
+            memory_items=self.settings.get("translationCacheMemoryItems", 4096),
+            max_bytes=self.settings.get("translationCacheMaxBytes", 64 * 1024 * 1024)
+        )
+        self.translator = TranslationService(
+            self.translation_cache,
+            api_url=self.settings.get("translationApiUrl", "http://localhost:8000/translate"),
+            timeout=self.settings.get("translationTimeout", 10.0)
+        )
+        self.llm = LLMClientManager(
+            self.settings.get("OpenAI_API_Key"),
+            base_url=self.settings.get("openAiBaseUrl", "https://api.openai.com/v1"),
+            timeout=self.settings.get("openAiTimeout", 60.0),
+            max_connections=self.settings.get("openAiMaxConnections", 20),
+            max_keepalive_connections=self.settings.get("openAiMaxKeepaliveConnections", 10),
+            models_ttl_seconds=self.settings.get("openAiModelsTtlSeconds", 3600)
+        )
+        self.gateway = LLMGateway(
+            [
+                OpenAIBackend(
+                    lambda: self.llm.http,
+                    max_concurrency=self._per_worker("openAiConcurrency", 8)
+                ),
+                OllamaBackend(
+                    self.settings.get("ollamaBaseUrl", "http://localhost:11434"),
+                    default_model=self.settings.get("ollamaModel", "qwen3-vl:8b"),
+                    max_concurrency=self._per_worker("ollamaConcurrency", 1)
+                ),
+                StubBackend()
+            ],
+            default_backend=self.settings.get("llmDefaultBackend", "openai"),
+            timeout=self.settings.get("llmTimeout", 120.0)
+        )
+        self.llm_flight = SingleFlight()
+        self.annotator = LessonAnnotator(
+            self._complete_json,
+            concurrency=self.settings.get("annotationConcurrency", 4),
+            max_chars=self.settings.get("annotationChunkChars", 1200)
+        )
+        self.openai_cache = LLMResponseCache(PersistentCache(
+            self.db.engine,
+            "openai",
+            memory_items=self.settings.get("openAiCacheMemoryItems", 1024),
+            max_bytes=self.settings.get("openAiCacheMaxBytes", 64 * 1024 * 1024),
+            ttl_seconds=self.settings.get("openAiCacheTtlSeconds", 7 * 24 * 3600)
+        ))
+        self.loop: Optional[asyncio.AbstractEventLoop] = None
+        self.jobs = JobQueue(self.db.engine, retry_delay=self.settings.get("jobRetryDelay", 5.0))
+        self.job_workers = JobWorkerPool(
+            self.jobs,
+            workers=self.settings.get("jobWorkers", 2),
+            processes=self._per_worker("jobProcessWorkers", min(4, os.cpu_count() or 1))
+        )
+        self.job_workers.register("lesson.tokenize", self._job_tokenize_lesson)
+        self.job_workers.register("lesson.translate", self._job_translate_lesson)
+        self.job_workers.register("lesson.annotate", self._job_annotate_lesson)
+        self.job_workers.register("lesson.tts", self._job_tts_lesson)
+
+    def _per_worker(self, key: str, default: int) -> int:
+        """
+        A setting that limits the whole server, split across the uvicorn
+        workers. Each worker keeps at least 1, so a limit below the worker
+        count ends up as one per worker.
+        """
+        return max(1, self.settings.get(key, default) // self.workers)
+
+    @asynccontextmanager
+    async def _lifespan(self, app):
+        self.loop = asyncio.get_running_loop()
+        self.job_workers.start()
+        yield
+        await asyncio.to_thread(self.job_workers.stop)
+        await self.translator.aclose()
+        await self.gateway.aclose()
+        await self.llm.aclose()
+        await self.adb.close()
+
+    @staticmethod
+    def load_settings():
         settings_path = Path(__file__).parent / "settings.json"
         if settings_path.exists():
             with open(settings_path, "r") as f:
@@ -45,19 +188,8 @@ class ImparaServer:
         else:
             return {"port": 7000}
 
-    def translate(self, text, to_lang, from_lang=None, api_url="http://localhost:8000/translate", timeout=10.0):
-        payload = {"text": text, "to": to_lang}
-        if from_lang:
-            payload["from"] = from_lang
-        headers = {"Content-Type": "application/json; charset=utf-8"}
-        response = requests.post(
-            api_url,
-            data=json.dumps(payload, ensure_ascii=False).encode("utf-8"),
-            headers=headers,
-            timeout=timeout,
-        )
-        response.raise_for_status()
-        return response.json()
+    def translate(self, text, to_lang, from_lang=None, use_cache=True):
+        return self.translator.translate(text, to_lang, from_lang, use_cache)
 
     def _extract_output_text(self, data):
         if isinstance(data, dict) and isinstance(data.get("output_text"), str):
@@ -71,121 +203,525 @@ class ImparaServer:
             pass
         return ""
 
+    def _chat_payload(self, req: OpenAIRequest):
+        return {
+            "model": req.model,
+            "messages": [
+                {"role": "system", "content": req.system},
+                {"role": "user", "content": req.prompt}
+            ],
+            "temperature": 0.5
+        }
+
+    def _chat_cache_key(self, req: OpenAIRequest):
+        return self.openai_cache.key("chat.completions", req.model, req.system, req.prompt, temperature=0.5)
+
+    def _responses_payload(self, req: OpenAIRequest):
+        return {
+            "model": req.model,
+            "input": [
+                {
+                    "role": "system",
+                    "content": [
+                        { "type": "input_text", "text": req.system }
+                    ]
+                },
+                {
+                    "role": "user",
+                    "content": [
+                        { "type": "input_text", "text": req.prompt }
+                    ]
+                }
+            ],
+            "text": { "format": { "type": "json_object" } }
+        }
+
+    def _responses_cache_key(self, req: OpenAIRequest):
+        return self.openai_cache.key("responses", req.model, req.system, req.prompt, format="json_object")
+
+    def _require_openai_key(self):
+        api_key = self.settings.get("OpenAI_API_Key")
+        if not api_key or api_key == "your-api-key-here":
+            raise HTTPException(
+                status_code=500,
+                detail="OpenAI_API_Key missing in settings.json"
+            )
+
+    async def _cached_llm_entry(self, req: OpenAIRequest, cache_key: str):
+        if not req.cache:
+            self.openai_cache.bypass()
+            return None
+        return await asyncio.to_thread(self.openai_cache.lookup, cache_key)
+
+    async def _openai_respond_upstream(self, payload: dict, cache_key: str):
+        try:
+            response = await self.llm.http.post("/responses", json=payload)
+            response.raise_for_status()
+            data = response.json()
+        except httpx.HTTPStatusError as e:
+            raise HTTPException(
+                status_code=502,
+                detail=f"OpenAI error: {e.response.text}"
+            )
+        except Exception as e:
+            raise HTTPException(
+                status_code=502,
+                detail=f"OpenAI request failed: {str(e)}"
+            )
+        output_text = self._extract_output_text(data)
+        if not output_text:
+            raise HTTPException(
+                status_code=502,
+                detail="OpenAI response contained no output_text"
+            )
+        result = {
+            "raw": output_text
+        }
+        usage = data.get("usage") or {}
+        await asyncio.to_thread(
+            self.openai_cache.put, cache_key, result,
+            usage.get("input_tokens", 0), usage.get("output_tokens", 0)
+        )
+        return result
+
+    def _annotation_model(self, payload: dict) -> str:
+        # without annotationModel the annotation backend's own default is used,
+        # so an Ollama setup is not sent an OpenAI model name
+        return payload.get("model") or self.settings.get("annotationModel") or \
+            self.gateway.backend(self.settings.get("annotationBackend")).default_model
+
+    async def _complete_json(self, model: str, system: str, prompt: str) -> str:
+        result = await self.gateway.complete(
+            LLMRequest(system=system, prompt=prompt, model=model, json_mode=True, temperature=0),
+            backend=self.settings.get("annotationBackend"),
+            priority=PRIORITY_BACKGROUND
+        )
+        return result.text
+
+    async def _annotate_lesson(self, lesson: Lesson, model: str):
+        plan = self.annotator.plan(lesson.text or "", model)
+        known = await self.adb.get_annotation_chunks([c.chunk_hash for c in plan.chunks])
+        await self.annotator.annotate(plan, known)
+        fresh = [c for c in plan.chunks if not c.reused and c.error is None]
+        await asyncio.to_thread(
+            self.db.save_annotation_chunks, model, [(c.chunk_hash, c.text, c.tokens) for c in fresh]
+        )
+        if plan.failed:
+            raise HTTPException(status_code=502, detail={
+                "message": f"{len(plan.failed)} of {len(plan.chunks)} chunks could not be annotated",
+                "failed_chunks": [{"index": c.index, "error": c.error} for c in plan.failed]
+            })
+        tokens = plan.tokens
+        annotation = await asyncio.to_thread(
+            self.db.save_lesson_annotation, lesson.id, plan.text_hash, model,
+            [c.chunk_hash for c in plan.chunks], len(tokens)
+        )
+        return {
+            "lesson_id": lesson.id,
+            "text_hash": plan.text_hash,
+            "model": model,
+            "annotated_at": annotation.annotated_at,
+            "token_count": len(tokens),
+            "chunks": len(plan.chunks),
+            "reused_chunks": len(plan.chunks) - len(fresh),
+            "annotated_chunks": len(fresh),
+            "tokens": tokens
+        }
+
+    def _lesson_language(self, lesson: Lesson) -> str:
+        course = self.db.get_course(lesson.course_id)
+        if course is None:
+            raise HTTPException(status_code=404, detail=f"Course with id {lesson.course_id} not found")
+        return course.target_language
+
+    def _enqueue_lesson_jobs(self, lesson: Lesson) -> list:
+        """
+        Queues the follow-up work of a new or changed lesson text: the token
+        index, then the steps in settings lessonJobs at lower priority.
+        """
+        jobs = [self.jobs.enqueue(
+            "lesson.tokenize", {"lesson_id": lesson.id}, priority=0,
+            dedupe_key=f"lesson:{lesson.id}:tokenize"
+        )]
+        if lesson.text:
+            max_attempts = self.settings.get("jobMaxAttempts", 3)
+            for step in self.settings.get("lessonJobs", []):
+                jobs.append(self.jobs.enqueue(
+                    f"lesson.{step}", {"lesson_id": lesson.id}, priority=10, max_attempts=max_attempts,
+                    dedupe_key=f"lesson:{lesson.id}:{step}"
+                ))
+        return jobs
+
+    def _on_loop(self, coro):
+        """
+        Runs a coroutine on the server's event loop from a job thread. The
+        async clients and the LLM gateway belong to that loop.
+        """
+        if self.loop is None:
+            coro.close()
+            raise RuntimeError("Server event loop is not running")
+        return asyncio.run_coroutine_threadsafe(coro, self.loop).result()
+
+    def _job_lesson(self, ctx: JobContext):
+        lesson = self.db.get_lesson(ctx.payload["lesson_id"])
+        if lesson is None:
+            return None, None
+        course = self.db.get_course(lesson.course_id)
+        return lesson, course.target_language if course is not None else None
+
+    def _job_tokenize_lesson(self, ctx: JobContext):
+        lesson, _ = self._job_lesson(ctx)
+        if lesson is None:
+            return {"skipped": "lesson not found"}
+        text = lesson.text or ""
+        ctx.progress(0, 2, "tokenizing")
+        # starting a worker process and sending the matches back costs more
+        # than tokenizing a short lesson right here
+        if len(text) < self.settings.get("jobInlineTokenizeChars", 50000):
+            matches = tokenize_text(text, self.db.tokenizer.max_ngram)
+        else:
+            matches = ctx.run_cpu(tokenize_text, text, self.db.tokenizer.max_ngram)
+        ctx.progress(1, 2, "indexing")
+        stats = self.db.reindex_lesson(lesson.id, matches=matches, text=text)
+        if stats is None:
+            return {"skipped": "lesson not found"}
+        return {"words_total": stats.words_total, "words_unique": stats.words_unique,
+                "phrases_total": stats.phrases_total, "phrases_unique": stats.phrases_unique}
+
+    def _job_translate_lesson(self, ctx: JobContext):
+        """
+        Fills the translation cache with the lesson's sentences.
+        """
+        lesson, lang = self._job_lesson(ctx)
+        if lesson is None or lang is None:
+            return {"skipped": "lesson not found"}
+        to_lang = self.settings.get("pretranslateTo", "en")
+        if lang == to_lang:
+            return {"skipped": f"lesson is already in {to_lang}"}
+        sentences = list(dict.fromkeys(split_sentences(lesson.text or "")))
+        batch_size = self.settings.get("translationBatchConcurrency", 8)
+        translated, failed = 0, 0
+        for start in range(0, len(sentences), batch_size):
+            ctx.progress(start, len(sentences), "translating")
+            results = self._on_loop(self.translator.translate_batch(
+                sentences[start:start + batch_size], to_lang, lang, concurrency=batch_size
+            ))
+            failed += sum(1 for r in results if "error" in r)
+            translated += sum(1 for r in results if "result" in r)
+        if sentences and not translated:
+            raise RuntimeError("Translation service did not translate any sentence")
+        return {"sentences": len(sentences), "translated": translated, "failed": failed}
+
+    def _job_annotate_lesson(self, ctx: JobContext):
+        lesson, _ = self._job_lesson(ctx)
+        if lesson is None:
+            return {"skipped": "lesson not found"}
+        model = self._annotation_model(ctx.payload)
+        ctx.progress(0, 1, "annotating")
+        result = self._on_loop(self.llm_flight.do_async(
+            ("annotate", lesson.id, text_hash(lesson.text or ""), model),
+            lambda: self._annotate_lesson(lesson, model)
+        ))
+        return {key: value for key, value in result.items() if key != "tokens"}
+
+    def _job_tts_lesson(self, ctx: JobContext):
+        lesson, lang = self._job_lesson(ctx)
+        if lesson is None or lang is None:
+            return {"skipped": "lesson not found"}
+        try:
+            self.tts.engine(ctx.payload.get("engine"))
+        except (ValueError, RuntimeError) as e:
+            # an unknown or uninstalled engine is still missing on the next attempt
+            raise JobFailed(str(e))
+        return self.tts.prerender(
+            lesson.text or "", lang, ctx.payload.get("engine"),
+            progress=lambda done, total: ctx.progress(done, total, "rendering audio")
+        )
+
+    def _event_stream(self, events):
+        return StreamingResponse(
+            events,
+            media_type="text/event-stream",
+            headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+        )
+
+    def _not_modified(self, request: Request, response: Response, *tables: str) -> Optional[Response]:
+        """
+        ETag of a read route from the versions of the tables it reads. Returns
+        a 304 response if the client already has it; otherwise the ETag is set
+        on the response. It is taken before the read, so a concurrent write
+        can only make the client fetch once more.
+        """
+        headers = {"etag": self.db.versions.etag(*tables), "cache-control": "no-cache"}
+        if etag_matches(request.headers.get("if-none-match", ""), headers["etag"]):
+            return Response(status_code=304, headers=headers)
+        response.headers.update(headers)
+        return None
+
+    def _page(self, response: Response, rows: list, limit: int):
+        """
+        A full page may have more rows after it, so the id to continue from
+        is sent as X-Next-After-Id. Projected rows (dicts) are sent as they
+        are, because the route's schema would add the columns left out.
+        """
+        projected = bool(rows) and isinstance(rows[0], dict)
+        if len(rows) == limit:
+            last = rows[-1]
+            response.headers["x-next-after-id"] = str(last["id"] if projected else last.id)
+        if projected:
+            return OrjsonResponse(rows, headers=dict(response.headers))
+        return rows
+
+    def _parse_fields(self, fields: Optional[str]):
+        if not fields:
+            return None
+        return [f.strip() for f in fields.split(",") if f.strip()]
+
     def _add_routes(self):
         @self.app.get('/openAiModels')
         def openAiModels():
             openAiKey = self.settings.get("OpenAI_API_Key")
             if openAiKey is None:
                 return {'error': 'No OpenAI key found'}
-            client = OpenAI(api_key=openAiKey)
             try:
-                models = client.models.list()
-                model_names = [model.id for model in models.data]
-                return model_names
+                return self.llm.list_models()
             except Exception as e:
                 return {"error": str(e)}
 
         @self.app.post('/openAi')
-        def openAiInterpretation(request: OpenAIRequest):
+        async def openAiInterpretation(request: OpenAIRequest):
             openAiKey = self.settings.get("OpenAI_API_Key")
             if openAiKey is None:
                 return {'error': 'No OpenAI key found'}
-            client = OpenAI(api_key=openAiKey)
-            try:
-                response = client.chat.completions.create(
-                    model=request.model,
-                    messages=[
-                        {"role": "system", "content": request.system},
-                        {"role": "user", "content": request.prompt}
-                    ],
-                    temperature=0.5
+            cache_key = self._chat_cache_key(request)
+            if request.cache:
+                cached = await asyncio.to_thread(self.openai_cache.get, cache_key)
+                if cached is not None:
+                    return cached
+            else:
+                self.openai_cache.bypass()
+
+            async def fetch():
+                response = await self.gateway.complete(
+                    LLMRequest(system=request.system, prompt=request.prompt, model=request.model, temperature=0.5),
+                    backend="openai",
+                    priority=PRIORITY_INTERACTIVE
                 )
                 detailed_output = {
                     "id": response.id,
                     "model": response.model,
-                    "usage": {
-                        "prompt_tokens": response.usage.prompt_tokens,
-                        "completion_tokens": response.usage.completion_tokens,
-                        "total_tokens": response.usage.total_tokens
-                    },
-                    "message": response.choices[0].message.content
+                    "usage": response.usage,
+                    "message": response.text
                 }
+                await asyncio.to_thread(
+                    self.openai_cache.put, cache_key, detailed_output,
+                    response.usage["prompt_tokens"], response.usage["completion_tokens"]
+                )
                 return detailed_output
+
+            try:
+                return await self.llm_flight.do_async(cache_key, fetch)
             except Exception as e:
                 return {"error": str(e)}
 
         @self.app.post("/api/openai/respond")
         async def openai_respond(req: OpenAIRequest):
-            api_key = self.settings.get("OpenAI_API_Key")
-            if not api_key or api_key == "your-api-key-here":
-                raise HTTPException(
-                    status_code=500,
-                    detail="OpenAI_API_Key missing in settings.json"
+            self._require_openai_key()
+            payload = self._responses_payload(req)
+            cache_key = self._responses_cache_key(req)
+            if req.cache:
+                cached = await asyncio.to_thread(self.openai_cache.get, cache_key)
+                if cached is not None:
+                    return cached
+            else:
+                self.openai_cache.bypass()
+            return await self.llm_flight.do_async(cache_key, lambda: self.gateway.run(
+                "openai", lambda: self._openai_respond_upstream(payload, cache_key), priority=PRIORITY_INTERACTIVE
+            ))
+
+        @self.app.post('/openAi/stream')
+        async def openAiInterpretationStream(request: OpenAIRequest):
+            self._require_openai_key()
+            cache_key = self._chat_cache_key(request)
+            cached = await self._cached_llm_entry(request, cache_key)
+
+            async def events():
+                if cached is not None:
+                    yield sse_event("delta", {"text": cached["response"]["message"]})
+                    yield sse_event("done", {**cached["response"], "cached": True})
+                    return
+                parts = []
+                try:
+                    # the slot is held until the stream ends, so streams count
+                    # against openAiConcurrency like every other OpenAI call
+                    async with self.gateway.slot("openai", PRIORITY_INTERACTIVE):
+                        async for kind, value in stream_chat_completion(self.llm.http, self._chat_payload(request)):
+                            if kind == "delta":
+                                parts.append(value)
+                                yield sse_event("delta", {"text": value})
+                            else:
+                                completed = value
+                except httpx.HTTPStatusError as e:
+                    yield sse_event("error", {"error": f"OpenAI error: {e.response.text}"})
+                    return
+                except Exception as e:
+                    yield sse_event("error", {"error": str(e)})
+                    return
+                usage = completed["usage"] or {}
+                detailed_output = {
+                    "id": completed["id"],
+                    "model": completed["model"],
+                    "usage": {
+                        "prompt_tokens": usage.get("prompt_tokens"),
+                        "completion_tokens": usage.get("completion_tokens"),
+                        "total_tokens": usage.get("total_tokens")
+                    },
+                    "message": "".join(parts)
+                }
+                await asyncio.to_thread(
+                    self.openai_cache.put, cache_key, detailed_output,
+                    usage.get("prompt_tokens", 0), usage.get("completion_tokens", 0)
                 )
-            payload = {
-                "model": req.model,
-                "input": [
-                    {
-                        "role": "system",
-                        "content": [
-                            { "type": "input_text", "text": req.system }
-                        ]
+                yield sse_event("done", {**detailed_output, "cached": False})
+
+            return self._event_stream(events())
+
+        @self.app.post("/api/openai/respond/stream")
+        async def openai_respond_stream(req: OpenAIRequest):
+            self._require_openai_key()
+            cache_key = self._responses_cache_key(req)
+            cached = await self._cached_llm_entry(req, cache_key)
+
+            async def events():
+                if cached is not None:
+                    yield sse_event("delta", {"text": cached["response"]["raw"]})
+                    usage = cached["usage"]
+                    yield sse_event("done", {
+                        **cached["response"],
+                        "usage": {**usage, "total_tokens": usage["prompt_tokens"] + usage["completion_tokens"]},
+                        "cached": True
+                    })
+                    return
+                parts = []
+                try:
+                    # the slot is held until the stream ends, so streams count
+                    # against openAiConcurrency like every other OpenAI call
+                    async with self.gateway.slot("openai", PRIORITY_INTERACTIVE):
+                        async for kind, value in stream_response(self.llm.http, self._responses_payload(req)):
+                            if kind == "delta":
+                                parts.append(value)
+                                yield sse_event("delta", {"text": value})
+                            else:
+                                completed = value
+                except httpx.HTTPStatusError as e:
+                    yield sse_event("error", {"error": f"OpenAI error: {e.response.text}"})
+                    return
+                except Exception as e:
+                    yield sse_event("error", {"error": f"OpenAI request failed: {str(e)}"})
+                    return
+                output_text = "".join(parts) or self._extract_output_text(completed)
+                if not output_text:
+                    yield sse_event("error", {"error": "OpenAI response contained no output_text"})
+                    return
+                usage = completed.get("usage") or {}
+                result = {
+                    "raw": output_text
+                }
+                await asyncio.to_thread(
+                    self.openai_cache.put, cache_key, result,
+                    usage.get("input_tokens", 0), usage.get("output_tokens", 0)
+                )
+                yield sse_event("done", {
+                    **result,
+                    "usage": {
+                        "prompt_tokens": usage.get("input_tokens"),
+                        "completion_tokens": usage.get("output_tokens"),
+                        "total_tokens": usage.get("total_tokens")
                     },
-                    {
-                        "role": "user",
-                        "content": [
-                            { "type": "input_text", "text": req.prompt }
-                        ]
-                    }
-                ],
-                "text": { "format": { "type": "json_object" } }
-            }
-            headers = {
-                "Authorization": f"Bearer {api_key}",
-                "Content-Type": "application/json"
+                    "cached": False
+                })
+
+            return self._event_stream(events())
+
+        @self.app.get("/api/coalescing/stats")
+        def coalescing_stats():
+            return {
+                "openai": self.llm_flight.stats(),
+                "translation": self.translator.flight.stats(),
             }
+
+        @self.app.post("/api/llm/chat")
+        async def llm_chat(req: LLMChatRequest):
+            if req.priority not in PRIORITIES:
+                raise HTTPException(status_code=400, detail=f"Unknown priority: {req.priority}")
             try:
-                async with httpx.AsyncClient(timeout=60) as client:
-                    response = await client.post(
-                        "https://api.openai.com/v1/responses",
-                        headers=headers,
-                        json=payload
-                    )
-                    response.raise_for_status()
-                    data = response.json()
-            except httpx.HTTPStatusError as e:
-                raise HTTPException(
-                    status_code=502,
-                    detail=f"OpenAI error: {e.response.text}"
+                result = await self.gateway.complete(
+                    LLMRequest(
+                        system=req.system, prompt=req.prompt, model=req.model,
+                        json_mode=req.json_mode, temperature=req.temperature
+                    ),
+                    backend=req.backend,
+                    priority=PRIORITIES[req.priority]
                 )
+                return result.to_dict()
+            except ValueError as e:
+                raise HTTPException(status_code=400, detail=str(e))
+            except TimeoutError as e:
+                raise HTTPException(status_code=504, detail=str(e))
+            except httpx.HTTPStatusError as e:
+                raise HTTPException(status_code=502, detail=f"LLM backend error: {e.response.text}")
             except Exception as e:
-                raise HTTPException(
-                    status_code=502,
-                    detail=f"OpenAI request failed: {str(e)}"
-                )
-            output_text = self._extract_output_text(data)
-            if not output_text:
-                raise HTTPException(
-                    status_code=502,
-                    detail="OpenAI response contained no output_text"
-                )
-            return {
-                "raw": output_text
-            }
+                raise HTTPException(status_code=502, detail=f"LLM request failed: {str(e)}")
+
+        @self.app.get("/api/llm/stats")
+        async def llm_stats():
+            return self.gateway.stats()
+
+        @self.app.get("/api/openai/cache/stats")
+        def openai_cache_stats():
+            return self.openai_cache.stats()
+
+        @self.app.delete("/api/openai/cache")
+        def clear_openai_cache():
+            self.openai_cache.clear()
+            return {"message": "OpenAI response cache cleared"}
 
         @self.app.post("/api/translate")
         def translate_endpoint(request: dict):
             text = request.get("text")
             to_lang = request.get("to")
             from_lang = request.get("from", None)
+            use_cache = request.get("cache", True)
             if not text or not to_lang:
                 raise HTTPException(status_code=400, detail="Missing 'text' or 'to' parameter")
             try:
-                result = self.translate(text, to_lang=to_lang, from_lang=from_lang)
+                result = self.translate(text, to_lang=to_lang, from_lang=from_lang, use_cache=use_cache)
                 return result
             except Exception as e:
                 raise HTTPException(status_code=500, detail=str(e))
 
+        @self.app.post("/api/translate/batch")
+        async def translate_batch_endpoint(req: TranslateBatchRequest):
+            max_concurrency = self.settings.get("translationBatchConcurrency", 8)
+            concurrency = min(req.concurrency or max_concurrency, max_concurrency)
+            results = await self.translator.translate_batch(
+                req.texts, req.to, req.from_lang, concurrency=concurrency, use_cache=req.cache
+            )
+            return {
+                "results": results,
+                "unique": len(set(req.texts)),
+                "failed": sum(1 for r in results if "error" in r),
+            }
+
+        @self.app.get("/api/translate/cache/stats")
+        def translation_cache_stats():
+            return self.translation_cache.stats()
+
+        @self.app.delete("/api/translate/cache")
+        def clear_translation_cache():
+            self.translation_cache.clear()
+            return {"message": "Translation cache cleared"}
+
         @self.app.post("/api/user")
         def create_user(payload: dict = Body(...)):
             try:
@@ -205,7 +741,7 @@ class ImparaServer:
             except Exception as e:
                 raise HTTPException(status_code=500, detail=str(e))
 
-        @self.app.get("/api/user")
+        @self.app.get("/api/user", response_model=List[UserSchema])
         def list_users():
             try:
                 return self.db.list_users()
@@ -222,31 +758,46 @@ class ImparaServer:
 
         # ==================== COURSE ENDPOINTS ====================
 
-        @self.app.get("/api/courses")
-        def list_courses():
+        @self.app.get("/api/courses", response_model=page_of(CourseSchema))
+        async def list_courses(request: Request, response: Response, after_id: Optional[int] = None,
+                               limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE), fields: Optional[str] = None):
+            not_modified = self._not_modified(request, response, "course")
+            if not_modified:
+                return not_modified
             try:
-                return self.db.list_courses()
+                return self._page(response, await self.adb.list_courses(after_id, limit, self._parse_fields(fields)), limit)
+            except ValueError as e:
+                raise HTTPException(status_code=400, detail=str(e))
             except Exception as e:
                 raise HTTPException(status_code=500, detail=str(e))
 
-        @self.app.get("/api/courses/user/{user_id}")
-        def list_courses_by_user(user_id: int):
+        @self.app.get("/api/courses/user/{user_id}", response_model=List[CourseSchema])
+        async def list_courses_by_user(request: Request, response: Response, user_id: int):
+            not_modified = self._not_modified(request, response, "course")
+            if not_modified:
+                return not_modified
             try:
-                return self.db.list_courses_by_user(user_id)
+                return await self.adb.list_courses_by_user(user_id)
             except Exception as e:
                 raise HTTPException(status_code=500, detail=str(e))
 
-        @self.app.get("/api/courses/target-language/{target_language}")
-        def list_courses_by_target_language(target_language: str):
+        @self.app.get("/api/courses/target-language/{target_language}", response_model=List[CourseSchema])
+        async def list_courses_by_target_language(request: Request, response: Response, target_language: str):
+            not_modified = self._not_modified(request, response, "course")
+            if not_modified:
+                return not_modified
             try:
-                return self.db.list_courses_by_target_language(target_language)
+                return await self.adb.list_courses_by_target_language(target_language)
             except Exception as e:
                 raise HTTPException(status_code=500, detail=str(e))
 
-        @self.app.get("/api/course/{course_id}")
-        def get_course(course_id: int):
+        @self.app.get("/api/course/{course_id}", response_model=CourseSchema)
+        async def get_course(request: Request, response: Response, course_id: int):
+            not_modified = self._not_modified(request, response, "course")
+            if not_modified:
+                return not_modified
             try:
-                course = self.db.get_course(course_id)
+                course = await self.adb.get_course(course_id)
                 if course is None:
                     raise HTTPException(status_code=404, detail=f"Course with id {course_id} not found")
                 return course
@@ -255,7 +806,7 @@ class ImparaServer:
             except Exception as e:
                 raise HTTPException(status_code=500, detail=str(e))
 
-        @self.app.post("/api/course")
+        @self.app.post("/api/course", response_model=CourseSchema)
         def create_course(payload: dict = Body(...)):
             try:
                 course = Course(**payload)
@@ -263,7 +814,7 @@ class ImparaServer:
             except Exception as e:
                 raise HTTPException(status_code=500, detail=str(e))
 
-        @self.app.put("/api/course/{course_id}")
+        @self.app.put("/api/course/{course_id}", response_model=CourseSchema)
         def update_course(course_id: int, payload: dict = Body(...)):
             try:
                 course = self.db.update_course(course_id, **payload)
@@ -283,14 +834,17 @@ class ImparaServer:
             except Exception as e:
                 raise HTTPException(status_code=500, detail=str(e))
 
-        @self.app.get("/api/languages")
-        def list_languages():
+        @self.app.get("/api/languages", response_model=List[LanguagesSchema])
+        async def list_languages(request: Request, response: Response):
+            not_modified = self._not_modified(request, response, "languages")
+            if not_modified:
+                return not_modified
             try:
-                return self.db.list_languages()
+                return await self.adb.list_languages()
             except Exception as e:
                 raise HTTPException(status_code=500, detail=str(e))
 
-        @self.app.post("/api/language")
+        @self.app.post("/api/language", response_model=List[LanguageSchema])
         def create_user_language(payload: dict = Body(...)):
             try:
                 language = Language(**payload)
@@ -299,47 +853,59 @@ class ImparaServer:
             except Exception as e:
                 raise HTTPException(status_code=500, detail=str(e))
 
-        @self.app.get("/api/language/{user_id}")
-        def list_user_languages(user_id: int):
+        @self.app.get("/api/language/{user_id}", response_model=List[LanguageSchema])
+        async def list_user_languages(request: Request, response: Response, user_id: int):
+            not_modified = self._not_modified(request, response, "language")
+            if not_modified:
+                return not_modified
             try:
-                return self.db.list_user_languages(user_id)
+                return await self.adb.list_user_languages(user_id)
             except Exception as e:
                 raise HTTPException(status_code=500, detail=str(e))
 
         # ==================== LESSON ENDPOINTS ====================
 
-        @self.app.get("/api/lessons")
-        def list_lessons():
+        @self.app.get("/api/lessons", response_model=page_of(LessonSchema))
+        async def list_lessons(response: Response, after_id: Optional[int] = None,
+                               limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE), fields: Optional[str] = None):
             try:
-                return self.db.list_lessons()
+                return self._page(response, await self.adb.list_lessons(after_id, limit, self._parse_fields(fields)), limit)
+            except ValueError as e:
+                raise HTTPException(status_code=400, detail=str(e))
             except Exception as e:
                 raise HTTPException(status_code=500, detail=str(e))
 
-        @self.app.get("/api/lessons/user/{user_id}")
-        def list_lessons_by_user(user_id: int):
+        @self.app.get("/api/lessons/user/{user_id}", response_model=List[LessonSchema])
+        async def list_lessons_by_user(user_id: int):
             try:
-                return self.db.list_lessons_by_user(user_id)
+                return await self.adb.list_lessons_by_user(user_id)
             except Exception as e:
                 raise HTTPException(status_code=500, detail=str(e))
 
-        @self.app.get("/api/lessons/course/{course_id}")
-        def list_lessons_by_course(course_id: int):
+        @self.app.get("/api/lessons/course/{course_id}", response_model=List[LessonSchema])
+        async def list_lessons_by_course(request: Request, response: Response, course_id: int):
+            not_modified = self._not_modified(request, response, "lesson", "course")
+            if not_modified:
+                return not_modified
             try:
-                return self.db.list_lessons_by_course(course_id)
+                return await self.adb.list_lessons_by_course(course_id)
             except Exception as e:
                 raise HTTPException(status_code=500, detail=str(e))
 
-        @self.app.get("/api/lessons/top-level/course/{course_id}")
-        def list_top_level_lessons(course_id: int):
+        @self.app.get("/api/lessons/top-level/course/{course_id}", response_model=List[LessonSchema])
+        async def list_top_level_lessons(request: Request, response: Response, course_id: int):
+            not_modified = self._not_modified(request, response, "lesson", "course")
+            if not_modified:
+                return not_modified
             try:
-                return self.db.list_top_level_lessons(course_id)
+                return await self.adb.list_top_level_lessons(course_id)
             except Exception as e:
                 raise HTTPException(status_code=500, detail=str(e))
 
-        @self.app.get("/api/lesson/{lesson_id}")
-        def get_lesson(lesson_id: int):
+        @self.app.get("/api/lesson/{lesson_id}", response_model=LessonSchema)
+        async def get_lesson(lesson_id: int):
             try:
-                lesson = self.db.get_lesson(lesson_id)
+                lesson = await self.adb.get_lesson(lesson_id)
                 if lesson is None:
                     raise HTTPException(status_code=404, detail=f"Lesson with id {lesson_id} not found")
                 return lesson
@@ -348,20 +914,25 @@ class ImparaServer:
             except Exception as e:
                 raise HTTPException(status_code=500, detail=str(e))
 
-        @self.app.post("/api/lesson")
+        @self.app.post("/api/lesson", response_model=LessonSchema)
         def create_lesson(payload: dict = Body(...)):
             try:
                 lesson = Lesson(**payload)
-                return self.db.insert_lesson(lesson)
+                lesson = self.db.insert_lesson(lesson, index=False)
+                self._enqueue_lesson_jobs(lesson)
+                return lesson
             except Exception as e:
                 raise HTTPException(status_code=500, detail=str(e))
 
-        @self.app.put("/api/lesson/{lesson_id}")
+        @self.app.put("/api/lesson/{lesson_id}", response_model=LessonSchema)
         def update_lesson(lesson_id: int, payload: dict = Body(...)):
             try:
-                lesson = self.db.update_lesson(lesson_id, **payload)
+                previous = self.db.get_lesson(lesson_id)
+                lesson = self.db.update_lesson(lesson_id, index=False, **payload)
                 if lesson is None:
                     raise HTTPException(status_code=404, detail=f"Lesson with id {lesson_id} not found")
+                if previous.text != lesson.text:
+                    self._enqueue_lesson_jobs(lesson)
                 return lesson
             except HTTPException:
                 raise
@@ -376,26 +947,300 @@ class ImparaServer:
             except Exception as e:
                 raise HTTPException(status_code=500, detail=str(e))
 
+        # ==================== TEXT TO SPEECH ENDPOINTS ====================
+
+        @self.app.get("/api/tts")
+        def text_to_speech(text: str, lang: str, engine: Optional[str] = None):
+            if not text.strip():
+                raise HTTPException(status_code=400, detail="text must not be empty")
+            try:
+                path, tts = self.tts.synthesize(text, lang, engine)
+            except ValueError as e:
+                raise HTTPException(status_code=400, detail=str(e))
+            except RuntimeError as e:
+                raise HTTPException(status_code=503, detail=str(e))
+            except Exception as e:
+                raise HTTPException(status_code=502, detail=f"TTS failed: {e}")
+            return FileResponse(
+                path,
+                media_type=tts.media_type,
+                headers={
+                    "Cache-Control": "public, max-age=31536000, immutable",
+                    "ETag": f'"{path.stem}"',
+                    "Content-Location": f"/tts-audio/{path.name}"
+                }
+            )
+
+        @self.app.get("/api/tts/stats")
+        def tts_stats():
+            return self.tts.stats()
+
+        @self.app.get("/api/lesson/{lesson_id}/tts")
+        def get_lesson_tts(lesson_id: int, engine: Optional[str] = None):
+            lesson = self.db.get_lesson(lesson_id)
+            if lesson is None:
+                raise HTTPException(status_code=404, detail=f"Lesson with id {lesson_id} not found")
+            lang = self._lesson_language(lesson)
+            try:
+                tts = self.tts.engine(engine)
+            except ValueError as e:
+                raise HTTPException(status_code=400, detail=str(e))
+            except RuntimeError as e:
+                raise HTTPException(status_code=503, detail=str(e))
+            sentences = []
+            for sentence in split_sentences(lesson.text or ""):
+                name = self.tts.audio_name(sentence, lang, tts.name)
+                sentences.append({
+                    "text": sentence,
+                    "url": f"/tts-audio/{name}",
+                    "cached": (self.tts.cache.directory / name).exists()
+                })
+            return {"lesson_id": lesson_id, "lang": lang, "engine": tts.name, "sentences": sentences}
+
+        @self.app.post("/api/lesson/{lesson_id}/tts/prerender")
+        def prerender_lesson_tts(lesson_id: int, payload: dict = Body(default={})):
+            lesson = self.db.get_lesson(lesson_id)
+            if lesson is None:
+                raise HTTPException(status_code=404, detail=f"Lesson with id {lesson_id} not found")
+            lang = self._lesson_language(lesson)
+            try:
+                counts = self.tts.prerender(lesson.text or "", lang, payload.get("engine"))
+            except ValueError as e:
+                raise HTTPException(status_code=400, detail=str(e))
+            except RuntimeError as e:
+                raise HTTPException(status_code=503, detail=str(e))
+            return {"lesson_id": lesson_id, "lang": lang, **counts}
+
+        # ==================== JOB ENDPOINTS ====================
+
+        @self.app.get("/api/jobs", response_model=List[JobSchema])
+        def list_jobs(status: Optional[str] = None, kind: Optional[str] = None, key: Optional[str] = None,
+                      limit: int = Query(100, ge=1, le=MAX_PAGE_SIZE), offset: int = Query(0, ge=0)):
+            return self.jobs.list(status, kind, key, limit, offset)
+
+        @self.app.post("/api/jobs", response_model=JobSchema)
+        def create_job(payload: dict = Body(...)):
+            kind = payload.get("kind")
+            if kind not in self.job_workers.handlers:
+                raise HTTPException(status_code=400, detail=f"Unknown job kind: {kind}")
+            return self.jobs.enqueue(
+                kind,
+                payload.get("payload") or {},
+                priority=payload.get("priority", 0),
+                max_attempts=payload.get("max_attempts", self.settings.get("jobMaxAttempts", 3)),
+                dedupe_key=payload.get("dedupe_key")
+            )
+
+        @self.app.get("/api/jobs/stats")
+        def job_stats():
+            return {**self.jobs.stats(), "pool": self.job_workers.stats()}
+
+        @self.app.delete("/api/jobs")
+        def purge_jobs(older_than_seconds: float = 7 * 24 * 3600):
+            return {"deleted": self.jobs.purge(older_than_seconds)}
+
+        @self.app.get("/api/jobs/{job_id}", response_model=JobSchema)
+        def get_job(job_id: int):
+            job = self.jobs.get(job_id)
+            if job is None:
+                raise HTTPException(status_code=404, detail=f"Job with id {job_id} not found")
+            return job
+
+        @self.app.post("/api/jobs/{job_id}/cancel", response_model=JobSchema)
+        def cancel_job(job_id: int):
+            job = self.jobs.cancel(job_id)
+            if job is None:
+                raise HTTPException(status_code=404, detail=f"Job with id {job_id} not found")
+            return job
+
+        @self.app.post("/api/jobs/{job_id}/retry", response_model=JobSchema)
+        def retry_job(job_id: int):
+            job = self.jobs.retry(job_id)
+            if job is None:
+                raise HTTPException(status_code=404, detail=f"Job with id {job_id} not found")
+            return job
+
+        # ==================== LESSON TOKEN INDEX ENDPOINTS ====================
+
+        @self.app.get("/api/lesson/{lesson_id}/tokens")
+        async def list_lesson_tokens(lesson_id: int, token_type: Optional[str] = None):
+            try:
+                return await self.adb.list_lesson_tokens(lesson_id, token_type)
+            except Exception as e:
+                raise HTTPException(status_code=500, detail=str(e))
+
+        @self.app.get("/api/lesson/{lesson_id}/occurrences", response_model=List[LessonTokenOccurrenceSchema])
+        async def list_lesson_token_occurrences(lesson_id: int):
+            try:
+                return await self.adb.list_lesson_token_occurrences(lesson_id)
+            except Exception as e:
+                raise HTTPException(status_code=500, detail=str(e))
+
+        @self.app.get("/api/lesson/{lesson_id}/lex-stats", response_model=LessonLexStatsSchema)
+        async def get_lesson_lex_stats(lesson_id: int):
+            try:
+                stats = await self.adb.get_lesson_lex_stats(lesson_id)
+                if stats is None:
+                    raise HTTPException(status_code=404, detail=f"No token index for lesson with id {lesson_id}")
+                return stats
+            except HTTPException:
+                raise
+            except Exception as e:
+                raise HTTPException(status_code=500, detail=str(e))
+
+        @self.app.get("/api/lesson/{lesson_id}/annotation")
+        async def get_lesson_annotation(lesson_id: int):
+            lesson = await self.adb.get_lesson(lesson_id)
+            if lesson is None:
+                raise HTTPException(status_code=404, detail=f"Lesson with id {lesson_id} not found")
+            annotation = await self.adb.get_lesson_annotation(lesson_id)
+            if annotation is None or annotation["text_hash"] != text_hash(lesson.text or ""):
+                raise HTTPException(status_code=404, detail=f"Lesson with id {lesson_id} is not annotated for its current text")
+            return annotation
+
+        @self.app.post("/api/lesson/{lesson_id}/annotate")
+        async def annotate_lesson(lesson_id: int, payload: dict = Body(default={})):
+            if self.gateway.backend(self.settings.get("annotationBackend")).name == "openai":
+                self._require_openai_key()
+            lesson = await self.adb.get_lesson(lesson_id)
+            if lesson is None:
+                raise HTTPException(status_code=404, detail=f"Lesson with id {lesson_id} not found")
+            model = self._annotation_model(payload)
+            return await self.llm_flight.do_async(
+                ("annotate", lesson_id, text_hash(lesson.text or ""), model),
+                lambda: self._annotate_lesson(lesson, model)
+            )
+
+        @self.app.post("/api/lesson/{lesson_id}/reindex")
+        def reindex_lesson(lesson_id: int):
+            try:
+                stats = self.db.reindex_lesson(lesson_id)
+                if stats is None:
+                    raise HTTPException(status_code=404, detail=f"Lesson with id {lesson_id} not found")
+                return stats
+            except HTTPException:
+                raise
+            except Exception as e:
+                raise HTTPException(status_code=500, detail=str(e))
+
+        @self.app.post("/api/lessons/reindex")
+        def reindex_lessons(course_id: Optional[int] = None):
+            try:
+                count = self.db.reindex_lessons(course_id)
+                return {"message": f"Reindexed {count} lessons"}
+            except Exception as e:
+                raise HTTPException(status_code=500, detail=str(e))
+
+        # ==================== FREQUENCY ENDPOINTS ====================
+
+        @self.app.get("/api/frequency/course/{course_id}")
+        def list_course_token_frequencies(course_id: int, token_type: Optional[str] = None,
+                                          limit: int = Query(200, ge=1, le=MAX_PAGE_SIZE), offset: int = Query(0, ge=0)):
+            try:
+                return self.db.list_course_token_frequencies(course_id, token_type, limit, offset)
+            except Exception as e:
+                raise HTTPException(status_code=500, detail=str(e))
+
+        @self.app.get("/api/frequency/{language}")
+        def list_token_frequencies(language: str, token_type: Optional[str] = None,
+                                   limit: int = Query(200, ge=1, le=MAX_PAGE_SIZE), offset: int = Query(0, ge=0)):
+            try:
+                return self.db.list_token_frequencies(language, token_type, limit, offset)
+            except Exception as e:
+                raise HTTPException(status_code=500, detail=str(e))
+
+        @self.app.post("/api/frequency/rebuild")
+        def rebuild_token_frequencies():
+            try:
+                self.db.rebuild_token_frequencies()
+                return {"message": "Frequency tables rebuilt"}
+            except Exception as e:
+                raise HTTPException(status_code=500, detail=str(e))
+
+        # ==================== SEARCH ENDPOINTS ====================
+
+        @self.app.get("/api/search")
+        def search(q: str, scope: Optional[str] = None, language: Optional[str] = None, prefix: bool = True,
+                   limit: int = 20, offset: int = 0):
+            try:
+                return {
+                    "query": q,
+                    "results": self.db.search(q, self._parse_fields(scope), language, prefix, limit, offset)
+                }
+            except ValueError as e:
+                raise HTTPException(status_code=400, detail=str(e))
+            except Exception as e:
+                raise HTTPException(status_code=500, detail=str(e))
+
+        @self.app.post("/api/search/rebuild")
+        def rebuild_search_index():
+            try:
+                self.db.rebuild_search_index()
+                return {"message": "Search index rebuilt"}
+            except Exception as e:
+                raise HTTPException(status_code=500, detail=str(e))
+
+        # ==================== DICTIONARY ENDPOINTS ====================
+
+        @self.app.post("/api/dictionary/lookup")
+        async def lookup_dictionary(req: DictionaryLookupRequest):
+            if not req.tokens and not req.text:
+                raise HTTPException(status_code=400, detail="Missing 'tokens' or 'text' parameter")
+            try:
+                return await self.adb.lookup_dictionary(req.language, req.tokens, req.text, req.user_id, req.target_language)
+            except Exception as e:
+                raise HTTPException(status_code=500, detail=str(e))
+
+        @self.app.get("/api/dictionary/{language}/{lemma}")
+        async def get_dictionary_entry(language: str, lemma: str, target_language: Optional[str] = None):
+            try:
+                entry = await self.adb.get_dictionary_entry(language, lemma, target_language)
+                if entry is None:
+                    raise HTTPException(status_code=404, detail=f"DictEntry not found")
+                return entry
+            except HTTPException:
+                raise
+            except Exception as e:
+                raise HTTPException(status_code=500, detail=str(e))
+
         # ==================== DICT_ENTRY ENDPOINTS ====================
 
-        @self.app.get("/api/dict-entries")
-        def list_dict_entries():
+        @self.app.get("/api/dict-entries", response_model=page_of(DictEntrySchema))
+        async def list_dict_entries(request: Request, response: Response, after_id: Optional[int] = None,
+                                    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE), fields: Optional[str] = None):
+            not_modified = self._not_modified(request, response, "dict_entry")
+            if not_modified:
+                return not_modified
             try:
-                return self.db.list_dict_entries()
+                return self._page(response, await self.adb.list_dict_entries(after_id, limit, self._parse_fields(fields)), limit)
+            except ValueError as e:
+                raise HTTPException(status_code=400, detail=str(e))
             except Exception as e:
                 raise HTTPException(status_code=500, detail=str(e))
 
-        @self.app.get("/api/dict-entries/language/{language}")
-        def list_dict_entries_by_language(language: str):
+        @self.app.get("/api/dict-entries/language/{language}", response_model=page_of(DictEntrySchema))
+        async def list_dict_entries_by_language(request: Request, response: Response, language: str,
+                                                after_id: Optional[int] = None,
+                                                limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+                                                fields: Optional[str] = None):
+            not_modified = self._not_modified(request, response, "dict_entry")
+            if not_modified:
+                return not_modified
             try:
-                return self.db.list_dict_entries_by_language(language)
+                rows = await self.adb.list_dict_entries_by_language(language, after_id, limit, self._parse_fields(fields))
+                return self._page(response, rows, limit)
+            except ValueError as e:
+                raise HTTPException(status_code=400, detail=str(e))
             except Exception as e:
                 raise HTTPException(status_code=500, detail=str(e))
 
-        @self.app.get("/api/dict-entry/lemma/{language}/{lemma}")
-        def get_dict_entry_by_lemma(language: str, lemma: str):
+        @self.app.get("/api/dict-entry/lemma/{language}/{lemma}", response_model=DictEntrySchema)
+        async def get_dict_entry_by_lemma(request: Request, response: Response, language: str, lemma: str):
+            not_modified = self._not_modified(request, response, "dict_entry")
+            if not_modified:
+                return not_modified
             try:
-                entry = self.db.get_dict_entry_by_lemma(language, lemma)
+                entry = await self.adb.get_dict_entry_by_lemma(language, lemma)
                 if entry is None:
                     raise HTTPException(status_code=404, detail=f"DictEntry not found")
                 return entry
@@ -404,10 +1249,13 @@ class ImparaServer:
             except Exception as e:
                 raise HTTPException(status_code=500, detail=str(e))
 
-        @self.app.get("/api/dict-entry/{entry_id}")
-        def get_dict_entry(entry_id: int):
+        @self.app.get("/api/dict-entry/{entry_id}", response_model=DictEntrySchema)
+        async def get_dict_entry(request: Request, response: Response, entry_id: int):
+            not_modified = self._not_modified(request, response, "dict_entry")
+            if not_modified:
+                return not_modified
             try:
-                entry = self.db.get_dict_entry(entry_id)
+                entry = await self.adb.get_dict_entry(entry_id)
                 if entry is None:
                     raise HTTPException(status_code=404, detail=f"DictEntry with id {entry_id} not found")
                 return entry
@@ -416,7 +1264,7 @@ class ImparaServer:
             except Exception as e:
                 raise HTTPException(status_code=500, detail=str(e))
 
-        @self.app.post("/api/dict-entry")
+        @self.app.post("/api/dict-entry", response_model=DictEntrySchema)
         def create_dict_entry(payload: dict = Body(...)):
             try:
                 entry = DictEntry(**payload)
@@ -424,7 +1272,7 @@ class ImparaServer:
             except Exception as e:
                 raise HTTPException(status_code=500, detail=str(e))
 
-        @self.app.put("/api/dict-entry/{entry_id}")
+        @self.app.put("/api/dict-entry/{entry_id}", response_model=DictEntrySchema)
         def update_dict_entry(entry_id: int, payload: dict = Body(...)):
             try:
                 entry = self.db.update_dict_entry(entry_id, **payload)
@@ -446,21 +1294,24 @@ class ImparaServer:
 
         # ==================== DICT_SENSE ENDPOINTS ====================
 
-        @self.app.get("/api/dict-senses")
-        def list_dict_senses():
+        @self.app.get("/api/dict-senses", response_model=page_of(DictSenseSchema))
+        def list_dict_senses(response: Response, after_id: Optional[int] = None,
+                             limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE), fields: Optional[str] = None):
             try:
-                return self.db.list_dict_senses()
+                return self._page(response, self.db.list_dict_senses(after_id, limit, self._parse_fields(fields)), limit)
+            except ValueError as e:
+                raise HTTPException(status_code=400, detail=str(e))
             except Exception as e:
                 raise HTTPException(status_code=500, detail=str(e))
 
-        @self.app.get("/api/dict-senses/entry/{entry_id}")
-        def list_dict_senses_by_entry(entry_id: int):
+        @self.app.get("/api/dict-senses/entry/{entry_id}", response_model=List[DictSenseSchema])
+        async def list_dict_senses_by_entry(entry_id: int):
             try:
-                return self.db.list_dict_senses_by_entry(entry_id)
+                return await self.adb.list_dict_senses_by_entry(entry_id)
             except Exception as e:
                 raise HTTPException(status_code=500, detail=str(e))
 
-        @self.app.get("/api/dict-sense/{sense_id}")
+        @self.app.get("/api/dict-sense/{sense_id}", response_model=DictSenseSchema)
         def get_dict_sense(sense_id: int):
             try:
                 sense = self.db.get_dict_sense(sense_id)
@@ -472,7 +1323,7 @@ class ImparaServer:
             except Exception as e:
                 raise HTTPException(status_code=500, detail=str(e))
 
-        @self.app.post("/api/dict-sense")
+        @self.app.post("/api/dict-sense", response_model=DictSenseSchema)
         def create_dict_sense(payload: dict = Body(...)):
             try:
                 sense = DictSense(**payload)
@@ -480,7 +1331,7 @@ class ImparaServer:
             except Exception as e:
                 raise HTTPException(status_code=500, detail=str(e))
 
-        @self.app.put("/api/dict-sense/{sense_id}")
+        @self.app.put("/api/dict-sense/{sense_id}", response_model=DictSenseSchema)
         def update_dict_sense(sense_id: int, payload: dict = Body(...)):
             try:
                 sense = self.db.update_dict_sense(sense_id, **payload)
@@ -502,28 +1353,31 @@ class ImparaServer:
 
         # ==================== DICT_TRANSLATION ENDPOINTS ====================
 
-        @self.app.get("/api/dict-translations")
-        def list_dict_translations():
+        @self.app.get("/api/dict-translations", response_model=page_of(DictTranslationSchema))
+        def list_dict_translations(response: Response, after_id: Optional[int] = None,
+                                   limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE), fields: Optional[str] = None):
             try:
-                return self.db.list_dict_translations()
+                return self._page(response, self.db.list_dict_translations(after_id, limit, self._parse_fields(fields)), limit)
+            except ValueError as e:
+                raise HTTPException(status_code=400, detail=str(e))
             except Exception as e:
                 raise HTTPException(status_code=500, detail=str(e))
 
-        @self.app.get("/api/dict-translations/sense/{sense_id}")
-        def list_dict_translations_by_sense(sense_id: int):
+        @self.app.get("/api/dict-translations/sense/{sense_id}", response_model=List[DictTranslationSchema])
+        async def list_dict_translations_by_sense(sense_id: int):
             try:
-                return self.db.list_dict_translations_by_sense(sense_id)
+                return await self.adb.list_dict_translations_by_sense(sense_id)
             except Exception as e:
                 raise HTTPException(status_code=500, detail=str(e))
 
-        @self.app.get("/api/dict-translations/language/{target_language}")
+        @self.app.get("/api/dict-translations/language/{target_language}", response_model=List[DictTranslationSchema])
         def list_dict_translations_by_language(target_language: str):
             try:
                 return self.db.list_dict_translations_by_language(target_language)
             except Exception as e:
                 raise HTTPException(status_code=500, detail=str(e))
 
-        @self.app.get("/api/dict-translation/{translation_id}")
+        @self.app.get("/api/dict-translation/{translation_id}", response_model=DictTranslationSchema)
         def get_dict_translation(translation_id: int):
             try:
                 translation = self.db.get_dict_translation(translation_id)
@@ -535,7 +1389,7 @@ class ImparaServer:
             except Exception as e:
                 raise HTTPException(status_code=500, detail=str(e))
 
-        @self.app.post("/api/dict-translation")
+        @self.app.post("/api/dict-translation", response_model=DictTranslationSchema)
         def create_dict_translation(payload: dict = Body(...)):
             try:
                 translation = DictTranslation(**payload)
@@ -543,7 +1397,7 @@ class ImparaServer:
             except Exception as e:
                 raise HTTPException(status_code=500, detail=str(e))
 
-        @self.app.put("/api/dict-translation/{translation_id}")
+        @self.app.put("/api/dict-translation/{translation_id}", response_model=DictTranslationSchema)
         def update_dict_translation(translation_id: int, payload: dict = Body(...)):
             try:
                 translation = self.db.update_dict_translation(translation_id, **payload)
@@ -565,21 +1419,24 @@ class ImparaServer:
 
         # ==================== DICT_EXAMPLE ENDPOINTS ====================
 
-        @self.app.get("/api/dict-examples")
-        def list_dict_examples():
+        @self.app.get("/api/dict-examples", response_model=page_of(DictExampleSchema))
+        def list_dict_examples(response: Response, after_id: Optional[int] = None,
+                               limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE), fields: Optional[str] = None):
             try:
-                return self.db.list_dict_examples()
+                return self._page(response, self.db.list_dict_examples(after_id, limit, self._parse_fields(fields)), limit)
+            except ValueError as e:
+                raise HTTPException(status_code=400, detail=str(e))
             except Exception as e:
                 raise HTTPException(status_code=500, detail=str(e))
 
-        @self.app.get("/api/dict-examples/sense/{sense_id}")
-        def list_dict_examples_by_sense(sense_id: int):
+        @self.app.get("/api/dict-examples/sense/{sense_id}", response_model=List[DictExampleSchema])
+        async def list_dict_examples_by_sense(sense_id: int):
             try:
-                return self.db.list_dict_examples_by_sense(sense_id)
+                return await self.adb.list_dict_examples_by_sense(sense_id)
             except Exception as e:
                 raise HTTPException(status_code=500, detail=str(e))
 
-        @self.app.get("/api/dict-example/{example_id}")
+        @self.app.get("/api/dict-example/{example_id}", response_model=DictExampleSchema)
         def get_dict_example(example_id: int):
             try:
                 example = self.db.get_dict_example(example_id)
@@ -591,7 +1448,7 @@ class ImparaServer:
             except Exception as e:
                 raise HTTPException(status_code=500, detail=str(e))
 
-        @self.app.post("/api/dict-example")
+        @self.app.post("/api/dict-example", response_model=DictExampleSchema)
         def create_dict_example(payload: dict = Body(...)):
             try:
                 example = DictExample(**payload)
@@ -599,7 +1456,7 @@ class ImparaServer:
             except Exception as e:
                 raise HTTPException(status_code=500, detail=str(e))
 
-        @self.app.put("/api/dict-example/{example_id}")
+        @self.app.put("/api/dict-example/{example_id}", response_model=DictExampleSchema)
         def update_dict_example(example_id: int, payload: dict = Body(...)):
             try:
                 example = self.db.update_dict_example(example_id, **payload)
@@ -621,21 +1478,21 @@ class ImparaServer:
 
         # ==================== USER_SENSE_STATE ENDPOINTS ====================
 
-        @self.app.get("/api/user-sense-states/user/{user_id}")
+        @self.app.get("/api/user-sense-states/user/{user_id}", response_model=List[UserSenseStateSchema])
         def list_user_sense_states(user_id: int):
             try:
                 return self.db.list_user_sense_states(user_id)
             except Exception as e:
                 raise HTTPException(status_code=500, detail=str(e))
 
-        @self.app.get("/api/user-sense-states/sense/{sense_id}")
+        @self.app.get("/api/user-sense-states/sense/{sense_id}", response_model=List[UserSenseStateSchema])
         def list_user_sense_states_by_sense(sense_id: int):
             try:
                 return self.db.list_user_sense_states_by_sense(sense_id)
             except Exception as e:
                 raise HTTPException(status_code=500, detail=str(e))
 
-        @self.app.get("/api/user-sense-state/{user_id}/{sense_id}")
+        @self.app.get("/api/user-sense-state/{user_id}/{sense_id}", response_model=UserSenseStateSchema)
         def get_user_sense_state(user_id: int, sense_id: int):
             try:
                 state = self.db.get_user_sense_state(user_id, sense_id)
@@ -647,7 +1504,7 @@ class ImparaServer:
             except Exception as e:
                 raise HTTPException(status_code=500, detail=str(e))
 
-        @self.app.post("/api/user-sense-state")
+        @self.app.post("/api/user-sense-state", response_model=UserSenseStateSchema)
         def create_user_sense_state(payload: dict = Body(...)):
             try:
                 state = UserSenseState(**payload)
@@ -655,7 +1512,7 @@ class ImparaServer:
             except Exception as e:
                 raise HTTPException(status_code=500, detail=str(e))
 
-        @self.app.put("/api/user-sense-state/{user_id}/{sense_id}")
+        @self.app.put("/api/user-sense-state/{user_id}/{sense_id}", response_model=UserSenseStateSchema)
         def update_user_sense_state(user_id: int, sense_id: int, payload: dict = Body(...)):
             try:
                 state = self.db.update_user_sense_state(user_id, sense_id, **payload)
@@ -675,24 +1532,85 @@ class ImparaServer:
             except Exception as e:
                 raise HTTPException(status_code=500, detail=str(e))
 
+        # ==================== TOKEN_DICT_MAP ENDPOINTS ====================
+
+        @self.app.get("/api/token-dict-maps/token/{token_id}", response_model=List[TokenDictMapSchema])
+        def list_token_dict_maps_by_token(token_id: int):
+            try:
+                return self.db.list_token_dict_maps_by_token(token_id)
+            except Exception as e:
+                raise HTTPException(status_code=500, detail=str(e))
+
+        @self.app.get("/api/token-dict-maps/sense/{sense_id}", response_model=List[TokenDictMapSchema])
+        def list_token_dict_maps_by_sense(sense_id: int):
+            try:
+                return self.db.list_token_dict_maps_by_sense(sense_id)
+            except Exception as e:
+                raise HTTPException(status_code=500, detail=str(e))
+
+        @self.app.post("/api/token-dict-map", response_model=TokenDictMapSchema)
+        def create_token_dict_map(payload: dict = Body(...)):
+            try:
+                mapping = TokenDictMap(**payload)
+                return self.db.insert_token_dict_map(mapping)
+            except Exception as e:
+                raise HTTPException(status_code=500, detail=str(e))
+
+        @self.app.post("/api/token-dict-map/auto/{language}")
+        def auto_map_tokens(language: str):
+            try:
+                count = self.db.auto_map_tokens(language)
+                return {"message": f"Created {count} token mappings for language {language}"}
+            except Exception as e:
+                raise HTTPException(status_code=500, detail=str(e))
+
+        @self.app.delete("/api/token-dict-map/{token_id}/{sense_id}")
+        def delete_token_dict_map(token_id: int, sense_id: int):
+            try:
+                self.db.delete_token_dict_map(token_id, sense_id)
+                return {"message": f"TokenDictMap deleted for token {token_id} and sense {sense_id}"}
+            except Exception as e:
+                raise HTTPException(status_code=500, detail=str(e))
+
+        # ==================== DATABASE CACHE ENDPOINTS ====================
+
+        @self.app.get("/api/db/cache/stats")
+        def entity_cache_stats():
+            return self.db.cache.stats()
+
+        @self.app.delete("/api/db/cache")
+        def clear_entity_cache():
+            self.db.cache.clear()
+            return {"message": "Entity cache cleared"}
+
+        # ==================== LEARNING PRIORITY ENDPOINTS ====================
+
+        @self.app.get("/api/learning-priority/stats")
+        def learning_priority_stats():
+            return self.db.learning_priorities.stats()
+
+        @self.app.get("/api/learning-priority/user/{user_id}/{language}")
+        def list_learning_priorities(user_id: int, language: str, limit: int = Query(50, ge=1, le=MAX_PAGE_SIZE)):
+            try:
+                return self.db.list_learning_priorities(user_id, language, limit)
+            except Exception as e:
+                raise HTTPException(status_code=500, detail=str(e))
+
         @self.app.get("/")
-        def read_root():
-            index_path = self.dist_folder / "index.html"
-            if index_path.exists():
-                return FileResponse(index_path)
-            return {"error": "Index file not found. Please build the Angular app first."}
+        async def read_root(request: Request):
+            index = self.static_assets.index
+            if index is None:
+                return {"error": "Index file not found. Please build the Angular app first."}
+            return self.static_assets.response(index, request.headers)
 
         @self.app.get("/{full_path:path}")
-        def read_static(full_path: str):
+        async def read_static(full_path: str, request: Request):
             if full_path.startswith("api/"):
                 raise HTTPException(status_code=404)
-            file_path = self.dist_folder / full_path
-            if file_path.exists() and file_path.is_file():
-                return FileResponse(file_path)
-            index_path = self.dist_folder / "index.html"
-            if index_path.exists():
-                return FileResponse(index_path)
-            return {"error": "Index file not found. Please build the Angular app first."}
+            asset = self.static_assets.get(full_path) or self.static_assets.index
+            if asset is None:
+                return {"error": "Index file not found. Please build the Angular app first."}
+            return self.static_assets.response(asset, request.headers)
 
 
 
@@ -700,10 +1618,44 @@ class TokensRequest(BaseModel):
     text: str
     model: str = "gpt-4o-mini"
 
+def create_app():
+    """
+    App factory for uvicorn workers, each of which builds its own server.
+    """
+    return ImparaServer().app
+
+
+def uvicorn_options(settings: dict) -> dict:
+    """
+    Bind address, workers and, with "production", uvloop and httptools
+    (installed with uvicorn[standard], uvloop is not available on Windows).
+    """
+    options = {
+        "host": settings.get("host", "localhost"),
+        "port": settings.get("port", 7000),
+        "workers": settings.get("workers", 1),
+    }
+    if settings.get("production", False):
+        options["loop"] = "uvloop" if importlib.util.find_spec("uvloop") else "asyncio"
+        options["http"] = "httptools" if importlib.util.find_spec("httptools") else "h11"
+        options["access_log"] = False
+    return options
+
+
 if __name__ == "__main__":
     import uvicorn
-    server = ImparaServer()
-    port = server.settings.get("port", 7000)
-    print(f"Starting server on port {port}")
-    print(f"Serving Angular app from: {server.dist_folder}")
-    uvicorn.run(server.app, host="localhost", port=port)
+    settings = ImparaServer.load_settings()
+    options = uvicorn_options(settings)
+    print(f"Starting server on {options['host']}:{options['port']} with {options['workers']} worker(s)")
+    if options["workers"] > 1:
+        # create or migrate the schema and write the compressed assets once,
+        # before the workers open the database and scan the dist folder
+        ImparaDB(db_path(), sqlite_pragmas=settings.get("sqlitePragmas")).close()
+        dist_folder = Path(__file__).parent / "ui" / "dist" / "ui"
+        if dist_folder.exists():
+            StaticAssets(dist_folder, precompress=settings.get("staticPrecompress", True))
+        uvicorn.run("server:create_app", factory=True, **options)
+    else:
+        server = ImparaServer()
+        print(f"Serving Angular app from: {server.dist_folder}")
+        uvicorn.run(server.app, **options)
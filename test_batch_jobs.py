@@ -0,0 +1,104 @@
+import asyncio
+import json
+
+import pytest
+
+from py.domains.ImparaDomainsORM import DictEntry
+from py.services.batchJobs import (
+    BatchJobBuilder, BatchResultLoader, GatewayBatchRunner, read_jsonl, results_path, write_jsonl
+)
+from py.services.databaseServiceORM import ImparaDB
+from py.services.llmGateway import LLMGateway, StubBackend
+
+SENSES = {"senses": [{"pos": "noun", "gloss": "a house", "translations": ["house", "home"]}]}
+
+
+@pytest.fixture
+def db(tmp_path):
+    db = ImparaDB(str(tmp_path / "impara.db"))
+    for lemma in ("casa", "gatto", "cane"):
+        db.insert_dict_entry(DictEntry(language="it", lemma=lemma, normalized=lemma, created_at="2024-01-01"))
+    yield db
+    db.close()
+
+
+def prepare_glosses(db, tmp_path, model="stub"):
+    lines, manifest = BatchJobBuilder(db, model=model).glosses("it", "en")
+    job_path = tmp_path / "glosses-it.jsonl"
+    write_jsonl(job_path, lines)
+    return job_path, manifest
+
+
+def run(job_path, stub):
+    return asyncio.run(GatewayBatchRunner(LLMGateway([stub]), "stub").run(job_path, results_path(job_path)))
+
+
+def test_gloss_job_runs_through_the_stub_backend_and_loads(db, tmp_path):
+    job_path, manifest = prepare_glosses(db, tmp_path)
+
+    summary = run(job_path, StubBackend(reply=lambda request: json.dumps(SENSES)))
+    loaded = BatchResultLoader(db).load(manifest, read_jsonl(results_path(job_path)))
+
+    assert summary == {"total": 3, "skipped": 0, "failed": 0}
+    assert loaded["entries"] == 3
+    assert loaded["senses"] == 3
+    assert loaded["translations"] == 6
+    assert loaded["failed"] == 0
+    assert db.list_dict_entries_without_senses("it", None) == []
+
+
+def test_requests_run_no_more_than_the_backend_slots_at_once(db, tmp_path):
+    job_path, _ = prepare_glosses(db, tmp_path)
+    stub = StubBackend(max_concurrency=2, delay=0.01, reply=lambda request: json.dumps(SENSES))
+    running, peak = 0, 0
+    complete = stub.complete
+
+    async def counting_complete(request):
+        nonlocal running, peak
+        running += 1
+        peak = max(peak, running)
+        try:
+            return await complete(request)
+        finally:
+            running -= 1
+
+    stub.complete = counting_complete
+    run(job_path, stub)
+
+    assert peak == 2
+    assert len(read_jsonl(results_path(job_path))) == 3
+
+
+def test_running_again_only_repeats_failed_requests(db, tmp_path):
+    job_path, _ = prepare_glosses(db, tmp_path)
+    prompts = []
+
+    def flaky(request):
+        prompts.append(request.prompt)
+        if "gatto" in request.prompt and len(prompts) <= 3:
+            raise RuntimeError("backend went away")
+        return json.dumps(SENSES)
+
+    first = run(job_path, StubBackend(reply=flaky))
+    second = run(job_path, StubBackend(reply=flaky))
+
+    assert first == {"total": 3, "skipped": 0, "failed": 1}
+    assert second == {"total": 3, "skipped": 2, "failed": 0}
+    assert len(prompts) == 4
+    results = read_jsonl(results_path(job_path))
+    assert len(results) == 3
+    assert not any(r["error"] for r in results)
+
+
+def test_results_of_another_model_are_rejected(db, tmp_path):
+    job_path, manifest = prepare_glosses(db, tmp_path, model="gpt-4o-mini")
+
+    run(job_path, StubBackend(reply=lambda request: json.dumps(SENSES)))
+    results = read_jsonl(results_path(job_path))
+    for result in results:
+        result["response"]["body"]["model"] = "qwen3-vl:8b"
+    loaded = BatchResultLoader(db).load(manifest, results)
+
+    assert loaded["entries"] == 0
+    assert loaded["failed"] == 3
+    assert "prepared for gpt-4o-mini" in next(iter(loaded["errors"].values()))
@@ -0,0 +1,65 @@
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import update
+from sqlalchemy.orm import Session
+
+import server
+from py.domains.ImparaDomainsORM import Course, User
+from py.services.databaseServiceORM import ImparaDB
+
+NOW = "2024-01-01T00:00:00"
+
+
+@pytest.fixture
+def db_file(tmp_path):
+    return str(tmp_path / "impara.db")
+
+
+@pytest.fixture
+def impara(db_file, monkeypatch):
+    monkeypatch.setattr(server.ImparaServer, "load_settings", staticmethod(lambda: {"port": 7000}))
+    monkeypatch.setattr(server, "db_path", lambda: db_file)
+    impara = server.ImparaServer()
+    yield impara
+    impara.db.close()
+
+
+def test_versions_follow_writes_of_another_process(db_file):
+    reader = ImparaDB(db_file)
+    writer = ImparaDB(db_file)
+    try:
+        user = writer.insert_user(User(display_name="tester", created_at=NOW))
+        before = reader.versions.etag("course", "lesson")
+
+        course = writer.insert_course(Course(user_id=user.id, target_language="it", title="Italiano", created_at=NOW))
+        after_insert = reader.versions.etag("course", "lesson")
+        # bulk statements bump their table as well
+        with Session(writer.engine) as session:
+            session.execute(update(Course).where(Course.id == course.id).values(title="Italiano 2"))
+            session.commit()
+        after_update = reader.versions.etag("course", "lesson")
+
+        assert len({before, after_insert, after_update}) == 3
+        assert before.split(".")[1] == after_update.split(".")[1]
+    finally:
+        reader.close()
+        writer.close()
+
+
+def test_conditional_get_is_answered_with_304_until_a_write(impara):
+    user = impara.db.insert_user(User(display_name="tester", created_at=NOW))
+    client = TestClient(impara.app)
+    client.post("/api/course", json={"user_id": user.id, "target_language": "it", "title": "Italiano", "created_at": NOW})
+
+    first = client.get("/api/courses")
+    etag = first.headers["etag"]
+    again = client.get("/api/courses", headers={"If-None-Match": etag})
+    assert (first.status_code, again.status_code) == (200, 304)
+    assert again.content == b""
+    assert again.headers["etag"] == etag
+
+    client.put(f"/api/course/{first.json()[0]['id']}", json={"title": "Italiano 2"})
+    changed = client.get("/api/courses", headers={"If-None-Match": etag})
+    assert changed.status_code == 200
+    assert changed.headers["etag"] != etag
+    assert changed.json()[0]["title"] == "Italiano 2"
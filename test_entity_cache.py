@@ -0,0 +1,69 @@
+import pytest
+
+from py.domains.ImparaDomainsORM import Course, User
+from py.services.databaseServiceORM import ImparaDB
+
+NOW = "2024-01-01T00:00:00"
+
+
+@pytest.fixture
+def db_file(tmp_path):
+    return str(tmp_path / "impara.db")
+
+
+@pytest.fixture
+def other_process(db_file):
+    # a second ImparaDB on the same file has its own engine, like another worker
+    db = ImparaDB(db_file)
+    yield db
+    db.close()
+
+
+def open_db(db_file, mode):
+    return ImparaDB(db_file, cache_mode=mode)
+
+
+def add_course(db):
+    user = db.insert_user(User(display_name="tester", created_at=NOW))
+    return db.insert_course(Course(user_id=user.id, target_language="it", title="Italiano", created_at=NOW))
+
+
+def test_versioned_rows_are_reloaded_after_a_write_of_another_process(db_file, other_process):
+    db = open_db(db_file, "versioned")
+    try:
+        course = add_course(db)
+        assert db.get_course(course.id).title == "Italiano"
+        assert db.get_course(course.id).title == "Italiano"
+        assert db.cache.stats()["hits"] == 1
+
+        other_process.update_course(course.id, title="Italiano 2")
+        assert db.get_course(course.id).title == "Italiano 2"
+        assert db.cache.stats()["misses"] == 2
+    finally:
+        db.close()
+
+
+def test_local_rows_only_follow_own_writes(db_file, other_process):
+    db = open_db(db_file, "local")
+    try:
+        course = add_course(db)
+        db.get_course(course.id)
+
+        other_process.update_course(course.id, title="Italiano 2")
+        assert db.get_course(course.id).title == "Italiano"
+
+        db.update_course(course.id, title="Italiano 3")
+        assert db.get_course(course.id).title == "Italiano 3"
+    finally:
+        db.close()
+
+
+def test_off_does_not_cache(db_file):
+    db = open_db(db_file, "off")
+    try:
+        course = add_course(db)
+        db.get_course(course.id)
+        db.get_course(course.id)
+        assert db.cache.stats()["items"] == 0
+    finally:
+        db.close()
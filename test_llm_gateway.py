@@ -0,0 +1,85 @@
+import asyncio
+
+import pytest
+
+from py.services.llmGateway import (
+    LLMBackend, LLMGateway, LLMRequest, StubBackend, PRIORITY_BACKGROUND, PRIORITY_INTERACTIVE
+)
+
+
+def test_backend_must_implement_complete():
+    with pytest.raises(TypeError):
+        LLMBackend("incomplete", "model")
+
+
+def test_stub_backend_echoes_the_prompt():
+    gateway = LLMGateway([StubBackend()])
+    result = asyncio.run(gateway.complete(LLMRequest(system="", prompt="ciao mondo")))
+
+    assert (result.text, result.backend, result.model) == ("ciao mondo", "stub", "stub")
+    assert result.usage == {"prompt_tokens": 2, "completion_tokens": 2, "total_tokens": 4}
+
+
+def test_interactive_calls_overtake_queued_background_calls():
+    order = []
+    stub = StubBackend(max_concurrency=1, delay=0.01, reply=lambda request: order.append(request.prompt) or "")
+    gateway = LLMGateway([stub])
+
+    async def main():
+        # the first call takes the only slot, the others queue behind it
+        running = gateway.complete(LLMRequest(system="", prompt="running"), priority=PRIORITY_BACKGROUND)
+        calls = [asyncio.create_task(running)]
+        await asyncio.sleep(0)
+        for prompt, priority in [("background 1", PRIORITY_BACKGROUND), ("interactive 1", PRIORITY_INTERACTIVE),
+                                 ("background 2", PRIORITY_BACKGROUND), ("interactive 2", PRIORITY_INTERACTIVE)]:
+            calls.append(asyncio.create_task(gateway.complete(LLMRequest(system="", prompt=prompt), priority=priority)))
+            await asyncio.sleep(0)
+        await asyncio.gather(*calls)
+
+    asyncio.run(main())
+    assert order == ["running", "interactive 1", "interactive 2", "background 1", "background 2"]
+    assert gateway.stats()["backends"]["stub"]["completed"] == 5
+
+
+def test_timeout_limits_the_call():
+    gateway = LLMGateway([StubBackend(delay=0.2)], timeout=0.05)
+
+    with pytest.raises(TimeoutError):
+        asyncio.run(gateway.complete(LLMRequest(system="", prompt="slow")))
+    stats = gateway.stats()["backends"]["stub"]
+    assert (stats["timed_out"], stats["active"]) == (1, 0)
+
+
+def test_time_in_the_queue_does_not_count_towards_the_timeout():
+    gateway = LLMGateway([StubBackend(max_concurrency=1, delay=0.03)], timeout=0.05)
+
+    async def main():
+        # each call runs well within the timeout, but the last ones queue for longer
+        return await asyncio.gather(*[
+            gateway.complete(LLMRequest(system="", prompt=str(i)), priority=PRIORITY_BACKGROUND) for i in range(5)
+        ])
+
+    assert [r.text for r in asyncio.run(main())] == ["0", "1", "2", "3", "4"]
+    assert gateway.stats()["backends"]["stub"]["timed_out"] == 0
+
+
+def test_a_held_slot_counts_against_the_cap():
+    order = []
+    gateway = LLMGateway([StubBackend(max_concurrency=1, reply=lambda request: order.append("call") or "")])
+
+    async def stream():
+        async with gateway.slot("stub"):
+            order.append("stream start")
+            await asyncio.sleep(0.02)
+            order.append("stream end")
+
+    async def main():
+        streaming = asyncio.create_task(stream())
+        await asyncio.sleep(0)
+        await gateway.complete(LLMRequest(system="", prompt="queued"))
+        await streaming
+
+    asyncio.run(main())
+    assert order == ["stream start", "stream end", "call"]
+    stats = gateway.stats()["backends"]["stub"]
+    assert (stats["completed"], stats["active"]) == (2, 0)
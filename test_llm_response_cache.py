@@ -0,0 +1,153 @@
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from types import SimpleNamespace
+
+import pytest
+from fastapi.testclient import TestClient
+
+import server
+from py.services import persistentCache
+
+
+class StubOpenAI(BaseHTTPRequestHandler):
+    """
+    Stands in for the OpenAI API: answers /chat/completions and /responses
+    with a fixed completion and counts the requests it got.
+    """
+    calls = []
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers["content-length"])))
+        StubOpenAI.calls.append((self.path, body))
+        if self.path.endswith("/responses"):
+            prompt = body["input"][-1]["content"][0]["text"]
+            data = json.dumps({
+                "id": f"resp-{len(StubOpenAI.calls)}",
+                "model": body["model"],
+                "output": [{"type": "message", "content": [{"type": "output_text", "text": f'{{"it": "ciao {prompt}"}}'}]}],
+                "usage": {"input_tokens": 13, "output_tokens": 5, "total_tokens": 18},
+            }).encode()
+        else:
+            data = json.dumps({
+                "id": f"chatcmpl-{len(StubOpenAI.calls)}",
+                "model": body["model"],
+                "choices": [{"message": {"role": "assistant", "content": "ciao " + body["messages"][-1]["content"]}}],
+                "usage": {"prompt_tokens": 11, "completion_tokens": 7, "total_tokens": 18},
+            }).encode()
+        self.send_response(200)
+        self.send_header("content-type", "application/json")
+        self.send_header("content-length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def stub_openai():
+    StubOpenAI.calls = []
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), StubOpenAI)
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{httpd.server_address[1]}/v1"
+    httpd.shutdown()
+    httpd.server_close()
+
+
+@pytest.fixture
+def client(stub_openai, tmp_path, monkeypatch):
+    settings = {
+        "port": 7000,
+        "OpenAI_API_Key": "test-key",
+        "openAiBaseUrl": stub_openai,
+        "openAiCacheTtlSeconds": 60,
+    }
+    monkeypatch.setattr(server.ImparaServer, "load_settings", staticmethod(lambda: settings))
+    monkeypatch.setattr(server, "db_path", lambda: str(tmp_path / "impara.db"))
+    impara = server.ImparaServer()
+    yield TestClient(impara.app)
+    impara.db.close()
+
+
+def ask(client, prompt, cache=True):
+    response = client.post("/openAi", json={"model": "gpt-test", "system": "translate", "prompt": prompt, "cache": cache})
+    assert response.status_code == 200
+    return response.json()
+
+
+def test_repeated_prompt_is_answered_from_cache(client):
+    first = ask(client, "hello")
+    second = ask(client, "hello")
+
+    assert first["message"] == "ciao hello"
+    assert second == first
+    assert len(StubOpenAI.calls) == 1
+    assert StubOpenAI.calls[0][0] == "/v1/chat/completions"
+    stats = client.get("/api/openai/cache/stats").json()
+    assert (stats["hits"], stats["misses"]) == (1, 1)
+    assert stats["saved_prompt_tokens"] == 11
+    assert stats["saved_completion_tokens"] == 7
+    assert stats["saved_total_tokens"] == 18
+
+
+def test_different_prompts_miss(client):
+    ask(client, "hello")
+    ask(client, "goodbye")
+
+    assert len(StubOpenAI.calls) == 2
+    assert client.get("/api/openai/cache/stats").json()["hits"] == 0
+
+
+def test_cache_false_bypasses_lookup(client):
+    ask(client, "hello")
+    ask(client, "hello", cache=False)
+
+    assert len(StubOpenAI.calls) == 2
+    stats = client.get("/api/openai/cache/stats").json()
+    assert stats["bypassed"] == 1
+    assert stats["hits"] == 0
+    assert stats["saved_total_tokens"] == 0
+
+
+def test_expired_entry_is_fetched_again(client, monkeypatch):
+    ask(client, "hello")
+    later = time.time() + 61
+    monkeypatch.setattr(persistentCache, "time", SimpleNamespace(time=lambda: later))
+    ask(client, "hello")
+
+    assert len(StubOpenAI.calls) == 2
+    stats = client.get("/api/openai/cache/stats").json()
+    assert (stats["hits"], stats["misses"]) == (0, 2)
+
+
+def respond(client, prompt, system="translate", model="gpt-test"):
+    response = client.post("/api/openai/respond", json={"model": model, "system": system, "prompt": prompt})
+    assert response.status_code == 200
+    return response.json()
+
+
+def test_responses_route_is_cached_by_model_system_and_prompt(client):
+    first = respond(client, "hello")
+    second = respond(client, "hello")
+    respond(client, "hello", system="translate to Italian")
+    respond(client, "hello", model="gpt-other")
+    respond(client, "goodbye")
+
+    assert first == {"raw": '{"it": "ciao hello"}'}
+    assert second == first
+    assert [path for path, _ in StubOpenAI.calls] == ["/v1/responses"] * 4
+    stats = client.get("/api/openai/cache/stats").json()
+    assert (stats["hits"], stats["misses"]) == (1, 4)
+    assert stats["saved_prompt_tokens"] == 13
+    assert stats["saved_completion_tokens"] == 5
+
+
+def test_responses_and_chat_entries_are_kept_apart(client):
+    ask(client, "hello")
+    respond(client, "hello")
+
+    assert [path for path, _ in StubOpenAI.calls] == ["/v1/chat/completions", "/v1/responses"]
+    assert client.get("/api/openai/cache/stats").json()["hits"] == 0
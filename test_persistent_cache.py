@@ -0,0 +1,58 @@
+from types import SimpleNamespace
+
+import pytest
+from sqlalchemy import create_engine, select
+from sqlalchemy.orm import Session
+
+from py.domains.ImparaDomainsORM import CacheEntry
+from py.services import persistentCache
+from py.services.persistentCache import PersistentCache
+
+
+@pytest.fixture
+def engine(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'cache.db'}")
+    CacheEntry.__table__.create(engine)
+    yield engine
+    engine.dispose()
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = SimpleNamespace(now=1000.0)
+    monkeypatch.setattr(persistentCache, "time", SimpleNamespace(time=lambda: clock.now))
+    return clock
+
+
+def last_access(engine, key):
+    with Session(engine) as session:
+        return session.scalar(select(CacheEntry.last_access_ts).where(CacheEntry.key == key))
+
+
+def test_hits_write_access_times_once_per_interval(engine, clock):
+    PersistentCache(engine, "test").put("a", "value")
+    # a fresh instance has an empty memory tier, so this is a disk hit
+    cache = PersistentCache(engine, "test", touch_interval=60)
+    clock.now += 10
+    assert cache.get("a") == "value"
+    assert last_access(engine, "a") == 1000.0
+
+    clock.now += 60
+    assert cache.get("a") == "value"
+    assert (cache.disk_hits, cache.memory_hits) == (1, 1)
+    assert last_access(engine, "a") == 1070.0
+
+
+def test_eviction_counts_hits_that_were_not_written_yet(engine, clock):
+    cache = PersistentCache(engine, "test", max_bytes=30, touch_interval=3600)
+    cache.put("a", "x" * 10)
+    clock.now += 1
+    cache.put("b", "x" * 10)
+    clock.now += 1
+    assert cache.get("a") == "x" * 10
+    clock.now += 1
+    cache.put("c", "x" * 10)
+
+    assert last_access(engine, "a") == 1002.0
+    assert last_access(engine, "b") is None
+    assert cache.evictions == 1
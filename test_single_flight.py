@@ -0,0 +1,96 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+from py.services.singleFlight import SingleFlight
+
+
+def test_concurrent_callers_share_one_call():
+    flight = SingleFlight()
+    calls = []
+
+    async def fetch():
+        calls.append(1)
+        await asyncio.sleep(0.01)
+        return "result"
+
+    async def main():
+        return await asyncio.gather(*[flight.do_async("key", fetch) for _ in range(10)])
+
+    assert asyncio.run(main()) == ["result"] * 10
+    assert len(calls) == 1
+    assert flight.stats() == {"in_flight": 0, "upstream_calls": 1, "coalesced": 9, "failures": 0}
+
+
+def test_an_error_reaches_every_waiter_and_is_not_kept():
+    flight = SingleFlight()
+    calls = []
+
+    async def fail():
+        calls.append(1)
+        await asyncio.sleep(0.01)
+        raise RuntimeError("upstream down")
+
+    async def main():
+        results = await asyncio.gather(*[flight.do_async("key", fail) for _ in range(3)], return_exceptions=True)
+        # the failure is not served to a later caller, it calls again
+        with pytest.raises(RuntimeError):
+            await flight.do_async("key", fail)
+        return results
+
+    results = asyncio.run(main())
+    assert [str(r) for r in results] == ["upstream down"] * 3
+    assert len(calls) == 2
+    assert flight.stats()["failures"] == 2
+
+
+def test_cancelling_the_first_caller_keeps_the_call_for_the_others():
+    flight = SingleFlight()
+    calls = []
+
+    async def fetch():
+        calls.append(1)
+        await asyncio.sleep(0.02)
+        return "result"
+
+    async def main():
+        first = asyncio.create_task(flight.do_async("key", fetch))
+        await asyncio.sleep(0)
+        second = asyncio.create_task(flight.do_async("key", fetch))
+        await asyncio.sleep(0)
+        first.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await first
+        return await second
+
+    assert asyncio.run(main()) == "result"
+    assert len(calls) == 1
+
+
+def test_threads_share_one_call():
+    flight = SingleFlight()
+    calls = []
+    results = []
+    release = threading.Event()
+
+    def fetch():
+        calls.append(1)
+        release.wait(5)
+        return "result"
+
+    threads = [threading.Thread(target=lambda: results.append(flight.do("key", fetch))) for _ in range(5)]
+    for thread in threads:
+        thread.start()
+    # the call only finishes once every other thread waits for it
+    deadline = time.monotonic() + 5
+    while flight.stats()["coalesced"] < 4 and time.monotonic() < deadline:
+        time.sleep(0.001)
+    release.set()
+    for thread in threads:
+        thread.join()
+
+    assert results == ["result"] * 5
+    assert len(calls) == 1
+    assert flight.stats()["coalesced"] == 4
@@ -0,0 +1,65 @@
+import gzip
+
+from starlette.datastructures import Headers
+
+from py.services.staticAssets import ENCODINGS, IMMUTABLE, REVALIDATE, StaticAssets, accepted_encodings
+
+SCRIPT = b"console.log('impara');\n" * 100
+
+
+def build(tmp_path):
+    (tmp_path / "index.html").write_text("<html><body>impara</body></html>")
+    (tmp_path / "app.js").write_bytes(SCRIPT)
+    (tmp_path / "main.3f9c0a7d21e4b6c8.js").write_bytes(SCRIPT)
+    return StaticAssets(tmp_path)
+
+
+def respond(assets, path, **headers):
+    return assets.response(assets.get(path), Headers(headers={k.replace("_", "-"): v for k, v in headers.items()}))
+
+
+def test_accept_encoding_q_values():
+    assert accepted_encodings("gzip, br;q=0") == {"gzip"}
+    assert accepted_encodings("gzip;q=0.0, br;q=0.5") == {"br"}
+    assert accepted_encodings("gzip;q=oops") == set()
+    assert accepted_encodings("*") >= set(ENCODINGS)
+    assert accepted_encodings("*, br;q=0") & set(ENCODINGS) == {"gzip"}
+
+
+def test_compressed_sibling_is_served_when_accepted(tmp_path):
+    assets = build(tmp_path)
+    response = respond(assets, "app.js", accept_encoding="gzip")
+
+    assert response.headers["content-encoding"] == "gzip"
+    assert response.headers["vary"] == "Accept-Encoding"
+    assert gzip.decompress(open(response.path, "rb").read()) == SCRIPT
+    # precompressing wrote its siblings through temp files and left none behind
+    assert not list(tmp_path.glob("*.tmp"))
+
+
+def test_q_zero_gets_the_identity_file(tmp_path):
+    assets = build(tmp_path)
+    response = respond(assets, "app.js", accept_encoding="gzip;q=0, br;q=0")
+
+    assert "content-encoding" not in response.headers
+    assert response.path == tmp_path / "app.js"
+
+
+def test_matching_etag_is_answered_with_304(tmp_path):
+    assets = build(tmp_path)
+    etag = respond(assets, "app.js", accept_encoding="gzip").headers["etag"]
+
+    assert respond(assets, "app.js", accept_encoding="gzip", if_none_match=etag).status_code == 304
+    assert respond(assets, "app.js", accept_encoding="gzip", if_none_match=f'"other", W/{etag}').status_code == 304
+    # the identity file is another representation with its own ETag
+    assert respond(assets, "app.js", if_none_match=etag).status_code == 200
+
+
+def test_cache_control(tmp_path):
+    assets = build(tmp_path)
+    index = assets.response(assets.index, Headers())
+
+    assert index.headers["cache-control"] == REVALIDATE
+    assert index.body == b"<html><body>impara</body></html>"
+    assert respond(assets, "main.3f9c0a7d21e4b6c8.js").headers["cache-control"] == IMMUTABLE
+    assert respond(assets, "app.js").headers["cache-control"] == REVALIDATE
@@ -0,0 +1,136 @@
+import pytest
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from py.domains.ImparaDomainsORM import Course, CourseTokenFrequency, Lesson, LessonTokenCount, Token, TokenFrequency, User
+from py.services.databaseServiceORM import ImparaDB
+
+NOW = "2024-01-01T00:00:00"
+
+
+@pytest.fixture
+def db(tmp_path):
+    db = ImparaDB(str(tmp_path / "impara.db"))
+    yield db
+    db.close()
+
+
+@pytest.fixture
+def user(db):
+    return db.insert_user(User(display_name="tester", created_at=NOW))
+
+
+def add_course(db, user, language, title):
+    return db.insert_course(Course(user_id=user.id, target_language=language, title=title, created_at=NOW))
+
+
+def add_lesson(db, user, course, title, text):
+    return db.insert_lesson(Lesson(user_id=user.id, course_id=course.id, title=title, text=text, created_at=NOW))
+
+
+def frequencies(db):
+    """
+    Both frequency tables, keyed by language and token text instead of ids.
+    """
+    with Session(db.engine) as session:
+        language = {
+            (row.language, row.token, row.token_type): row.freq
+            for row in session.execute(
+                select(TokenFrequency.language, Token.token, TokenFrequency.token_type, TokenFrequency.freq)
+                .join(Token, Token.id == TokenFrequency.token_id)
+            )
+        }
+        course = {
+            (row.course_id, row.language, row.token, row.token_type): row.freq
+            for row in session.execute(
+                select(CourseTokenFrequency.course_id, CourseTokenFrequency.language, Token.token,
+                       CourseTokenFrequency.token_type, CourseTokenFrequency.freq)
+                .join(Token, Token.id == CourseTokenFrequency.token_id)
+            )
+        }
+    return language, course
+
+
+def assert_matches_rebuild(db):
+    incremental = frequencies(db)
+    db.rebuild_token_frequencies()
+    assert incremental == frequencies(db)
+    return incremental
+
+
+def test_insert(db, user):
+    course = add_course(db, user, "it", "Italiano")
+    add_lesson(db, user, course, "uno", "la casa e la casa")
+    add_lesson(db, user, course, "due", "una casa rossa")
+
+    language, _ = assert_matches_rebuild(db)
+    assert language[("it", "casa", "word")] == 3
+    assert language[("it", "la casa", "phrase")] == 2
+
+
+def test_text_edit(db, user):
+    course = add_course(db, user, "it", "Italiano")
+    lesson = add_lesson(db, user, course, "uno", "la casa e la casa")
+    add_lesson(db, user, course, "due", "una casa rossa")
+    db.update_lesson(lesson.id, text="il gatto e la casa")
+
+    language, _ = assert_matches_rebuild(db)
+    assert language[("it", "casa", "word")] == 2
+    assert ("it", "la casa e", "phrase") not in language
+    assert language[("it", "gatto", "word")] == 1
+
+
+def test_course_move(db, user):
+    first = add_course(db, user, "it", "Italiano 1")
+    second = add_course(db, user, "it", "Italiano 2")
+    lesson = add_lesson(db, user, first, "uno", "la casa")
+    add_lesson(db, user, second, "due", "una casa")
+    db.update_lesson(lesson.id, course_id=second.id)
+
+    language, course = assert_matches_rebuild(db)
+    assert language[("it", "casa", "word")] == 2
+    assert not any(key[0] == first.id for key in course)
+    assert course[(second.id, "it", "casa", "word")] == 2
+
+
+def test_course_language_change(db, user):
+    italian = add_course(db, user, "it", "Italiano")
+    other = add_course(db, user, "it", "Altro")
+    add_lesson(db, user, italian, "uno", "la casa")
+    add_lesson(db, user, other, "due", "una casa")
+    db.update_course(italian.id, target_language="es")
+
+    language, course = assert_matches_rebuild(db)
+    assert language[("it", "casa", "word")] == 1
+    assert language[("es", "casa", "word")] == 1
+    assert ("it", "la", "word") not in language
+    assert course[(italian.id, "es", "la casa", "phrase")] == 1
+    assert db.get_lesson_lex_stats(1).language == "es"
+
+
+def test_delete(db, user):
+    course = add_course(db, user, "it", "Italiano")
+    lesson = add_lesson(db, user, course, "uno", "la casa")
+    add_lesson(db, user, course, "due", "una casa")
+    db.delete_lesson(lesson.id)
+
+    language, course_rows = assert_matches_rebuild(db)
+    assert language == {("it", "casa", "word"): 1, ("it", "una", "word"): 1, ("it", "una casa", "phrase"): 1}
+    assert len(course_rows) == 3
+
+
+def test_count_unique_counts_spellings(db, user):
+    course = add_course(db, user, "it", "Italiano")
+    lesson = add_lesson(db, user, course, "uno", "Casa, casa e CASA. Gatto")
+
+    with Session(db.engine) as session:
+        counts = {
+            token: (total, unique)
+            for token, total, unique in session.execute(
+                select(Token.token, LessonTokenCount.count_total, LessonTokenCount.count_unique)
+                .join(Token, Token.id == LessonTokenCount.token_id)
+                .where(LessonTokenCount.lesson_id == lesson.id, Token.token_type == "word")
+            )
+        }
+    assert counts["casa"] == (3, 3)
+    assert counts["gatto"] == (1, 1)
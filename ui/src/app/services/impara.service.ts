@@ -1,8 +1,8 @@
 import { Injectable } from '@angular/core';
 import {environment} from "../../environments/environment";
-import {HttpClient} from "@angular/common/http";
+import {HttpClient, HttpParams} from "@angular/common/http";
 import {User} from "../domains/User";
-import {BehaviorSubject, Observable} from "rxjs";
+import {BehaviorSubject, EMPTY, Observable, expand, reduce} from "rxjs";
 import {Languages} from "../domains/Languages";
 import {Language} from "../domains/Language";
 import {Course} from "../domains/Course";
@@ -24,8 +24,30 @@ export class ImparaService {
   user$ = this.userSubject.asObservable()
   language$ = this.languageSubject.asObservable()
 
+  // the server's largest page (MAX_PAGE_SIZE)
+  private static readonly PAGE_SIZE = 1000
+
   constructor(private http: HttpClient) {}
 
+  // full listings are paged: fetch page after page while the server sends an
+  // X-Next-After-Id cursor, and return all rows at once
+  private listAllPages<T>(path: string):Observable<T[]> {
+    const page = (afterId: string | null) => {
+      let params = new HttpParams().set('limit', String(ImparaService.PAGE_SIZE))
+      if (afterId) {
+        params = params.set('after_id', afterId)
+      }
+      return this.http.get<T[]>(`${this.baseUrl}${path}`, {params, observe: 'response'})
+    }
+    return page(null).pipe(
+      expand(response => {
+        const next = response.headers.get('X-Next-After-Id')
+        return next ? page(next) : EMPTY
+      }),
+      reduce((rows: T[], response) => rows.concat(response.body ?? []), [] as T[])
+    )
+  }
+
   createUser(user:User):Observable<any> {
     return this.http.post(`${this.baseUrl}api/user`, user)
   }
@@ -77,7 +99,7 @@ export class ImparaService {
   // ==================== COURSE ENDPOINTS ====================
 
   listCourses():Observable<Course[]> {
-    return this.http.get<Course[]>(`${this.baseUrl}api/courses`)
+    return this.listAllPages<Course>('api/courses')
   }
 
   listCoursesByUser(userId: number):Observable<Course[]> {
@@ -107,7 +129,7 @@ export class ImparaService {
   // ==================== LESSON ENDPOINTS ====================
 
   listLessons():Observable<Lesson[]> {
-    return this.http.get<Lesson[]>(`${this.baseUrl}api/lessons`)
+    return this.listAllPages<Lesson>('api/lessons')
   }
 
   listLessonsByUser(userId: number):Observable<Lesson[]> {
@@ -141,11 +163,11 @@ export class ImparaService {
   // ==================== DICT_ENTRY ENDPOINTS ====================
 
   listDictEntries():Observable<DictEntry[]> {
-    return this.http.get<DictEntry[]>(`${this.baseUrl}api/dict-entries`)
+    return this.listAllPages<DictEntry>('api/dict-entries')
   }
 
   listDictEntriesByLanguage(language: string):Observable<DictEntry[]> {
-    return this.http.get<DictEntry[]>(`${this.baseUrl}api/dict-entries/language/${language}`)
+    return this.listAllPages<DictEntry>(`api/dict-entries/language/${language}`)
   }
 
   getDictEntryByLemma(language: string, lemma: string):Observable<DictEntry> {
@@ -171,7 +193,7 @@ export class ImparaService {
   // ==================== DICT_SENSE ENDPOINTS ====================
 
   listDictSenses():Observable<DictSense[]> {
-    return this.http.get<DictSense[]>(`${this.baseUrl}api/dict-senses`)
+    return this.listAllPages<DictSense>('api/dict-senses')
   }
 
   listDictSensesByEntry(entryId: number):Observable<DictSense[]> {
@@ -197,7 +219,7 @@ export class ImparaService {
   // ==================== DICT_TRANSLATION ENDPOINTS ====================
 
   listDictTranslations():Observable<DictTranslation[]> {
-    return this.http.get<DictTranslation[]>(`${this.baseUrl}api/dict-translations`)
+    return this.listAllPages<DictTranslation>('api/dict-translations')
   }
 
   listDictTranslationsBySense(senseId: number):Observable<DictTranslation[]> {
@@ -227,7 +249,7 @@ export class ImparaService {
   // ==================== DICT_EXAMPLE ENDPOINTS ====================
 
   listDictExamples():Observable<DictExample[]> {
-    return this.http.get<DictExample[]>(`${this.baseUrl}api/dict-examples`)
+    return this.listAllPages<DictExample>('api/dict-examples')
   }
 
   listDictExamplesBySense(senseId: number):Observable<DictExample[]> {
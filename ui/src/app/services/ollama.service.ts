@@ -1,10 +1,12 @@
 import { Injectable } from '@angular/core';
 import {HttpClient} from "@angular/common/http";
-import {firstValueFrom, map, Observable} from 'rxjs';
+import {map, Observable} from 'rxjs';
+import {environment} from "../../environments/environment";
 
-type OllamaChatResponse = {
-  message?: { role: string; content: string };
-  done?: boolean;
+type LlmChatResponse = {
+  backend: string;
+  model: string;
+  text: string;
 };
 
 @Injectable({
@@ -12,7 +14,7 @@ type OllamaChatResponse = {
 })
 export class OllamaService {
 
-  private baseUrl = 'http://localhost:11434';
+  private baseUrl = environment.baseUrl;
   private baseModel = 'qwen3-vl:8b';
 
   constructor(private http: HttpClient) {}
@@ -20,25 +22,18 @@ export class OllamaService {
   chat(question: string, system: string): Observable<string> {
     console.log(question)
 
+    // goes through the server's LLM gateway, which queues and throttles Ollama calls
     const body = {
+      backend: 'ollama',
       model: this.baseModel,
-      stream: false,
-      messages: [
-        {
-          role: "system",
-          content: system
-        },
-        {
-          role: 'user',
-          content: question
-        }
-      ]
+      system: system,
+      prompt: question
     };
 
     return this.http
-      .post<OllamaChatResponse>(`${this.baseUrl}/api/chat`, body)
+      .post<LlmChatResponse>(`${this.baseUrl}api/llm/chat`, body)
       .pipe(
-        map(res => res?.message?.content ?? '')
+        map(res => res?.text ?? '')
       );
   }
 }